@@ -0,0 +1,240 @@
+# airtable_mirror.py
+#
+# Réplica local en SQLite de una tabla de Airtable, para consultar el CRM por nombre o por
+# campo sin ir a la red en cada turno. La primera sincronización recorre la tabla completa
+# página a página (token `offset`) y guarda cada página al llegar; las siguientes solo piden
+# los registros modificados desde el último checkpoint (LAST_MODIFIED_TIME()).
+#
+#   mirror = AirtableMirror(AsyncAirtableCRM(api_key, base_id, "Leads"))
+#   report = await mirror.sync()          # {"mode": "full", "fetched": 1200, "seconds": 3.1, ...}
+#   mirror.find_by_name("juan perez")     # servido desde el índice local
+
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from agent import sqlite_db
+from agent.async_crm import AsyncAirtableCRM
+
+logger = logging.getLogger("AirtableMirror")
+
+MIRROR_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS airtable_mirror (
+        record_id TEXT PRIMARY KEY,
+        table_key TEXT NOT NULL,
+        fields TEXT NOT NULL,
+        nombre_norm TEXT NOT NULL DEFAULT '',
+        created_time TEXT,
+        sync_id INTEGER NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_airtable_mirror_nombre ON airtable_mirror (table_key, nombre_norm)",
+    """
+    CREATE TABLE IF NOT EXISTS airtable_sync_state (
+        table_key TEXT PRIMARY KEY,
+        checkpoint TEXT,
+        sync_id INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+)
+
+# Margen que se resta al checkpoint para cubrir la diferencia de reloj con Airtable; los
+# registros que se vuelven a traer por el solapamiento simplemente se sobrescriben.
+CHECKPOINT_OVERLAP_SECONDS = 60.0
+MIRROR_SYNC_INTERVAL = 300.0
+
+UPSERT_SQL = (
+    "INSERT INTO airtable_mirror (record_id, table_key, fields, nombre_norm, created_time, sync_id) "
+    "VALUES (?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (record_id) DO UPDATE SET fields = excluded.fields, nombre_norm = excluded.nombre_norm, "
+    "sync_id = excluded.sync_id"
+)
+
+def init_mirror() -> None:
+    """Crea las tablas de la réplica en la base de datos de leads si no existen."""
+    with sqlite_db.get_pool().transaction() as conn:
+        for statement in MIRROR_SCHEMA:
+            conn.execute(statement)
+
+def _iso(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+def _record(row: sqlite3.Row) -> Dict[str, Any]:
+    return {"id": row[0], "createdTime": row[2], "fields": json.loads(row[1])}
+
+class AirtableMirror:
+    """
+    Sincroniza una tabla de Airtable con la tabla local airtable_mirror y responde consultas
+    desde ella. `name_field` es la columna de Airtable que se indexa para buscar por nombre.
+
+    La sincronización incremental no detecta registros borrados en Airtable; una
+    sincronización completa (`sync(full=True)`) elimina de la réplica los que ya no existen.
+    """
+
+    def __init__(
+        self,
+        crm: AsyncAirtableCRM,
+        name_field: str = "Nombre",
+        overlap: float = CHECKPOINT_OVERLAP_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.crm = crm
+        self.name_field = name_field
+        self.overlap = overlap
+        self._clock = clock
+        self.table_key = f"{crm.base_id}/{crm.table_name}"
+        self.last_report: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        init_mirror()
+
+    # Sincronización
+
+    def _load_state(self) -> tuple:
+        with sqlite_db.get_pool().connection() as conn:
+            row = conn.execute(
+                "SELECT checkpoint, sync_id FROM airtable_sync_state WHERE table_key = ?", (self.table_key,)
+            ).fetchone()
+        return row if row is not None else (None, 0)
+
+    def _upsert_page(self, records: List[dict], sync_id: int) -> None:
+        rows = [
+            (
+                record["id"],
+                self.table_key,
+                json.dumps(record.get("fields", {}), ensure_ascii=False),
+                sqlite_db.normalize_name(str(record.get("fields", {}).get(self.name_field, ""))),
+                record.get("createdTime"),
+                sync_id,
+            )
+            for record in records
+        ]
+        with sqlite_db.get_pool().transaction() as conn:
+            conn.executemany(UPSERT_SQL, rows)
+
+    def _finish(self, checkpoint: str, sync_id: int, full: bool) -> int:
+        """Guarda el checkpoint y, tras una carga completa, borra los registros no vistos."""
+        with sqlite_db.get_pool().transaction() as conn:
+            deleted = 0
+            if full:
+                deleted = conn.execute(
+                    "DELETE FROM airtable_mirror WHERE table_key = ? AND sync_id != ?", (self.table_key, sync_id)
+                ).rowcount
+            conn.execute(
+                "INSERT INTO airtable_sync_state (table_key, checkpoint, sync_id) VALUES (?, ?, ?) "
+                "ON CONFLICT (table_key) DO UPDATE SET checkpoint = excluded.checkpoint, sync_id = excluded.sync_id",
+                (self.table_key, checkpoint, sync_id),
+            )
+        return deleted
+
+    async def sync(self, full: bool = False) -> Dict[str, Any]:
+        """
+        Trae de Airtable los registros nuevos o modificados (o todos, si `full` o si es la
+        primera vez) y devuelve un informe con duración y número de filas. Si una página
+        falla, lanza httpx.HTTPError y el checkpoint no avanza.
+        """
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            start = time.perf_counter()
+            started_at = self._clock()
+            checkpoint, sync_id = await loop.run_in_executor(None, self._load_state)
+            full = full or checkpoint is None
+            sync_id += 1
+            formula = None if full else f"IS_AFTER(LAST_MODIFIED_TIME(), '{checkpoint}')"
+
+            pages = fetched = 0
+            async for records in self.crm.iter_record_pages(formula):
+                await loop.run_in_executor(None, self._upsert_page, records, sync_id)
+                pages += 1
+                fetched += len(records)
+
+            new_checkpoint = _iso(started_at - self.overlap)
+            deleted = await loop.run_in_executor(None, self._finish, new_checkpoint, sync_id, full)
+            total = await loop.run_in_executor(None, self.count)
+            self.last_report = {
+                "mode": "full" if full else "incremental",
+                "pages": pages,
+                "fetched": fetched,
+                "deleted": deleted,
+                "total": total,
+                "seconds": round(time.perf_counter() - start, 3),
+                "checkpoint": new_checkpoint,
+            }
+            logger.info("Sincronización con Airtable completada: %s", self.last_report)
+            return self.last_report
+
+    def start(self, interval: float = MIRROR_SYNC_INTERVAL) -> None:
+        """Sincroniza en segundo plano cada `interval` segundos en el event loop actual."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run(interval), name="AirtableMirror")
+
+    async def _run(self, interval: float) -> None:
+        while True:
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.error("Error al sincronizar con Airtable: %s", e)
+            await asyncio.sleep(interval)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # Consultas locales
+
+    def count(self) -> int:
+        with sqlite_db.get_pool().connection() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM airtable_mirror WHERE table_key = ?", (self.table_key,)
+            ).fetchone()[0]
+
+    def get_record(self, record_id: str) -> Optional[Dict[str, Any]]:
+        """Equivalente local de AirtableCRM.get_lead."""
+        with sqlite_db.get_pool().connection() as conn:
+            row = conn.execute(
+                "SELECT record_id, fields, created_time FROM airtable_mirror WHERE record_id = ? AND table_key = ?",
+                (record_id, self.table_key),
+            ).fetchone()
+        return _record(row) if row is not None else None
+
+    def find_by_name(self, name: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Registros cuyo nombre empieza por `name`, sin importar acentos ni mayúsculas (usa el índice)."""
+        key = sqlite_db.normalize_name(name)
+        if not key:
+            return []
+        with sqlite_db.get_pool().connection() as conn:
+            rows = conn.execute(
+                "SELECT record_id, fields, created_time FROM airtable_mirror "
+                "WHERE table_key = ? AND nombre_norm >= ? AND nombre_norm < ? "
+                "ORDER BY nombre_norm != ?, nombre_norm LIMIT ?",
+                (self.table_key, key, key + "\uffff", key, limit),
+            ).fetchall()
+        return [_record(row) for row in rows]
+
+    def find_by_field(self, field: str, value: Any, limit: int = 50) -> List[Dict[str, Any]]:
+        """Registros con `field` igual a `value` (consulta local sobre el JSON de campos)."""
+        with sqlite_db.get_pool().connection() as conn:
+            rows = conn.execute(
+                "SELECT record_id, fields, created_time FROM airtable_mirror "
+                "WHERE table_key = ? AND json_extract(fields, ?) = ? LIMIT ?",
+                (self.table_key, f'$."{field}"', value, limit),
+            ).fetchall()
+        return [_record(row) for row in rows]
+
+    async def async_find_by_name(self, name: str, limit: int = 5) -> List[Dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.find_by_name, name, limit)
+
+    async def async_get_record(self, record_id: str) -> Optional[Dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.get_record, record_id)
@@ -0,0 +1,310 @@
+# airtable_scheduler.py
+#
+# Planificador por lotes con token bucket delante de AirtableCRM (vía AsyncAirtableCRM).
+# Airtable limita las peticiones por base y por segundo y acepta hasta 10 registros por
+# creación/actualización. En lugar de una petición por lead, el planificador acumula las
+# creaciones y actualizaciones pendientes, las envía en lotes de 10 al ritmo permitido,
+# reintenta los lotes limitados (429) y resuelve el resultado de cada registro por separado.
+#
+#   crm = AsyncAirtableCRM(api_key, base_id, "Leads", max_retries=0)
+#   scheduler = AirtableBatchScheduler(crm)
+#   result = await scheduler.create({"Nombre": "Juan Pérez", "Empresa": "Empresa XYZ"})
+#   # {"status": "success", "record": {...}} o {"status": "error", "message": "..."}
+
+import asyncio
+import logging
+import time
+import weakref
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+import httpx
+
+from agent.async_crm import AIRTABLE_MAX_RECORDS, AsyncAirtableCRM
+
+logger = logging.getLogger("AirtableBatchScheduler")
+
+AIRTABLE_RATE_PER_BASE = 5.0   # peticiones por segundo y base
+AIRTABLE_THROTTLE_PENALTY = 30.0  # segundos que Airtable bloquea la base tras un 429
+
+class TokenBucket:
+    """
+    Token bucket asíncrono: `rate` tokens por segundo, ráfagas de hasta `capacity`.
+    Los tokens se comparten entre event loops (v1, v2, tests), pero el asyncio.Lock se crea
+    para cada loop que lo usa: un lock queda ligado al primer loop que espera en él.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+    def _lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        lock = self._locks.get(loop)
+        if lock is None:
+            lock = self._locks[loop] = asyncio.Lock()
+        return lock
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        async with self._lock():
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def drain(self) -> None:
+        """Vacía el bucket (por ejemplo, tras un 429 para no insistir enseguida)."""
+        self._refill()
+        self._tokens = min(self._tokens, 0.0)
+
+_buckets: Dict[str, TokenBucket] = {}
+
+def bucket_for_base(base_id: str, rate: float = AIRTABLE_RATE_PER_BASE) -> TokenBucket:
+    """Bucket compartido por todos los planificadores que escriben en la misma base."""
+    if base_id not in _buckets:
+        _buckets[base_id] = TokenBucket(rate)
+    return _buckets[base_id]
+
+class _PendingRecord:
+    __slots__ = ("kind", "record_id", "fields", "futures", "attempts", "isolated")
+
+    def __init__(self, kind: str, record_id: Optional[str], fields: dict, future: asyncio.Future):
+        self.kind = kind
+        self.record_id = record_id
+        self.fields = fields
+        self.futures = [future]
+        self.attempts = 0
+        self.isolated = False   # salió de un lote rechazado: se envía solo hasta que se resuelva
+
+    def resolve(self, outcome: Dict[str, Any]) -> None:
+        for future in self.futures:
+            if not future.done():
+                future.set_result(outcome)
+
+class AirtableBatchScheduler:
+    """
+    Agrupa creaciones/actualizaciones de Airtable en lotes de hasta 10 registros y las
+    envía al ritmo del token bucket de la base.
+
+    - Las actualizaciones pendientes del mismo registro se fusionan en una sola.
+    - Un 429 pausa la base `throttle_penalty` segundos y reencola el lote; los 5xx y los
+      errores de red se reintentan con backoff, hasta `max_attempts` intentos por registro.
+    - Si Airtable rechaza un lote (422, etc.), sus registros se reenvían de uno en uno para
+      que solo falle el registro inválido; siguen por esa vía individual también en los
+      reintentos, sin volver a mezclarse con registros sanos.
+    Cada llamada a create/update devuelve el resultado de su propio registro.
+    """
+
+    def __init__(
+        self,
+        crm: AsyncAirtableCRM,
+        rate_per_second: float = AIRTABLE_RATE_PER_BASE,
+        batch_size: int = AIRTABLE_MAX_RECORDS,
+        max_wait: float = 0.05,
+        max_attempts: int = 5,
+        throttle_penalty: float = AIRTABLE_THROTTLE_PENALTY,
+        retry_backoff: float = 1.0,
+        bucket: Optional[TokenBucket] = None,
+    ):
+        self.crm = crm
+        self.batch_size = min(batch_size, AIRTABLE_MAX_RECORDS)
+        self.max_wait = max_wait
+        self.max_attempts = max_attempts
+        self.throttle_penalty = throttle_penalty
+        self.retry_backoff = retry_backoff
+        self.bucket = bucket or bucket_for_base(crm.base_id, rate_per_second)
+        self._creates: Deque[_PendingRecord] = deque()
+        self._updates: "OrderedDict[str, _PendingRecord]" = OrderedDict()
+        self._isolated: Deque[_PendingRecord] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._in_flight: set = set()
+        self._paused_until = 0.0
+        self._closing = False
+        self.requests = 0
+        self.records_ok = 0
+        self.records_failed = 0
+        self.throttled = 0
+        self.retried_batches = 0
+        self.split_batches = 0
+
+    # API pública
+
+    async def create(self, fields: dict) -> Dict[str, Any]:
+        """Encola la creación de un registro y espera su resultado."""
+        future = self._enqueue(_PendingRecord("create", None, fields, self._new_future()))
+        return await future
+
+    async def update(self, record_id: str, fields: dict) -> Dict[str, Any]:
+        """Encola la actualización de un registro (fusionándola con otra pendiente) y espera su resultado."""
+        future = self._new_future()
+        pending = self._updates.get(record_id)
+        if pending is not None:
+            pending.fields = {**pending.fields, **fields}
+            pending.futures.append(future)
+            self._wake()
+        else:
+            self._enqueue(_PendingRecord("update", record_id, fields, future))
+        return await future
+
+    async def close(self) -> None:
+        """Espera a que se envíe todo lo pendiente y detiene el planificador."""
+        self._closing = True
+        if self._task is not None:
+            self._wake()
+            await self._task
+            self._task = None
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "pending": len(self._creates) + len(self._updates) + len(self._isolated),
+            "in_flight": len(self._in_flight),
+            "requests": self.requests,
+            "records_ok": self.records_ok,
+            "records_failed": self.records_failed,
+            "avg_batch_size": (self.records_ok + self.records_failed) / self.requests if self.requests else 0.0,
+            "throttled": self.throttled,
+            "retried_batches": self.retried_batches,
+            "split_batches": self.split_batches,
+        }
+
+    # Internos
+
+    def _new_future(self) -> asyncio.Future:
+        if self._task is None or self._task.done():
+            self._closing = False
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="AirtableBatchScheduler")
+        return asyncio.get_running_loop().create_future()
+
+    def _wake(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _enqueue(self, record: _PendingRecord) -> asyncio.Future:
+        if record.kind == "create":
+            self._creates.append(record)
+        else:
+            self._updates[record.record_id] = record
+        self._wake()
+        return record.futures[0]
+
+    def _pending(self) -> int:
+        return len(self._creates) + len(self._updates) + len(self._isolated)
+
+    def _take_batch(self) -> List[_PendingRecord]:
+        if self._isolated:
+            return [self._isolated.popleft()]
+        if len(self._creates) >= len(self._updates):
+            return [self._creates.popleft() for _ in range(min(self.batch_size, len(self._creates)))]
+        batch = []
+        while self._updates and len(batch) < self.batch_size:
+            batch.append(self._updates.popitem(last=False)[1])
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while not (self._closing and self._pending() == 0 and not self._in_flight):
+            if self._pending() == 0:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            if not self._closing and max(len(self._creates), len(self._updates)) < self.batch_size:
+                await asyncio.sleep(self.max_wait)  # deja llegar más registros al lote
+            pause = self._paused_until - loop.time()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            await self.bucket.acquire()
+            batch = self._take_batch()
+            if batch:
+                task = loop.create_task(self._send(batch))
+                self._in_flight.add(task)
+                task.add_done_callback(self._on_sent)
+
+    def _on_sent(self, task: asyncio.Task) -> None:
+        self._in_flight.discard(task)
+        self._wake()
+
+    async def _send(self, batch: List[_PendingRecord]) -> None:
+        self.requests += 1
+        try:
+            if batch[0].kind == "create":
+                data = await self.crm.create_records([record.fields for record in batch])
+            else:
+                data = await self.crm.update_records([(record.record_id, record.fields) for record in batch])
+        except httpx.HTTPStatusError as e:
+            status = e.response.status_code
+            if status == 429:
+                self.throttled += 1
+                self._throttle(self.throttle_penalty)
+                self._retry(batch, e)
+            elif status >= 500:
+                self._retry(batch, e)
+            elif len(batch) > 1:
+                self.split_batches += 1
+                logger.warning("Lote rechazado (%s); reenviando %d registros por separado.", status, len(batch))
+                for record in batch:
+                    record.isolated = True
+                self._isolated.extend(batch)
+                self._wake()
+            else:
+                self._fail(batch, e)
+            return
+        except httpx.HTTPError as e:
+            self._retry(batch, e)
+            return
+
+        records = data.get("records", [])
+        for record, result in zip(batch, records):
+            record.resolve({"status": "success", "record": result})
+        self.records_ok += min(len(batch), len(records))
+        if len(records) < len(batch):
+            self._fail(batch[len(records):], RuntimeError("Airtable no devolvió el registro."))
+
+    def _throttle(self, seconds: float) -> None:
+        loop = asyncio.get_running_loop()
+        self._paused_until = max(self._paused_until, loop.time() + seconds)
+        self.bucket.drain()
+
+    def _retry(self, batch: List[_PendingRecord], error: Exception) -> None:
+        retry = [record for record in batch if record.attempts + 1 < self.max_attempts]
+        self._fail([record for record in batch if record not in retry], error)
+        if not retry:
+            return
+        self.retried_batches += 1
+        attempt = max(record.attempts for record in retry)
+        self._throttle(self.retry_backoff * (2 ** attempt))
+        logger.warning("Reintentando lote de %d registros (intento %d): %s", len(retry), attempt + 2, error)
+        for record in reversed(retry):
+            record.attempts += 1
+            if record.isolated:
+                self._isolated.appendleft(record)
+            elif record.kind == "create":
+                self._creates.appendleft(record)
+            elif record.record_id in self._updates:
+                newer = self._updates[record.record_id]
+                newer.fields = {**record.fields, **newer.fields}
+                newer.futures.extend(record.futures)
+            else:
+                self._updates[record.record_id] = record
+                self._updates.move_to_end(record.record_id, last=False)
+        self._wake()
+
+    def _fail(self, batch: List[_PendingRecord], error: Exception) -> None:
+        for record in batch:
+            logger.error("No se pudo sincronizar el registro %s: %s", record.record_id or "(nuevo)", error)
+            record.resolve({"status": "error", "message": str(error)})
+        self.records_failed += len(batch)
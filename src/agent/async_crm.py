@@ -0,0 +1,244 @@
+# async_crm.py
+#
+# Variantes asyncio de HubSpotCRMClient (crm.py) y AirtableCRM (crm_connector.py) para
+# llamarlas desde function_tools sin bloquear el event loop que reproduce el audio.
+# Ambos clientes comparten un httpx.AsyncClient con pool de conexiones keep-alive, limitan
+# la concurrencia con un semáforo y aplican un timeout por petición. Varias operaciones
+# pueden lanzarse a la vez con asyncio.gather:
+#
+#   results = await asyncio.gather(
+#       hubspot.create_or_update_lead(lead),
+#       airtable.create_lead(fields),
+#       return_exceptions=True,
+#   )
+
+import asyncio
+import logging
+import random
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+
+from agent.crm import (
+    BATCH_UPSERT_LIMIT,
+    DEFAULT_BASE_URL,
+    RETRY_STATUSES,
+    contact_email,
+    contact_properties,
+)
+from agent.crm_connector import AIRTABLE_API_URL
+from agent.idempotency import IdempotencyStore, default_store
+
+logger = logging.getLogger("AsyncCRM")
+
+DEFAULT_TIMEOUT = 10.0
+DEFAULT_MAX_CONCURRENCY = 10
+MAX_RETRY_AFTER = 30.0
+AIRTABLE_MAX_RECORDS = 10  # registros máximos por petición de creación/actualización en Airtable
+AIRTABLE_PAGE_SIZE = 100   # registros máximos por página al listar una tabla
+
+_shared_client: Optional[httpx.AsyncClient] = None
+
+def get_shared_client() -> httpx.AsyncClient:
+    """Cliente HTTP asíncrono compartido por todos los clientes CRM del proceso."""
+    global _shared_client
+    if _shared_client is None or _shared_client.is_closed:
+        _shared_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+            timeout=DEFAULT_TIMEOUT,
+        )
+    return _shared_client
+
+async def aclose_shared_client() -> None:
+    """Cierra el cliente compartido (por ejemplo, al salir del asistente)."""
+    global _shared_client
+    if _shared_client is not None:
+        await _shared_client.aclose()
+        _shared_client = None
+
+def _retry_delay(response: Optional[httpx.Response], attempt: int, backoff_factor: float) -> float:
+    """Usa Retry-After si el servidor lo indica; si no, backoff exponencial con jitter."""
+    if response is not None:
+        retry_after = response.headers.get("Retry-After", "")
+        if retry_after.replace(".", "", 1).isdigit():
+            return min(float(retry_after), MAX_RETRY_AFTER)
+    return backoff_factor * (2 ** attempt) * (0.5 + random.random() / 2)
+
+class AsyncCRMClient:
+    """
+    Base de los clientes CRM asíncronos: concurrencia acotada, timeout por petición y
+    reintentos ante 429/5xx o errores de red respetando Retry-After.
+    """
+
+    def __init__(
+        self,
+        client: Optional[httpx.AsyncClient] = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        timeout: float = DEFAULT_TIMEOUT,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        idempotency: Optional[IdempotencyStore] = default_store,
+    ):
+        self._client = client
+        self.idempotency = idempotency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self._client if self._client is not None else get_shared_client()
+
+    async def request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        """Envía la petición con reintentos; lanza httpx.HTTPError si finalmente falla."""
+        for attempt in range(self.max_retries + 1):
+            response = None
+            try:
+                async with self._semaphore:
+                    response = await self.client.request(method, url, timeout=self.timeout, **kwargs)
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    response.raise_for_status()
+                    return response
+            except httpx.TransportError:
+                if attempt == self.max_retries:
+                    raise
+            delay = _retry_delay(response, attempt, self.backoff_factor)
+            logger.warning("Reintentando %s %s en %.2fs (intento %d)", method, url, delay, attempt + 1)
+            await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
+
+class AsyncHubSpotCRMClient(AsyncCRMClient):
+    """Versión asíncrona de HubSpotCRMClient, con el mismo formato de respuesta."""
+
+    def __init__(self, api_key: str, base_url: str = DEFAULT_BASE_URL, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.params = {"hapikey": api_key}
+
+    async def create_or_update_lead(self, lead_info: Dict[str, Any]) -> Dict[str, Any]:
+        if self.idempotency is None:
+            return await self._create_or_update_lead(lead_info)
+        return await self.idempotency.arun_once("hubspot", lead_info, lambda: self._create_or_update_lead(lead_info))
+
+    async def _create_or_update_lead(self, lead_info: Dict[str, Any]) -> Dict[str, Any]:
+        email = contact_email(lead_info)
+        endpoint = f"{self.base_url}/contacts/v1/contact/createOrUpdate/email/{email}/"
+        properties = [
+            {"property": name, "value": value}
+            for name, value in contact_properties(lead_info).items()
+        ]
+        try:
+            response = await self.request("POST", endpoint, params=self.params, json={"properties": properties})
+            logger.info("Contacto actualizado/creado exitosamente: %s", email)
+            return {"status": "success", "data": response.json()}
+        except httpx.HTTPStatusError as http_err:
+            logger.error("HTTP error: %s - %s", http_err, http_err.response.text)
+            return {"status": "error", "message": f"HTTP error: {http_err}"}
+        except httpx.HTTPError as err:
+            logger.error("Network error: %s", err)
+            return {"status": "error", "message": f"Network error: {err}"}
+
+    async def _upsert_chunk(self, start: int, chunk: List[Dict[str, Any]]) -> Dict[str, Any]:
+        inputs = []
+        for lead_info in chunk:
+            email = contact_email(lead_info)
+            inputs.append({
+                "idProperty": "email",
+                "id": email,
+                "properties": {"email": email, **contact_properties(lead_info)},
+            })
+        endpoint = f"{self.base_url}/crm/v3/objects/contacts/batch/upsert"
+        try:
+            response = await self.request("POST", endpoint, params=self.params, json={"inputs": inputs})
+            return {"results": response.json().get("results", [])}
+        except httpx.HTTPError as err:
+            logger.error("Error en el lote que empieza en %d: %s", start, err)
+            return {"error": {"offset": start, "size": len(chunk), "message": str(err)}}
+
+    async def create_or_update_leads(
+        self, batch: Iterable[Dict[str, Any]], chunk_size: int = BATCH_UPSERT_LIMIT
+    ) -> Dict[str, Any]:
+        """Upsert por lotes como HubSpotCRMClient.create_or_update_leads, con los lotes en paralelo."""
+        chunk_size = min(chunk_size, BATCH_UPSERT_LIMIT)
+        leads = list(batch)
+        outcomes = await asyncio.gather(*(
+            self._upsert_chunk(start, leads[start:start + chunk_size])
+            for start in range(0, len(leads), chunk_size)
+        ))
+        results = [item for outcome in outcomes for item in outcome.get("results", [])]
+        errors = [outcome["error"] for outcome in outcomes if "error" in outcome]
+        status = "success" if not errors else ("partial" if results else "error")
+        return {"status": status, "data": results, "errors": errors}
+
+class AsyncAirtableCRM(AsyncCRMClient):
+    """Versión asíncrona de AirtableCRM, con el mismo formato de respuesta."""
+
+    def __init__(self, api_key: str, base_id: str, table_name: str, api_url: str = AIRTABLE_API_URL, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.api_key = api_key
+        self.base_id = base_id
+        self.table_name = table_name
+        self.endpoint = f"{api_url.rstrip('/')}/{base_id}/{table_name}"
+        self.headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        }
+
+    async def _call(self, method: str, url: str, action: str, **kwargs: Any) -> dict:
+        try:
+            response = await self.request(method, url, headers=self.headers, **kwargs)
+            logger.info("Lead %s exitosamente.", action)
+            return response.json()
+        except httpx.HTTPError as e:
+            logger.error("Error: lead no %s: %s", action, e)
+            return {"error": str(e)}
+
+    async def create_lead(self, lead_info: dict) -> dict:
+        if self.idempotency is None:
+            return await self._create_lead(lead_info)
+        return await self.idempotency.arun_once(f"airtable:{self.endpoint}", lead_info, lambda: self._create_lead(lead_info))
+
+    async def _create_lead(self, lead_info: dict) -> dict:
+        return await self._call("POST", self.endpoint, "creado", json={"fields": lead_info})
+
+    async def update_lead(self, record_id: str, lead_info: dict) -> dict:
+        return await self._call("PATCH", f"{self.endpoint}/{record_id}", "actualizado", json={"fields": lead_info})
+
+    async def get_lead(self, record_id: str) -> dict:
+        return await self._call("GET", f"{self.endpoint}/{record_id}", "obtenido")
+
+    async def create_records(self, records: List[dict]) -> dict:
+        """
+        Crea hasta AIRTABLE_MAX_RECORDS registros en una sola petición. A diferencia de
+        create_lead, lanza httpx.HTTPError si falla, para que quien agrupa decida si reintentar.
+        """
+        payload = {"records": [{"fields": fields} for fields in records]}
+        response = await self.request("POST", self.endpoint, headers=self.headers, json=payload)
+        return response.json()
+
+    async def update_records(self, records: List[Tuple[str, dict]]) -> dict:
+        """Actualiza hasta AIRTABLE_MAX_RECORDS registros (record_id, campos) en una sola petición."""
+        payload = {"records": [{"id": record_id, "fields": fields} for record_id, fields in records]}
+        response = await self.request("PATCH", self.endpoint, headers=self.headers, json=payload)
+        return response.json()
+
+    async def iter_record_pages(
+        self, filter_formula: Optional[str] = None, page_size: int = AIRTABLE_PAGE_SIZE
+    ) -> AsyncIterator[List[dict]]:
+        """
+        Recorre la tabla página a página siguiendo el token `offset` de Airtable, sin cargarla
+        entera en memoria. Lanza httpx.HTTPError si una página falla.
+        """
+        params: Dict[str, Any] = {"pageSize": min(page_size, AIRTABLE_PAGE_SIZE)}
+        if filter_formula:
+            params["filterByFormula"] = filter_formula
+        while True:
+            response = await self.request("GET", self.endpoint, headers=self.headers, params=params)
+            data = response.json()
+            yield data.get("records", [])
+            offset = data.get("offset")
+            if not offset:
+                return
+            params["offset"] = offset
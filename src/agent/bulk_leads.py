@@ -0,0 +1,141 @@
+# bulk_leads.py
+#
+# Importación/exportación masiva de leads en CSV o JSONL, en streaming.
+#
+#   python -m agent.bulk_leads import leads.csv
+#   python -m agent.bulk_leads import llamadas.jsonl --db otra.db --chunk-size 10000
+#   python -m agent.bulk_leads export leads.jsonl
+#   python -m agent.bulk_leads export - --format csv > leads.csv
+
+import argparse
+import csv
+import json
+import logging
+import sys
+import time
+from contextlib import nullcontext
+from typing import Any, Dict, Iterable, Iterator, Optional, TextIO, Union
+
+from agent import sqlite_db
+from nlp.entity_extraction import extract_lead_info
+
+logger = logging.getLogger("bulk_leads")
+
+# Nombres alternativos que usan otros sistemas (y extract_lead_info) para cada campo
+FIELD_ALIASES = {
+    "nombre": ("nombre", "name", "Nombre", "Name"),
+    "empresa": ("empresa", "company", "Empresa", "Company"),
+    "necesidades": ("necesidades", "needs", "description", "Necesidades"),
+    "presupuesto": ("presupuesto", "budget", "Presupuesto", "Budget"),
+}
+TEXT_KEYS = ("texto", "text", "transcript")
+EXPORT_COLUMNS = ("id",) + sqlite_db.LEAD_FIELDS
+
+def _pick(row: Dict[str, str], field: str) -> str:
+    for key in FIELD_ALIASES[field]:
+        value = row.get(key)
+        if value:
+            return str(value).strip()
+    return ""
+
+def normalize_row(row: Union[Dict[str, str], str, Any]) -> Optional[Dict[str, str]]:
+    """
+    Convierte una fila de entrada en un lead de la tabla leads.
+    Las filas de texto libre (un string JSON o una columna texto/text/transcript sin nombre)
+    se normalizan con extract_lead_info. Devuelve None si no se puede obtener un nombre o si
+    la fila no es ni un objeto ni un string (p. ej. una lista o un número en el JSONL).
+    """
+    if isinstance(row, str):
+        row = {"texto": row}
+    elif not isinstance(row, dict):
+        logger.warning("Fila ignorada: se esperaba un objeto o un texto, no %s.", type(row).__name__)
+        return None
+    text = next((row[key] for key in TEXT_KEYS if row.get(key)), None)
+    if text and not _pick(row, "nombre"):
+        extracted = extract_lead_info(text)
+        row = {**extracted, **{k: v for k, v in row.items() if v and k not in TEXT_KEYS}}
+        row.setdefault("necesidades", text)
+    lead = {field: _pick(row, field) for field in FIELD_ALIASES}
+    return lead if lead["nombre"] else None
+
+def read_rows(stream: TextIO, fmt: str) -> Iterator[Union[Dict[str, str], str]]:
+    """Lee las filas una a una, sin cargar el archivo completo."""
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+def import_leads(stream: TextIO, fmt: str, chunk_size: int = sqlite_db.BULK_CHUNK_SIZE) -> Dict[str, float]:
+    """Importa un archivo CSV/JSONL en streaming y devuelve las estadísticas de la carga."""
+    skipped = 0
+
+    def leads() -> Iterable[Dict[str, str]]:
+        nonlocal skipped
+        for row in read_rows(stream, fmt):
+            lead = normalize_row(row)
+            if lead is None:
+                skipped += 1
+                continue
+            yield lead
+
+    start = time.perf_counter()
+    imported = sqlite_db.insert_leads_many(leads(), chunk_size)
+    elapsed = time.perf_counter() - start
+    return {
+        "imported": imported,
+        "skipped": skipped,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(imported / elapsed, 1) if elapsed else 0.0,
+    }
+
+def export_leads(stream: TextIO, fmt: str) -> int:
+    """Exporta todos los leads en streaming (paginación por id). Devuelve cuántos escribió."""
+    count = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(stream, fieldnames=EXPORT_COLUMNS)
+        writer.writeheader()
+        for lead in sqlite_db.iter_leads(columns=EXPORT_COLUMNS):
+            writer.writerow(lead)
+            count += 1
+    else:
+        for lead in sqlite_db.iter_leads(columns=EXPORT_COLUMNS):
+            stream.write(json.dumps(lead, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+def _detect_format(path: str, fmt: Optional[str]) -> str:
+    if fmt:
+        return fmt
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Importa o exporta leads masivamente (CSV/JSONL).")
+    parser.add_argument("command", choices=("import", "export"))
+    parser.add_argument("path", help="Archivo de entrada/salida ('-' para stdin/stdout).")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="Por defecto se deduce de la extensión.")
+    parser.add_argument("--db", default=sqlite_db.DB_NAME, help="Base de datos SQLite (por defecto leads.db).")
+    parser.add_argument("--chunk-size", type=int, default=sqlite_db.BULK_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    sqlite_db.DB_NAME = args.db
+    sqlite_db.init_db()
+    fmt = _detect_format(args.path, args.format)
+
+    if args.command == "import":
+        stream = nullcontext(sys.stdin) if args.path == "-" else open(args.path, newline="", encoding="utf-8")
+        with stream as source:
+            stats = import_leads(source, fmt, args.chunk_size)
+        logger.info("Importación completada: %s", stats)
+    else:
+        stream = nullcontext(sys.stdout) if args.path == "-" else open(args.path, "w", newline="", encoding="utf-8")
+        with stream as target:
+            count = export_leads(target, fmt)
+        logger.info("Exportación completada: %d leads.", count)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,55 @@
 import requests
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, List, Optional
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from agent.idempotency import IdempotencyStore, default_store
 
 logger = logging.getLogger("HubSpotCRMClient")
 logger.setLevel(logging.INFO)
 
+DEFAULT_BASE_URL = "https://api.hubapi.com"
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+BATCH_UPSERT_LIMIT = 100  # máximo de contactos por llamada a los endpoints batch de HubSpot
+
+def build_session(
+    max_retries: int = 3,
+    backoff_factor: float = 0.5,
+    pool_maxsize: int = 10,
+) -> requests.Session:
+    """
+    Crea una sesión HTTP con conexiones keep-alive reutilizables y reintentos con backoff
+    exponencial ante 429/5xx. Los reintentos respetan la cabecera Retry-After.
+    """
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"GET", "POST", "PUT", "PATCH", "DELETE"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def contact_email(lead_info: Dict[str, Any]) -> str:
+    """Email del lead; si no se proporciona, se genera a partir del nombre."""
+    nombre = lead_info.get("nombre", "desconocido").strip().replace(" ", ".").lower()
+    return lead_info.get("email", f"{nombre}@example.com")
+
+def contact_properties(lead_info: Dict[str, Any]) -> Dict[str, str]:
+    """Propiedades de contacto de HubSpot a partir de los campos del lead."""
+    return {
+        "firstname": lead_info.get("nombre", ""),
+        "company": lead_info.get("empresa", ""),
+        "description": lead_info.get("necesidades", ""),
+        "budget": lead_info.get("presupuesto", ""),
+    }
+
 class HubSpotCRMClient:
     """
     Cliente para interactuar con el CRM de HubSpot.
@@ -12,10 +57,37 @@ class HubSpotCRMClient:
     Este cliente permite crear o actualizar un contacto en HubSpot utilizando el endpoint
     'createOrUpdate'. Se utiliza un email (generado a partir del nombre si no se proporciona)
     como identificador único del contacto.
+
+    Todas las peticiones comparten una sesión con pool de conexiones keep-alive y
+    reintentos con backoff (ver build_session). Para sincronizar muchos leads,
+    create_or_update_leads usa el endpoint batch de contactos.
     """
-    def __init__(self, api_key: str):
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = DEFAULT_BASE_URL,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        pool_maxsize: int = 10,
+        timeout: float = 10,
+        idempotency: Optional[IdempotencyStore] = default_store,
+    ):
         self.api_key = api_key
-        self.base_url = "https://api.hubapi.com"
+        self.idempotency = idempotency
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = build_session(max_retries, backoff_factor, pool_maxsize)
+        self.session.params = {"hapikey": self.api_key}
+
+    def close(self) -> None:
+        """Cierra las conexiones del pool."""
+        self.session.close()
+
+    def __enter__(self) -> "HubSpotCRMClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
     
     def create_or_update_lead(self, lead_info: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -28,6 +100,8 @@ class HubSpotCRMClient:
           - presupuesto
           
         Si no se proporciona un email en lead_info, se genera uno automáticamente.
+        Un lead idéntico enviado dentro de la ventana de idempotencia no se reenvía:
+        se devuelve el resultado del primer envío (ver agent.idempotency).
         
         Parámetros:
             lead_info (dict): Información del lead.
@@ -35,25 +109,26 @@ class HubSpotCRMClient:
         Retorna:
             dict: Resultado de la operación con estado y datos o mensaje de error.
         """
+        if self.idempotency is None:
+            return self._create_or_update_lead(lead_info)
+        return self.idempotency.run_once("hubspot", lead_info, lambda: self._create_or_update_lead(lead_info))
+
+    def _create_or_update_lead(self, lead_info: Dict[str, Any]) -> Dict[str, Any]:
         # Generar un email a partir del nombre si no se especifica
-        nombre = lead_info.get("nombre", "desconocido").strip().replace(" ", ".").lower()
-        email = lead_info.get("email", f"{nombre}@example.com")
+        email = contact_email(lead_info)
         
         # Construir el endpoint para crear/actualizar el contacto
         endpoint = f"{self.base_url}/contacts/v1/contact/createOrUpdate/email/{email}/"
-        params = {"hapikey": self.api_key}
         
         # Construir el payload con las propiedades del contacto
         properties = [
-            {"property": "firstname", "value": lead_info.get("nombre", "")},
-            {"property": "company", "value": lead_info.get("empresa", "")},
-            {"property": "description", "value": lead_info.get("necesidades", "")},
-            {"property": "budget", "value": lead_info.get("presupuesto", "")},
+            {"property": name, "value": value}
+            for name, value in contact_properties(lead_info).items()
         ]
         payload = {"properties": properties}
         
         try:
-            response = requests.post(endpoint, params=params, json=payload, timeout=10)
+            response = self.session.post(endpoint, json=payload, timeout=self.timeout)
             response.raise_for_status()  # Lanza error si la respuesta no es 2xx
             logger.info(f"Contacto actualizado/creado exitosamente: {response.json()}")
             return {"status": "success", "data": response.json()}
@@ -64,6 +139,57 @@ class HubSpotCRMClient:
             logger.error(f"Network error: {err}")
             return {"status": "error", "message": f"Network error: {err}"}
 
+    def create_or_update_leads(
+        self, batch: Iterable[Dict[str, Any]], chunk_size: int = BATCH_UPSERT_LIMIT
+    ) -> Dict[str, Any]:
+        """
+        Crea o actualiza varios contactos con el endpoint batch/upsert de HubSpot (v3),
+        usando el email como identificador, en bloques de hasta `chunk_size` contactos.
+
+        Parámetros:
+            batch (iterable): Leads con el mismo formato que en create_or_update_lead.
+            chunk_size (int): Contactos por petición (máximo 100 en HubSpot).
+
+        Retorna:
+            dict: "status" ("success", "partial" o "error"), "data" con los contactos
+            confirmados por HubSpot y "errors" con un mensaje por bloque fallido.
+        """
+        endpoint = f"{self.base_url}/crm/v3/objects/contacts/batch/upsert"
+        chunk_size = min(chunk_size, BATCH_UPSERT_LIMIT)
+        leads = list(batch)
+        results: List[Dict[str, Any]] = []
+        errors: List[Dict[str, Any]] = []
+
+        for start in range(0, len(leads), chunk_size):
+            chunk = leads[start:start + chunk_size]
+            inputs = []
+            for lead_info in chunk:
+                email = contact_email(lead_info)
+                inputs.append({
+                    "idProperty": "email",
+                    "id": email,
+                    "properties": {"email": email, **contact_properties(lead_info)},
+                })
+            try:
+                response = self.session.post(endpoint, json={"inputs": inputs}, timeout=self.timeout)
+                response.raise_for_status()
+                results.extend(response.json().get("results", []))
+            except requests.exceptions.HTTPError as http_err:
+                logger.error(f"HTTP error en el lote {start // chunk_size}: {http_err} - {response.text}")
+                errors.append({"offset": start, "size": len(chunk), "message": f"HTTP error: {http_err}"})
+            except requests.exceptions.RequestException as err:
+                logger.error(f"Network error en el lote {start // chunk_size}: {err}")
+                errors.append({"offset": start, "size": len(chunk), "message": f"Network error: {err}"})
+
+        if not errors:
+            status = "success"
+        elif results:
+            status = "partial"
+        else:
+            status = "error"
+        logger.info(f"Upsert por lotes: {len(results)} contactos confirmados, {len(errors)} lotes fallidos.")
+        return {"status": status, "data": results, "errors": errors}
+
 # Ejemplo de uso y pruebas unitarias simples
 if __name__ == "__main__":
     # Reemplaza 'YOUR_HUBSPOT_API_KEY' con tu API key real de HubSpot
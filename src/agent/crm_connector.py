@@ -3,10 +3,15 @@
 import os
 import requests
 import logging
+from typing import Optional
+
+from agent.idempotency import IdempotencyStore, default_store
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("AirtableCRM")
 
+AIRTABLE_API_URL = "https://api.airtable.com/v0"
+
 class AirtableCRM:
     """
     Módulo para interactuar con Airtable como sistema CRM.
@@ -16,11 +21,19 @@ class AirtableCRM:
       - Nombre de la tabla (por ejemplo, "Leads")
     """
 
-    def __init__(self, api_key: str, base_id: str, table_name: str):
+    def __init__(
+        self,
+        api_key: str,
+        base_id: str,
+        table_name: str,
+        api_url: str = AIRTABLE_API_URL,
+        idempotency: Optional[IdempotencyStore] = default_store,
+    ):
         self.api_key = api_key
+        self.idempotency = idempotency
         self.base_id = base_id
         self.table_name = table_name
-        self.endpoint = f"https://api.airtable.com/v0/{self.base_id}/{self.table_name}"
+        self.endpoint = f"{api_url.rstrip('/')}/{self.base_id}/{self.table_name}"
         self.headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
@@ -30,7 +43,14 @@ class AirtableCRM:
         """
         Crea un nuevo registro en Airtable con la información del lead.
         lead_info debe ser un diccionario con los campos correspondientes.
+        Si el mismo lead ya se creó dentro de la ventana de idempotencia, no se crea otro
+        registro: se devuelve la respuesta de la primera creación.
         """
+        if self.idempotency is None:
+            return self._create_lead(lead_info)
+        return self.idempotency.run_once(f"airtable:{self.endpoint}", lead_info, lambda: self._create_lead(lead_info))
+
+    def _create_lead(self, lead_info: dict) -> dict:
         data = {"fields": lead_info}
         try:
             response = requests.post(self.endpoint, json=data, headers=self.headers, timeout=10)
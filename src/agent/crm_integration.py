@@ -1,6 +1,8 @@
 import requests  
 from agents import function_tool
 
+from agent.idempotency import default_store
+
 def _store_lead_in_crm(name: str, company: str, email: str, budget: str, timeline: str) -> dict:
     lead_data = {
         "name": name,
@@ -9,8 +11,13 @@ def _store_lead_in_crm(name: str, company: str, email: str, budget: str, timelin
         "budget": budget,
         "timeline": timeline,
     }
-    print("Guardando lead en el CRM (función pura):", lead_data)
-    return {"status": "success", "message": "Lead guardado exitosamente.", "lead": lead_data}
+
+    def store() -> dict:
+        print("Guardando lead en el CRM (función pura):", lead_data)
+        return {"status": "success", "message": "Lead guardado exitosamente.", "lead": lead_data}
+
+    # Un store_lead repetido con los mismos datos devuelve el resultado anterior
+    return default_store.run_once("crm_integration", lead_data, store)
 
 @function_tool
 def store_lead(name: str, company: str, email: str, budget: str, timeline: str) -> dict:
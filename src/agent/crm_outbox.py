@@ -0,0 +1,345 @@
+# crm_outbox.py
+#
+# Outbox transaccional para sincronizar leads con los CRM remotos en segundo plano.
+# La tool guarda el lead en SQLite y, en la misma transacción, deja una fila por CRM destino
+# en la tabla crm_outbox; la llamada vuelve en milisegundos. Un worker asíncrono vacía la
+# outbox por lotes, reintenta con backoff exponencial y manda a dead-letter las filas que
+# agotan sus intentos. La latencia del CRM remoto queda fuera del turno de voz.
+#
+#   worker = OutboxWorker({"hubspot": HubSpotOutboxSender(AsyncHubSpotCRMClient(api_key))})
+#   worker.start()
+#   await enqueue_lead(lead_info, ["hubspot"])   # guarda el lead y encola el envío
+#   worker.notify()
+#   worker.stats()  # backlog, lag, enviados, reintentos, dead-letter...
+
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from agent import idempotency, sqlite_db
+from agent.airtable_scheduler import AirtableBatchScheduler
+from agent.async_crm import AsyncAirtableCRM, AsyncHubSpotCRMClient
+
+logger = logging.getLogger("CRMOutbox")
+
+OUTBOX_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS crm_outbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        target TEXT NOT NULL,
+        idempotency_key TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        created_at REAL NOT NULL,
+        next_attempt_at REAL NOT NULL,
+        sent_at REAL,
+        last_error TEXT,
+        UNIQUE (target, idempotency_key)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_crm_outbox_due ON crm_outbox (status, target, next_attempt_at)",
+)
+
+OUTBOX_BATCH_SIZE = 50
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_BASE_BACKOFF = 2.0     # segundos; se duplica en cada intento
+OUTBOX_MAX_BACKOFF = 300.0
+OUTBOX_POLL_INTERVAL = 5.0    # revisión periódica de reintentos vencidos
+
+# Campos de la tabla leads -> columnas de la tabla de Airtable
+AIRTABLE_FIELDS = {"nombre": "Nombre", "empresa": "Empresa", "necesidades": "Necesidades", "presupuesto": "Presupuesto"}
+
+def init_outbox() -> None:
+    """Crea la tabla crm_outbox (y la de claves de idempotencia) en la base de datos de leads si no existen."""
+    with sqlite_db.get_pool().transaction() as conn:
+        for statement in OUTBOX_SCHEMA:
+            conn.execute(statement)
+        conn.execute(idempotency.IDEMPOTENCY_SCHEMA)
+
+def idempotency_key(target: str, payload: Dict[str, Any]) -> str:
+    """Hash determinista del envío: el mismo lead para el mismo CRM produce la misma clave."""
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(f"{target}\n{canonical}".encode("utf-8")).hexdigest()
+
+def enqueue(
+    conn: sqlite3.Connection,
+    target: str,
+    payload: Dict[str, Any],
+    key: Optional[str] = None,
+    window: Optional[float] = None,
+) -> bool:
+    """
+    Encola un envío dentro de la transacción abierta en `conn`.
+    Devuelve False si el mismo envío ya se encoló dentro de la ventana de idempotencia
+    (agent.idempotency, IDEMPOTENCY_WINDOW por defecto). Pasada la ventana, el mismo lead
+    puede volver a enviarse: la fila lleva la clave con la hora de encolado.
+    """
+    now = time.time()
+    key = key or idempotency_key(target, payload)
+    new, _ = idempotency.claim(conn, f"crm_outbox:{target}", key, window, now)
+    if not new:
+        return False
+    cursor = conn.execute(
+        "INSERT OR IGNORE INTO crm_outbox (target, idempotency_key, payload, created_at, next_attempt_at) "
+        "VALUES (?, ?, ?, ?, ?)",
+        (target, f"{key}@{now:.6f}", json.dumps(payload, ensure_ascii=False), now, now),
+    )
+    return cursor.rowcount == 1
+
+def _insert_lead_and_enqueue(conn: sqlite3.Connection, lead_info: Dict[str, str], targets: Sequence[str]) -> int:
+    sqlite_db._insert_lead(conn, lead_info)
+    return sum(enqueue(conn, target, dict(lead_info)) for target in targets)
+
+async def enqueue_lead(lead_info: Dict[str, str], targets: Sequence[str]) -> int:
+    """
+    Inserta el lead y encola su envío a cada CRM de `targets` en una sola transacción
+    (vía el escritor con group commit). Devuelve cuántos envíos nuevos se encolaron.
+    """
+    return await sqlite_db.writer.submit(_insert_lead_and_enqueue, lead_info, tuple(targets))
+
+def _due_items(target: str, now: float, limit: int) -> List[Dict[str, Any]]:
+    with sqlite_db.get_pool().connection() as conn:
+        rows = conn.execute(
+            "SELECT id, payload, attempts, created_at FROM crm_outbox "
+            "WHERE status = 'pending' AND target = ? AND next_attempt_at <= ? ORDER BY id LIMIT ?",
+            (target, now, limit),
+        ).fetchall()
+    return [
+        {"id": row[0], "payload": json.loads(row[1]), "attempts": row[2], "created_at": row[3]}
+        for row in rows
+    ]
+
+def outbox_stats(now: Optional[float] = None) -> Dict[str, Any]:
+    """Backlog por estado y antigüedad del envío pendiente más viejo (lag), leídos de la tabla."""
+    now = time.time() if now is None else now
+    with sqlite_db.get_pool().connection() as conn:
+        counts = dict(conn.execute("SELECT status, COUNT(*) FROM crm_outbox GROUP BY status").fetchall())
+        oldest = conn.execute("SELECT MIN(created_at) FROM crm_outbox WHERE status = 'pending'").fetchone()[0]
+    return {
+        "pending": counts.get("pending", 0),
+        "sent": counts.get("sent", 0),
+        "dead": counts.get("dead", 0),
+        "lag_seconds": round(now - oldest, 3) if oldest is not None else 0.0,
+    }
+
+def dead_letters(limit: int = 50) -> List[Dict[str, Any]]:
+    """Envíos que agotaron sus intentos, con el último error."""
+    with sqlite_db.get_pool().connection() as conn:
+        rows = conn.execute(
+            "SELECT id, target, payload, attempts, last_error FROM crm_outbox "
+            "WHERE status = 'dead' ORDER BY id LIMIT ?",
+            (limit,),
+        ).fetchall()
+    return [
+        {"id": row[0], "target": row[1], "payload": json.loads(row[2]), "attempts": row[3], "last_error": row[4]}
+        for row in rows
+    ]
+
+def requeue_dead(ids: Optional[Iterable[int]] = None) -> int:
+    """Devuelve a la cola los envíos en dead-letter (todos o los indicados). Devuelve cuántos."""
+    now = time.time()
+    with sqlite_db.get_pool().transaction() as conn:
+        if ids is None:
+            cursor = conn.execute(
+                "UPDATE crm_outbox SET status = 'pending', attempts = 0, next_attempt_at = ? WHERE status = 'dead'",
+                (now,),
+            )
+        else:
+            cursor = conn.executemany(
+                "UPDATE crm_outbox SET status = 'pending', attempts = 0, next_attempt_at = ? "
+                "WHERE status = 'dead' AND id = ?",
+                [(now, item_id) for item_id in ids],
+            )
+        return cursor.rowcount
+
+class HubSpotOutboxSender:
+    """Envía los leads de la outbox con el upsert por lotes de HubSpot (idempotente por email)."""
+
+    def __init__(self, client: AsyncHubSpotCRMClient):
+        self.client = client
+
+    async def send(self, payloads: List[Dict[str, Any]]) -> List[Optional[str]]:
+        result = await self.client.create_or_update_leads(payloads)
+        errors: List[Optional[str]] = [None] * len(payloads)
+        for error in result["errors"]:
+            for index in range(error["offset"], error["offset"] + error["size"]):
+                errors[index] = error["message"]
+        return errors
+
+class AirtableOutboxSender:
+    """Envía los leads de la outbox a través del planificador por lotes de Airtable."""
+
+    def __init__(self, scheduler: AirtableBatchScheduler):
+        self.scheduler = scheduler
+
+    async def send(self, payloads: List[Dict[str, Any]]) -> List[Optional[str]]:
+        outcomes = await asyncio.gather(*(
+            self.scheduler.create({AIRTABLE_FIELDS.get(k, k): v for k, v in payload.items()})
+            for payload in payloads
+        ))
+        return [None if outcome["status"] == "success" else outcome["message"] for outcome in outcomes]
+
+class OutboxWorker:
+    """
+    Vacía crm_outbox hacia los CRM configurados.
+
+    `senders` asocia cada destino ("hubspot", "airtable"...) con un objeto que tenga
+    `async send(payloads) -> [error o None por payload]`. Cada ronda toma hasta `batch_size`
+    envíos vencidos por destino; los fallidos se reprograman con backoff exponencial y, tras
+    `max_attempts` intentos, pasan a estado 'dead'. Se asume un solo worker por base de datos.
+    """
+
+    def __init__(
+        self,
+        senders: Dict[str, Any],
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        max_attempts: int = OUTBOX_MAX_ATTEMPTS,
+        base_backoff: float = OUTBOX_BASE_BACKOFF,
+        max_backoff: float = OUTBOX_MAX_BACKOFF,
+        poll_interval: float = OUTBOX_POLL_INTERVAL,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.senders = senders
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.poll_interval = poll_interval
+        self._clock = clock
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.sent = 0
+        self.retried = 0
+        self.dead_lettered = 0
+        self.rounds = 0
+        self.last_delivery_lag = 0.0
+        self.max_delivery_lag = 0.0
+        self._total_delivery_lag = 0.0
+
+    def start(self) -> None:
+        """Arranca el worker en el event loop actual."""
+        if self._task is None or self._task.done():
+            init_outbox()
+            self._stopping = False
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="CRMOutboxWorker")
+
+    def notify(self) -> None:
+        """Avisa de que hay envíos nuevos, sin esperar a la siguiente revisión periódica."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def close(self) -> None:
+        """Termina la ronda en curso y detiene el worker (lo pendiente sigue en la tabla)."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self.notify()
+        await self._task
+        self._task = None
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            self._wakeup.clear()
+            try:
+                processed = await self.drain_once()
+            except Exception as e:
+                logger.error("Error al procesar la outbox: %s", e)
+                processed = 0
+            if processed == 0 and not self._stopping:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def drain_once(self) -> int:
+        """Procesa un lote vencido por destino. Devuelve cuántos envíos procesó."""
+        loop = asyncio.get_running_loop()
+        self.rounds += 1
+        rounds = await asyncio.gather(*(
+            self._drain_target(loop, target, sender) for target, sender in self.senders.items()
+        ))
+        return sum(rounds)
+
+    async def _drain_target(self, loop: asyncio.AbstractEventLoop, target: str, sender: Any) -> int:
+        items = await loop.run_in_executor(None, _due_items, target, self._clock(), self.batch_size)
+        if not items:
+            return 0
+        try:
+            errors = await sender.send([item["payload"] for item in items])
+        except Exception as e:
+            errors = [str(e)] * len(items)
+        await loop.run_in_executor(None, self._record_outcomes, items, errors)
+        return len(items)
+
+    def _backoff(self, attempts: int) -> float:
+        return min(self.max_backoff, self.base_backoff * (2 ** (attempts - 1)))
+
+    def _record_outcomes(self, items: List[Dict[str, Any]], errors: List[Optional[str]]) -> None:
+        now = self._clock()
+        sent, retry, dead = [], [], []
+        for item, error in zip(items, errors):
+            attempts = item["attempts"] + 1
+            if error is None:
+                sent.append((attempts, now, item["id"]))
+                lag = now - item["created_at"]
+                self.last_delivery_lag = lag
+                self.max_delivery_lag = max(self.max_delivery_lag, lag)
+                self._total_delivery_lag += lag
+            elif attempts >= self.max_attempts:
+                dead.append((attempts, error, item["id"]))
+                logger.error("Envío %d a dead-letter tras %d intentos: %s", item["id"], attempts, error)
+            else:
+                retry.append((attempts, now + self._backoff(attempts), error, item["id"]))
+                logger.warning("Envío %d fallido (intento %d), se reintentará: %s", item["id"], attempts, error)
+        with sqlite_db.get_pool().transaction() as conn:
+            conn.executemany(
+                "UPDATE crm_outbox SET status = 'sent', attempts = ?, sent_at = ?, last_error = NULL WHERE id = ?", sent
+            )
+            conn.executemany(
+                "UPDATE crm_outbox SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?", retry
+            )
+            conn.executemany(
+                "UPDATE crm_outbox SET status = 'dead', attempts = ?, last_error = ? WHERE id = ?", dead
+            )
+        self.sent += len(sent)
+        self.retried += len(retry)
+        self.dead_lettered += len(dead)
+
+    def stats(self) -> Dict[str, Any]:
+        """Backlog y lag de la tabla más los contadores del worker."""
+        return {
+            **outbox_stats(self._clock()),
+            "delivered": self.sent,
+            "retried": self.retried,
+            "dead_lettered": self.dead_lettered,
+            "rounds": self.rounds,
+            "avg_delivery_lag": self._total_delivery_lag / self.sent if self.sent else 0.0,
+            "max_delivery_lag": self.max_delivery_lag,
+            "last_delivery_lag": self.last_delivery_lag,
+        }
+
+def build_senders(
+    targets: Iterable[str],
+    hubspot_api_key: Optional[str] = None,
+    airtable_api_key: Optional[str] = None,
+    airtable_base_id: Optional[str] = None,
+    airtable_table: str = "Leads",
+) -> Dict[str, Any]:
+    """Crea los senders de los destinos configurados que tengan credenciales."""
+    senders: Dict[str, Any] = {}
+    for target in targets:
+        if target == "hubspot" and hubspot_api_key:
+            senders[target] = HubSpotOutboxSender(AsyncHubSpotCRMClient(hubspot_api_key))
+        elif target == "airtable" and airtable_api_key and airtable_base_id:
+            crm = AsyncAirtableCRM(airtable_api_key, airtable_base_id, airtable_table, max_retries=0)
+            senders[target] = AirtableOutboxSender(AirtableBatchScheduler(crm))
+        else:
+            logger.warning("Destino de CRM '%s' sin credenciales o desconocido; se ignora.", target)
+    return senders
@@ -0,0 +1,262 @@
+# crm_router.py
+#
+# Router de escrituras de leads hacia varios CRM a la vez. Cada destino (SQLite, HubSpot,
+# Airtable, crm_integration...) se envuelve en un CRMBackend con su mapeo de campos
+# (nombre -> name / Nombre / firstname...). El router escribe en todos en paralelo, responde
+# en cuanto confirma el backend primario y deja que los secundarios terminen en segundo plano.
+#
+#   router = CRMRouter(SQLiteBackend(), [HubSpotBackend(AsyncHubSpotCRMClient(api_key))])
+#   result = await router.write_lead(lead_info)   # resultado del primario
+#   router.stats()                                # latencias p50/p95/máx por backend
+#
+# FakeBackend simula un CRM en memoria (latencia y tasa de error configurables) para
+# probar el router bajo carga sin red (ver benchmarks/bench_crm_router.py).
+
+import abc
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional
+
+from agent import sqlite_db
+from agent.airtable_scheduler import AirtableBatchScheduler
+from agent.async_crm import AsyncAirtableCRM, AsyncHubSpotCRMClient
+from agent.crm_outbox import AIRTABLE_FIELDS
+from batch_utils import percentile
+
+logger = logging.getLogger("CRMRouter")
+
+# Campos de la tabla leads -> campos de cada CRM. Los campos sin mapeo se envían tal cual.
+SQLITE_FIELDS = {field: field for field in sqlite_db.LEAD_FIELDS}
+CRM_INTEGRATION_FIELDS = {"nombre": "name", "empresa": "company", "presupuesto": "budget"}
+# Argumentos de _store_lead_in_crm que no son columnas de la tabla leads
+CRM_INTEGRATION_DEFAULTS = {"email": "", "timeline": ""}
+
+LATENCY_SAMPLES = 1024  # últimas latencias guardadas por backend para los percentiles
+
+def map_fields(lead: Dict[str, Any], mapping: Optional[Dict[str, str]]) -> Dict[str, Any]:
+    """Traduce un lead con los campos de la tabla leads a los nombres de campo de un backend."""
+    if mapping is None:
+        return dict(lead)
+    return {mapping[field]: value for field, value in lead.items() if field in mapping}
+
+class CRMBackend(abc.ABC):
+    """
+    Interfaz común de los destinos del router. Las subclases implementan `_write(fields)`
+    con los campos ya mapeados y devuelven un dict con "status" ("success" o "error").
+    """
+
+    name = "backend"
+    mapping: Optional[Dict[str, str]] = None
+
+    async def write_lead(self, lead: Dict[str, Any]) -> Dict[str, Any]:
+        return await self._write(map_fields(lead, self.mapping))
+
+    @abc.abstractmethod
+    async def _write(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        """Escribe los campos ya mapeados en el destino."""
+
+    async def close(self) -> None:
+        pass
+
+class SQLiteBackend(CRMBackend):
+    """Tabla leads local, vía el escritor con group commit de sqlite_db."""
+
+    name = "sqlite"
+    mapping = SQLITE_FIELDS
+
+    async def _write(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        await sqlite_db.async_insert_lead(fields)
+        return {"status": "success", "message": "Lead guardado en la base de datos local."}
+
+class HubSpotBackend(CRMBackend):
+    """HubSpot; AsyncHubSpotCRMClient ya traduce los campos a propiedades de contacto."""
+
+    name = "hubspot"
+
+    def __init__(self, client: AsyncHubSpotCRMClient):
+        self.client = client
+
+    async def _write(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.client.create_or_update_lead(fields)
+
+class AirtableBackend(CRMBackend):
+    """Airtable, a través del planificador por lotes (respeta el límite de peticiones por base)."""
+
+    name = "airtable"
+    mapping = AIRTABLE_FIELDS
+
+    def __init__(self, scheduler: AirtableBatchScheduler):
+        self.scheduler = scheduler
+
+    async def _write(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.scheduler.create(fields)
+
+    async def close(self) -> None:
+        await self.scheduler.close()
+
+class FunctionBackend(CRMBackend):
+    """
+    Adapta una función síncrona que recibe los campos como argumentos con nombre, por ejemplo
+    crm_integration._store_lead_in_crm. Se ejecuta en el executor para no bloquear el loop.
+    """
+
+    def __init__(self, name: str, function: Callable[..., Dict[str, Any]], mapping: Optional[Dict[str, str]] = None,
+                 defaults: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.function = function
+        self.mapping = mapping
+        self.defaults = defaults or {}
+
+    async def _write(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        kwargs = {**self.defaults, **fields}
+        return await loop.run_in_executor(None, lambda: self.function(**kwargs))
+
+def crm_integration_backend(function: Optional[Callable[..., Dict[str, Any]]] = None) -> FunctionBackend:
+    """FunctionBackend sobre crm_integration._store_lead_in_crm (o `function`, con la misma firma)."""
+    if function is None:
+        from agent.crm_integration import _store_lead_in_crm as function  # importa el SDK de agentes
+    return FunctionBackend("crm_integration", function, CRM_INTEGRATION_FIELDS, CRM_INTEGRATION_DEFAULTS)
+
+class FakeBackend(CRMBackend):
+    """CRM en memoria con latencia (media ± jitter) y tasa de error simuladas, para pruebas de carga."""
+
+    def __init__(
+        self,
+        name: str = "fake",
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        failure_rate: float = 0.0,
+        mapping: Optional[Dict[str, str]] = None,
+        seed: Optional[int] = None,
+    ):
+        self.name = name
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.mapping = mapping
+        self.records: List[Dict[str, Any]] = []
+        self._random = random.Random(seed)
+
+    async def _write(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+        if delay:
+            await asyncio.sleep(delay)
+        if self._random.random() < self.failure_rate:
+            return {"status": "error", "message": f"{self.name}: fallo simulado"}
+        self.records.append(fields)
+        return {"status": "success", "id": len(self.records)}
+
+class LatencyStats:
+    """Contadores y latencias recientes (en segundos) de un backend."""
+
+    def __init__(self, max_samples: int = LATENCY_SAMPLES):
+        self.samples: Deque[float] = deque(maxlen=max_samples)
+        self.calls = 0
+        self.errors = 0
+        self.max = 0.0
+
+    def record(self, elapsed: float, ok: bool) -> None:
+        self.samples.append(elapsed)
+        self.calls += 1
+        self.errors += 0 if ok else 1
+        self.max = max(self.max, elapsed)
+
+    def summary(self) -> Dict[str, float]:
+        ordered = sorted(self.samples)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+            "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+def _failed(result: Any) -> bool:
+    return not isinstance(result, dict) or "error" in result or result.get("status") == "error"
+
+class CRMRouter:
+    """
+    Escribe cada lead en el backend primario y en los secundarios en paralelo.
+
+    write_lead devuelve el resultado del primario en cuanto confirma; los secundarios
+    siguen en segundo plano (sus errores solo se registran en el log y en stats()).
+    `drain()` espera a los secundarios pendientes; `close()` además cierra los backends.
+    """
+
+    def __init__(self, primary: CRMBackend, secondaries: Iterable[CRMBackend] = (), timeout: Optional[float] = None):
+        self.primary = primary
+        self.secondaries = list(secondaries)
+        self.timeout = timeout
+        self._latency: Dict[str, LatencyStats] = {
+            backend.name: LatencyStats() for backend in [primary, *self.secondaries]
+        }
+        self._background: set = set()
+
+    async def _timed_write(self, backend: CRMBackend, lead: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            write = backend.write_lead(lead)
+            result = await (asyncio.wait_for(write, self.timeout) if self.timeout else write)
+        except Exception as e:
+            result = {"status": "error", "message": f"{backend.name}: {e!r}"}
+        ok = not _failed(result)
+        self._latency[backend.name].record(time.perf_counter() - start, ok)
+        if not ok:
+            logger.error("Error al escribir el lead en '%s': %s", backend.name, result)
+        return result
+
+    async def write_lead(self, lead: Dict[str, Any]) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        for backend in self.secondaries:
+            task = loop.create_task(self._timed_write(backend, lead))
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+        return await self._timed_write(self.primary, lead)
+
+    async def drain(self) -> None:
+        """Espera a que terminen las escrituras secundarias en curso."""
+        while self._background:
+            await asyncio.gather(*list(self._background))
+
+    async def close(self) -> None:
+        await self.drain()
+        for backend in [self.primary, *self.secondaries]:
+            await backend.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending_secondary_writes": len(self._background),
+            "backends": {name: latency.summary() for name, latency in self._latency.items()},
+        }
+
+def build_backends(
+    names: Iterable[str],
+    hubspot_api_key: Optional[str] = None,
+    airtable_api_key: Optional[str] = None,
+    airtable_base_id: Optional[str] = None,
+    airtable_table: str = "Leads",
+) -> List[CRMBackend]:
+    """
+    Crea los backends configurados ("sqlite", "hubspot", "airtable", "crm_integration", "fake")
+    que tengan credenciales.
+    """
+    backends: List[CRMBackend] = []
+    for name in names:
+        if name == "sqlite":
+            backends.append(SQLiteBackend())
+        elif name == "hubspot" and hubspot_api_key:
+            backends.append(HubSpotBackend(AsyncHubSpotCRMClient(hubspot_api_key)))
+        elif name == "airtable" and airtable_api_key and airtable_base_id:
+            crm = AsyncAirtableCRM(airtable_api_key, airtable_base_id, airtable_table, max_retries=0)
+            backends.append(AirtableBackend(AirtableBatchScheduler(crm)))
+        elif name == "crm_integration":
+            backends.append(crm_integration_backend())
+        elif name == "fake":
+            backends.append(FakeBackend())
+        else:
+            logger.warning("Backend de CRM '%s' sin credenciales o desconocido; se ignora.", name)
+    return backends
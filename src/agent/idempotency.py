@@ -0,0 +1,191 @@
+# idempotency.py
+#
+# Deduplicación de escrituras de leads por hash de contenido. El LLM suele llamar dos veces
+# a update_crm/store_lead para el mismo prospecto (en el mismo turno o al reintentar); cada
+# escritura se identifica por el hash del lead normalizado y, si ya se aplicó dentro de la
+# ventana IDEMPOTENCY_WINDOW, se omite y se devuelve el resultado de la primera.
+#
+# Las claves viven en la tabla idempotency_keys de leads.db, con clave primaria
+# (scope, key): cada comprobación es una búsqueda directa en el índice.
+
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from agent import sqlite_db
+
+logger = logging.getLogger("Idempotency")
+
+IDEMPOTENCY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    scope TEXT NOT NULL,
+    key TEXT NOT NULL,
+    applied_at REAL NOT NULL,
+    result TEXT,
+    PRIMARY KEY (scope, key)
+) WITHOUT ROWID
+"""
+
+IDEMPOTENCY_WINDOW = 600.0  # segundos durante los que una escritura repetida se considera duplicada
+PURGE_EVERY = 256           # cada cuántas reservas se borran las claves vencidas
+
+# Nombres de campo de los distintos CRMs -> campo de la tabla leads
+CANONICAL_FIELDS = {
+    "name": "nombre",
+    "firstname": "nombre",
+    "company": "empresa",
+    "needs": "necesidades",
+    "description": "necesidades",
+    "budget": "presupuesto",
+}
+BUDGET_FIELD = "presupuesto"
+
+DUPLICATE_IN_PROGRESS = {"status": "duplicate", "message": "La misma escritura ya está en curso; se omitió."}
+
+_claims = 0
+
+def canonical_lead(lead: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Lead con nombres de campo y valores normalizados, para que "Juan Pérez"/"juan perez" o
+    "$10,000"/"10000" produzcan el mismo hash. Los campos vacíos se ignoran.
+    """
+    canonical = {}
+    for field, value in lead.items():
+        if value is None or str(value).strip() == "":
+            continue
+        name = sqlite_db.normalize_name(str(field))
+        name = CANONICAL_FIELDS.get(name, name)
+        if name == BUDGET_FIELD:
+            amount, currency = sqlite_db.parse_budget(str(value))
+            if amount is not None:
+                canonical[name] = [amount, currency]
+                continue
+        canonical[name] = sqlite_db.normalize_name(str(value))
+    return canonical
+
+def lead_fingerprint(lead: Dict[str, Any]) -> str:
+    """Hash SHA-256 del lead normalizado."""
+    payload = json.dumps(canonical_lead(lead), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+# Operaciones sobre una conexión dentro de una transacción abierta
+
+def claim(
+    conn: sqlite3.Connection, scope: str, key: str, window: Optional[float] = None, now: Optional[float] = None
+) -> Tuple[bool, Any]:
+    """
+    Reserva `key` en `scope`. Devuelve (True, None) si la clave es nueva o ya venció, y
+    (False, resultado guardado) si se aplicó dentro de la ventana.
+    """
+    global _claims
+    now = time.time() if now is None else now
+    window = IDEMPOTENCY_WINDOW if window is None else window
+    row = conn.execute(
+        "SELECT applied_at, result FROM idempotency_keys WHERE scope = ? AND key = ?", (scope, key)
+    ).fetchone()
+    if row is not None and row[0] > now - window:
+        return False, json.loads(row[1]) if row[1] is not None else None
+    conn.execute(
+        "INSERT OR REPLACE INTO idempotency_keys (scope, key, applied_at, result) VALUES (?, ?, ?, NULL)",
+        (scope, key, now),
+    )
+    _claims += 1
+    if _claims % PURGE_EVERY == 0:
+        conn.execute("DELETE FROM idempotency_keys WHERE applied_at <= ?", (now - window,))
+    return True, None
+
+def complete(conn: sqlite3.Connection, scope: str, key: str, result: Any) -> None:
+    """Guarda el resultado de la escritura para devolverlo a los duplicados."""
+    conn.execute(
+        "UPDATE idempotency_keys SET result = ? WHERE scope = ? AND key = ?",
+        (json.dumps(result, ensure_ascii=False), scope, key),
+    )
+
+def release(conn: sqlite3.Connection, scope: str, key: str) -> None:
+    """Libera una clave cuya escritura falló, para que un reintento sí se aplique."""
+    conn.execute("DELETE FROM idempotency_keys WHERE scope = ? AND key = ?", (scope, key))
+
+def _failed(result: Any) -> bool:
+    return isinstance(result, dict) and ("error" in result or result.get("status") == "error")
+
+class IdempotencyStore:
+    """
+    Deduplicación para escrituras remotas (HubSpot, Airtable, crm_integration). La reserva
+    se hace antes de la llamada, así que dos llamadas concurrentes con el mismo lead
+    solo envían una; si la escritura falla, la clave se libera.
+    """
+
+    def __init__(self, window: Optional[float] = None, clock: Callable[[], float] = time.time):
+        self.window = window
+        self._clock = clock
+        self._initialized = set()
+        self.applied = 0
+        self.skipped = 0
+
+    def _transaction(self):
+        pool = sqlite_db.get_pool()
+        if pool.db_name not in self._initialized:
+            with pool.transaction() as conn:
+                conn.execute(IDEMPOTENCY_SCHEMA)
+            self._initialized.add(pool.db_name)
+        return pool.transaction()
+
+    def _claim(self, scope: str, key: str) -> Tuple[bool, Any]:
+        with self._transaction() as conn:
+            return claim(conn, scope, key, self.window, self._clock())
+
+    def _finish(self, scope: str, key: str, result: Any) -> None:
+        with self._transaction() as conn:
+            if _failed(result):
+                release(conn, scope, key)
+            else:
+                complete(conn, scope, key, result)
+
+    def _release(self, scope: str, key: str) -> None:
+        with self._transaction() as conn:
+            release(conn, scope, key)
+
+    def _duplicate(self, scope: str, previous: Any) -> Any:
+        self.skipped += 1
+        logger.info("Escritura duplicada en '%s'; se devuelve el resultado anterior.", scope)
+        return previous if previous is not None else dict(DUPLICATE_IN_PROGRESS)
+
+    def run_once(self, scope: str, lead: Dict[str, Any], operation: Callable[[], Any]) -> Any:
+        """Ejecuta `operation()` salvo que el mismo lead ya se haya escrito en `scope` dentro de la ventana."""
+        key = lead_fingerprint(lead)
+        new, previous = self._claim(scope, key)
+        if not new:
+            return self._duplicate(scope, previous)
+        try:
+            result = operation()
+        except Exception:
+            self._release(scope, key)
+            raise
+        self._finish(scope, key, result)
+        self.applied += 1
+        return result
+
+    async def arun_once(self, scope: str, lead: Dict[str, Any], operation: Callable[[], Awaitable[Any]]) -> Any:
+        """Versión asíncrona de run_once: el acceso a SQLite va al executor."""
+        loop = asyncio.get_running_loop()
+        key = lead_fingerprint(lead)
+        new, previous = await loop.run_in_executor(None, self._claim, scope, key)
+        if not new:
+            return self._duplicate(scope, previous)
+        try:
+            result = await operation()
+        except Exception:
+            await loop.run_in_executor(None, self._release, scope, key)
+            raise
+        await loop.run_in_executor(None, self._finish, scope, key, result)
+        self.applied += 1
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        return {"applied": self.applied, "skipped": self.skipped}
+
+default_store = IdempotencyStore()
@@ -1,7 +1,19 @@
 import sqlite3
 import asyncio
+import atexit
 import logging
-from typing import Dict, List
+import queue
+import re
+import threading
+import unicodedata
+from contextlib import contextmanager
+from itertools import islice
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from agent import idempotency
+from agent.lead_cache import MISSING, LeadCache
+from batch_utils import collect_batch
+from nlp.entity_extraction import parse_budget
 
 logger = logging.getLogger("sqlite_db")
 DB_NAME = "leads.db"
@@ -14,49 +26,390 @@ CREATE TABLE IF NOT EXISTS leads (
     presupuesto TEXT NOT NULL
 );
 """
+LEAD_FIELDS = ("nombre", "empresa", "necesidades", "presupuesto")
+
+# Búsqueda por nombre hablado: clave normalizada indexada + índice FTS5 sincronizado por triggers
+NAME_INDEX_SCHEMA = "CREATE INDEX IF NOT EXISTS idx_leads_nombre_norm ON leads (nombre_norm)"
+FTS_SCHEMA = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS leads_fts USING fts5(
+        nombre, empresa, necesidades,
+        content='leads', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS leads_fts_ai AFTER INSERT ON leads BEGIN
+        INSERT INTO leads_fts (rowid, nombre, empresa, necesidades)
+        VALUES (new.id, new.nombre, new.empresa, new.necesidades);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS leads_fts_ad AFTER DELETE ON leads BEGIN
+        INSERT INTO leads_fts (leads_fts, rowid, nombre, empresa, necesidades)
+        VALUES ('delete', old.id, old.nombre, old.empresa, old.necesidades);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS leads_fts_au AFTER UPDATE OF nombre, empresa, necesidades ON leads BEGIN
+        INSERT INTO leads_fts (leads_fts, rowid, nombre, empresa, necesidades)
+        VALUES ('delete', old.id, old.nombre, old.empresa, old.necesidades);
+        INSERT INTO leads_fts (rowid, nombre, empresa, necesidades)
+        VALUES (new.id, new.nombre, new.empresa, new.necesidades);
+    END
+    """,
+)
+# Presupuesto normalizado (valor numérico + moneda) para filtros y agregados en SQL
+BUDGET_INDEX_SCHEMA = (
+    "CREATE INDEX IF NOT EXISTS idx_leads_presupuesto_valor ON leads (presupuesto_valor)",
+    "CREATE INDEX IF NOT EXISTS idx_leads_empresa_presupuesto ON leads (empresa, presupuesto_valor)",
+)
+BUDGET_PERCENTILES = (0.5, 0.9)
+# Pesos bm25 por columna (nombre, empresa, necesidades): el nombre domina el ranking
+FTS_WEIGHTS = (10.0, 3.0, 1.0)
+
+# Configuración del pool de conexiones
+POOL_SIZE = 8
+STATEMENT_CACHE_SIZE = 128
+BUSY_TIMEOUT_MS = 5000
+PRAGMAS = (
+    ("journal_mode", "WAL"),       # los lectores no se bloquean durante una escritura
+    ("synchronous", "NORMAL"),     # en WAL solo se hace fsync en los checkpoints
+    ("cache_size", -16000),        # ~16 MB de caché de páginas por conexión
+    ("mmap_size", 268435456),      # 256 MB de lectura mapeada en memoria
+    ("busy_timeout", BUSY_TIMEOUT_MS),
+    ("temp_store", "MEMORY"),
+)
+
+class ConnectionPool:
+    """
+    Pool thread-safe de conexiones SQLite persistentes.
+
+    Cada conexión se abre una sola vez con journaling WAL y los pragmas de PRAGMAS,
+    y reutiliza sus sentencias preparadas (caché `cached_statements` de sqlite3).
+    Las lecturas usan cualquier conexión libre; las escrituras se serializan dentro
+    del proceso con un lock para evitar errores de "database is locked", mientras
+    que WAL permite que los lectores sigan trabajando durante la escritura.
+    """
+
+    def __init__(self, db_name: str, size: int = POOL_SIZE):
+        self.db_name = db_name
+        self.size = size
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_name,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        for pragma, value in PRAGMAS:
+            conn.execute(f"PRAGMA {pragma} = {value}")
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        if self._closed:
+            raise sqlite3.ProgrammingError("El pool de conexiones está cerrado.")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    return self._connect()
+                except Exception:
+                    self._created -= 1
+                    raise
+        return self._idle.get(timeout=BUSY_TIMEOUT_MS / 1000)
+
+    def _release(self, conn: sqlite3.Connection) -> None:
+        if conn.in_transaction:
+            conn.rollback()
+        if self._closed:
+            conn.close()
+            return
+        self._idle.put_nowait(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Presta una conexión del pool para lecturas (modo autocommit)."""
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Presta una conexión dentro de una transacción de escritura (BEGIN IMMEDIATE).
+        Hace commit al salir del bloque o rollback si se produce una excepción.
+        """
+        with self._write_lock, self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    def close(self) -> None:
+        """Cierra todas las conexiones libres; las prestadas se cierran al devolverse."""
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+# Caché de registros por nombre normalizado. Las operaciones de escritura anotan los
+# nombres que tocan y se invalidan justo después del commit (ver _write_transaction).
+lead_cache = LeadCache()
+
+class _TouchedNames(threading.local):
+    def __init__(self):
+        self.keys = set()
+
+_touched = _TouchedNames()
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ConnectionPool:
+    """Devuelve el pool de la base de datos actual (DB_NAME), creándolo si hace falta."""
+    global _pool
+    pool = _pool
+    if pool is not None and pool.db_name == DB_NAME:
+        return pool
+    with _pool_lock:
+        if _pool is None or _pool.db_name != DB_NAME:
+            if _pool is not None:
+                _pool.close()
+            _pool = ConnectionPool(DB_NAME)
+            lead_cache.clear()
+        return _pool
+
+def close_pool() -> None:
+    """Cierra el pool de conexiones actual (se vuelve a crear en el siguiente uso)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+atexit.register(close_pool)
+
+def normalize_name(text: str) -> str:
+    """
+    Normaliza un nombre para compararlo sin importar acentos, mayúsculas ni puntuación.
+    Por ejemplo, "Juan Pérez" y "juan perez." producen la misma clave "juan perez".
+    """
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(re.sub(r"[\W_]+", " ", stripped.casefold()).split())
+
+def _ensure_column(conn: sqlite3.Connection, column: str, definition: str) -> bool:
+    """Agrega una columna a leads si no existe. Devuelve True si la creó."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(leads)")}
+    if column in columns:
+        return False
+    conn.execute(f"ALTER TABLE leads ADD COLUMN {column} {definition}")
+    return True
+
+def _migrate(conn: sqlite3.Connection) -> None:
+    """Aplica las adiciones de esquema sobre bases de datos existentes."""
+    if _ensure_column(conn, "nombre_norm", "TEXT NOT NULL DEFAULT ''"):
+        rows = conn.execute("SELECT id, nombre FROM leads").fetchall()
+        conn.executemany(
+            "UPDATE leads SET nombre_norm = ? WHERE id = ?",
+            [(normalize_name(nombre), lead_id) for lead_id, nombre in rows],
+        )
+    conn.execute(NAME_INDEX_SCHEMA)
+
+    added_value = _ensure_column(conn, "presupuesto_valor", "REAL")
+    added_currency = _ensure_column(conn, "presupuesto_moneda", "TEXT")
+    if added_value or added_currency:
+        rows = conn.execute("SELECT id, presupuesto FROM leads").fetchall()
+        conn.executemany(
+            "UPDATE leads SET presupuesto_valor = ?, presupuesto_moneda = ? WHERE id = ?",
+            [(*parse_budget(presupuesto), lead_id) for lead_id, presupuesto in rows],
+        )
+    for statement in BUDGET_INDEX_SCHEMA:
+        conn.execute(statement)
+
+    fts_exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'leads_fts'"
+    ).fetchone()
+    for statement in FTS_SCHEMA:
+        conn.execute(statement)
+    if not fts_exists:
+        conn.execute("INSERT INTO leads_fts (leads_fts) VALUES ('rebuild')")
+
+    conn.execute(idempotency.IDEMPOTENCY_SCHEMA)
+
+def _touch(*names: str) -> None:
+    """Marca nombres normalizados para invalidar en la caché al terminar la transacción."""
+    _touched.keys.update(names)
+
+@contextmanager
+def _write_transaction() -> Iterator[sqlite3.Connection]:
+    """Transacción de escritura que invalida en la caché los nombres tocados tras el commit."""
+    _touched.keys = set()
+    try:
+        with get_pool().transaction() as conn:
+            yield conn
+    finally:
+        keys, _touched.keys = _touched.keys, set()
+        if keys:
+            lead_cache.invalidate_many(keys)
 
 def init_db() -> None:
     """Inicializa la base de datos y crea la tabla leads si no existe."""
     try:
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-        cursor.execute(TABLE_SCHEMA)
-        conn.commit()
-        conn.close()
+        with get_pool().transaction() as conn:
+            conn.execute(TABLE_SCHEMA)
+            _migrate(conn)
         logger.info("Base de datos inicializada o ya existente.")
     except Exception as e:
         logger.error("Error al inicializar la base de datos: %s", e)
 
+# Operaciones de escritura sobre una conexión ya dentro de una transacción.
+# Las comparten las funciones síncronas y el escritor con group commit.
+
+INSERT_SQL = (
+    "INSERT INTO leads (nombre, empresa, necesidades, presupuesto, nombre_norm, presupuesto_valor, presupuesto_moneda) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+
+def _lead_row(lead_info: Dict[str, str]) -> tuple:
+    """Parámetros de INSERT_SQL, incluidas las columnas derivadas (nombre normalizado y presupuesto)."""
+    return (
+        lead_info["nombre"],
+        lead_info["empresa"],
+        lead_info["necesidades"],
+        lead_info["presupuesto"],
+        normalize_name(lead_info["nombre"]),
+        *parse_budget(lead_info["presupuesto"]),
+    )
+
+def _fill_empty_fields(conn: sqlite3.Connection, lead_id: Optional[int], lead_info: Dict[str, str]) -> bool:
+    """
+    Completa los campos vacíos del lead `lead_id` con los de `lead_info`, sin sobrescribir
+    ninguno. Solo si ambos son el mismo prospecto: si algún campo presente en los dos difiere
+    (otra empresa, otro presupuesto...) devuelve False y el llamante inserta una fila nueva.
+    """
+    existing = conn.execute(
+        "SELECT nombre, empresa, necesidades, presupuesto FROM leads WHERE id = ? AND nombre_norm = ?",
+        (lead_id, normalize_name(lead_info["nombre"])),
+    ).fetchone()
+    if existing is None:
+        return False
+    current = dict(zip(LEAD_FIELDS, existing))
+    known, incoming = idempotency.canonical_lead(current), idempotency.canonical_lead(lead_info)
+    if any(known[field] != incoming[field] for field in known.keys() & incoming.keys()):
+        return False
+    filled = {field: lead_info[field] for field in LEAD_FIELDS if lead_info[field] and not current[field]}
+    if filled:
+        current.update(filled)
+        conn.execute(
+            "UPDATE leads SET nombre = ?, empresa = ?, necesidades = ?, presupuesto = ?, nombre_norm = ?, "
+            "presupuesto_valor = ?, presupuesto_moneda = ? WHERE id = ?",
+            (*_lead_row(current), lead_id),
+        )
+    return True
+
+def _insert_lead(conn: sqlite3.Connection, lead_info: Dict[str, str]) -> None:
+    """
+    Inserta el lead salvo que sea un duplicado reciente (ver agent.idempotency): el mismo
+    contenido dentro de la ventana se omite. Un lead con el mismo nombre solo se une a la
+    fila insertada antes si no contradice ninguno de sus campos, y entonces únicamente
+    rellena los vacíos; dos prospectos distintos con el mismo nombre quedan en filas separadas.
+    """
+    row = _lead_row(lead_info)
+    key = idempotency.lead_fingerprint(lead_info)
+    new, lead_id = idempotency.claim(conn, "leads", key)
+    if not new and conn.execute("SELECT 1 FROM leads WHERE id = ? AND nombre_norm = ?", (lead_id, row[4])).fetchone():
+        logger.info("Lead duplicado omitido: %s", lead_info["nombre"])
+        return
+    new_name, lead_id = idempotency.claim(conn, "leads:nombre", row[4])
+    if new_name or not _fill_empty_fields(conn, lead_id, lead_info):
+        lead_id = conn.execute(INSERT_SQL, row).lastrowid
+        idempotency.complete(conn, "leads:nombre", row[4], lead_id)
+    idempotency.complete(conn, "leads", key, lead_id)
+    _touch(row[4])
+
+def _update_lead_field(conn: sqlite3.Connection, name: str, field: str, new_value: str) -> None:
+    if field not in LEAD_FIELDS:
+        raise ValueError(f"Campo desconocido: {field!r}. Campos válidos: {', '.join(LEAD_FIELDS)}")
+    _touch(normalize_name(name))
+    if field == "nombre":
+        _touch(normalize_name(new_value))
+        conn.execute(
+            "UPDATE leads SET nombre = ?, nombre_norm = ? WHERE nombre_norm = ?",
+            (new_value, normalize_name(new_value), normalize_name(name)),
+        )
+    elif field == "presupuesto":
+        conn.execute(
+            "UPDATE leads SET presupuesto = ?, presupuesto_valor = ?, presupuesto_moneda = ? WHERE nombre_norm = ?",
+            (new_value, *parse_budget(new_value), normalize_name(name)),
+        )
+    else:
+        query = f"UPDATE leads SET {field} = ? WHERE nombre_norm = ?"
+        conn.execute(query, (new_value, normalize_name(name)))
+
+def _delete_lead_by_name(conn: sqlite3.Connection, name: str) -> None:
+    _touch(normalize_name(name))
+    conn.execute("DELETE FROM leads WHERE nombre_norm = ?", (normalize_name(name),))
+
 def insert_lead(lead_info: Dict[str, str]) -> None:
     """Inserta la información del lead en la tabla leads."""
     try:
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO leads (nombre, empresa, necesidades, presupuesto) VALUES (?, ?, ?, ?)",
-            (
-                lead_info["nombre"],
-                lead_info["empresa"],
-                lead_info["necesidades"],
-                lead_info["presupuesto"],
-            ),
-        )
-        conn.commit()
-        conn.close()
+        with _write_transaction() as conn:
+            _insert_lead(conn, lead_info)
         logger.info("Lead insertado correctamente.")
     except Exception as e:
         logger.error("Error al insertar el lead: %s", e)
         raise
 
+BULK_CHUNK_SIZE = 5000
+
+def insert_leads_many(leads: Iterable[Dict[str, str]], chunk_size: int = BULK_CHUNK_SIZE) -> int:
+    """
+    Inserta leads en bloque con executemany, en transacciones de `chunk_size` filas.
+    Acepta cualquier iterable (p. ej. un generador que lee un archivo), así que la memoria
+    usada es constante. Devuelve el número de leads insertados.
+    """
+    iterator = iter(leads)
+    total = 0
+    try:
+        while True:
+            chunk = [_lead_row(lead) for lead in islice(iterator, chunk_size)]
+            if not chunk:
+                break
+            with _write_transaction() as conn:
+                conn.executemany(INSERT_SQL, chunk)
+                _touch(*(row[4] for row in chunk))
+            total += len(chunk)
+        logger.info("%d leads insertados en bloque.", total)
+        return total
+    except Exception as e:
+        logger.error("Error al insertar leads en bloque (%d ya insertados): %s", total, e)
+        raise
+
 def update_lead_field(name: str, field: str, new_value: str) -> None:
     """Actualiza un campo específico de un lead identificado por su nombre."""
     try:
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-        query = f"UPDATE leads SET {field} = ? WHERE nombre = ?"
-        cursor.execute(query, (new_value, name))
-        conn.commit()
-        conn.close()
+        with _write_transaction() as conn:
+            _update_lead_field(conn, name, field, new_value)
         logger.info("Lead actualizado correctamente.")
     except Exception as e:
         logger.error("Error al actualizar el lead: %s", e)
@@ -65,51 +418,433 @@ def update_lead_field(name: str, field: str, new_value: str) -> None:
 def delete_lead_by_name(name: str) -> None:
     """Elimina un lead de la base de datos según el nombre."""
     try:
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM leads WHERE nombre = ?", (name,))
-        conn.commit()
-        conn.close()
+        with _write_transaction() as conn:
+            _delete_lead_by_name(conn, name)
         logger.info("Lead eliminado correctamente.")
     except Exception as e:
         logger.error("Error al eliminar el lead: %s", e)
         raise
 
+# Listado con paginación por clave (keyset): cada página continúa desde el último id
+# devuelto, así que el coste por página no depende de cuántas páginas se hayan leído.
+LIST_PAGE_SIZE = 500
+
+def _projection(columns: Optional[Sequence[str]]) -> Tuple[str, ...]:
+    if columns is None:
+        return LEAD_FIELDS
+    unknown = [column for column in columns if column != "id" and column not in LEAD_FIELDS]
+    if unknown:
+        raise ValueError(f"Columnas desconocidas: {', '.join(unknown)}")
+    return tuple(columns)
+
+def _fetch_page(
+    conn: sqlite3.Connection, columns: Tuple[str, ...], after: Optional[int], limit: int
+) -> List[tuple]:
+    """Filas (id, *columns) con id > after, ordenadas por id."""
+    select = ", ".join(("id",) + columns)
+    return conn.execute(
+        f"SELECT {select} FROM leads WHERE id > ? ORDER BY id LIMIT ?",
+        (after or 0, limit),
+    ).fetchall()
+
+def list_leads_page(
+    limit: int = 50, after: Optional[int] = None, columns: Optional[Sequence[str]] = None
+) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+    """
+    Devuelve una página de hasta `limit` leads con id mayor que `after` y el cursor
+    para pedir la siguiente (None si no hay más). `columns` limita los campos devueltos.
+    """
+    if limit < 1:
+        raise ValueError(f"limit debe ser al menos 1 (recibido {limit})")
+    projection = _projection(columns)
+    try:
+        with get_pool().connection() as conn:
+            rows = _fetch_page(conn, projection, after, limit + 1)
+        next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+        return [dict(zip(projection, row[1:])) for row in rows[:limit]], next_cursor
+    except Exception as e:
+        logger.error("Error al listar los leads: %s", e)
+        raise
+
+def iter_leads(
+    columns: Optional[Sequence[str]] = None,
+    after: Optional[int] = None,
+    page_size: int = LIST_PAGE_SIZE,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Recorre los leads en streaming, página a página, sin cargar toda la tabla en memoria.
+    La conexión se devuelve al pool entre páginas.
+    """
+    if page_size < 1:
+        raise ValueError(f"page_size debe ser al menos 1 (recibido {page_size})")
+    projection = _projection(columns)
+    while True:
+        with get_pool().connection() as conn:
+            rows = _fetch_page(conn, projection, after, page_size)
+        for row in rows:
+            yield dict(zip(projection, row[1:]))
+        if len(rows) < page_size:
+            return
+        after = rows[-1][0]
+
 def list_leads() -> List[Dict[str, str]]:
     """Devuelve una lista de todos los leads almacenados."""
     try:
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-        cursor.execute("SELECT nombre, empresa, necesidades, presupuesto FROM leads")
-        rows = cursor.fetchall()
-        conn.close()
-        leads = []
-        for row in rows:
-            leads.append({
-                "nombre": row[0],
-                "empresa": row[1],
-                "necesidades": row[2],
-                "presupuesto": row[3]
-            })
-        return leads
+        return list(iter_leads())
     except Exception as e:
         logger.error("Error al listar los leads: %s", e)
         raise
 
-# Wrappers asíncronos para no bloquear el loop principal
+def _get_lead_uncached(key: str) -> Optional[Dict[str, Any]]:
+    with get_pool().connection() as conn:
+        row = conn.execute(
+            "SELECT id, nombre, empresa, necesidades, presupuesto FROM leads "
+            "WHERE nombre_norm = ? ORDER BY id LIMIT 1",
+            (key,),
+        ).fetchone()
+    return dict(zip(("id",) + LEAD_FIELDS, row)) if row else None
+
+def get_lead(name: str) -> Optional[Dict[str, Any]]:
+    """
+    Devuelve el lead con ese nombre (sin importar acentos ni mayúsculas) o None.
+    Lectura a través de la caché: las consultas repetidas dentro de una conversación
+    no tocan la base de datos hasta que una escritura invalide ese nombre.
+    """
+    key = normalize_name(name)
+    cached = lead_cache.get(key)
+    if cached is not MISSING:
+        return dict(cached) if cached else None
+    return _load_lead(key)
+
+def _load_lead(key: str) -> Optional[Dict[str, Any]]:
+    """Fallo de caché: lee el lead de la base de datos y lo guarda si nadie escribió entretanto."""
+    try:
+        generation = lead_cache.generation
+        lead = _get_lead_uncached(key)
+        lead_cache.put(key, lead, generation)
+        return dict(lead) if lead else None
+    except Exception as e:
+        logger.error("Error al obtener el lead: %s", e)
+        raise
+
+def _fts_query(tokens: List[str], operator: str) -> str:
+    return f" {operator} ".join(f'"{token}"*' for token in tokens)
+
+def find_leads(query: str, limit: int = 5) -> List[Dict[str, Any]]:
+    """
+    Busca leads por un nombre o texto dictado, tolerando acentos, mayúsculas y nombres
+    incompletos ("juan perez", "Juan P."). Las coincidencias exactas del nombre normalizado
+    van primero; después, los resultados de FTS5 ordenados por bm25 (el nombre pesa más
+    que la empresa y las necesidades). Si ningún lead contiene todas las palabras, se
+    relaja la búsqueda a cualquiera de ellas.
+    """
+    tokens = normalize_name(query).split()
+    if not tokens:
+        return []
+    try:
+        with get_pool().connection() as conn:
+            rows = conn.execute(
+                "SELECT id, nombre, empresa, necesidades, presupuesto FROM leads "
+                "WHERE nombre_norm = ? ORDER BY id LIMIT ?",
+                (" ".join(tokens), limit),
+            ).fetchall()
+            seen = {row[0] for row in rows}
+            operators = ("AND", "OR") if len(tokens) > 1 else ("AND",)
+            for operator in operators:
+                if len(rows) >= limit or (operator == "OR" and rows):
+                    break
+                matches = conn.execute(
+                    "SELECT l.id, l.nombre, l.empresa, l.necesidades, l.presupuesto "
+                    "FROM leads_fts JOIN leads AS l ON l.id = leads_fts.rowid "
+                    "WHERE leads_fts MATCH ? ORDER BY bm25(leads_fts, ?, ?, ?) LIMIT ?",
+                    (_fts_query(tokens, operator), *FTS_WEIGHTS, limit + len(seen)),
+                ).fetchall()
+                for row in matches:
+                    if row[0] not in seen and len(rows) < limit:
+                        seen.add(row[0])
+                        rows.append(row)
+        return [
+            {
+                "id": row[0],
+                "nombre": row[1],
+                "empresa": row[2],
+                "necesidades": row[3],
+                "presupuesto": row[4],
+            }
+            for row in rows
+        ]
+    except Exception as e:
+        logger.error("Error al buscar leads: %s", e)
+        raise
+
+def _budget_filter(
+    min_value: Optional[float], max_value: Optional[float], currency: Optional[str]
+) -> Tuple[str, list]:
+    clauses, params = ["presupuesto_valor IS NOT NULL"], []
+    if min_value is not None:
+        clauses.append("presupuesto_valor >= ?")
+        params.append(min_value)
+    if max_value is not None:
+        clauses.append("presupuesto_valor <= ?")
+        params.append(max_value)
+    if currency:
+        clauses.append("presupuesto_moneda = ?")
+        params.append(currency.upper())
+    return " AND ".join(clauses), params
+
+def find_leads_by_budget(
+    min_value: Optional[float] = None,
+    max_value: Optional[float] = None,
+    currency: Optional[str] = None,
+    limit: int = 50,
+) -> List[Dict[str, Any]]:
+    """Leads con presupuesto dentro del rango indicado, de mayor a menor (usa el índice)."""
+    where, params = _budget_filter(min_value, max_value, currency)
+    try:
+        with get_pool().connection() as conn:
+            rows = conn.execute(
+                "SELECT nombre, empresa, necesidades, presupuesto, presupuesto_valor, presupuesto_moneda "
+                f"FROM leads WHERE {where} ORDER BY presupuesto_valor DESC LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+        keys = LEAD_FIELDS + ("presupuesto_valor", "presupuesto_moneda")
+        return [dict(zip(keys, row)) for row in rows]
+    except Exception as e:
+        logger.error("Error al filtrar leads por presupuesto: %s", e)
+        raise
+
+def budget_stats(
+    min_value: Optional[float] = None,
+    max_value: Optional[float] = None,
+    currency: Optional[str] = None,
+    by_company: bool = False,
+    percentiles: Sequence[float] = BUDGET_PERCENTILES,
+) -> List[Dict[str, Any]]:
+    """
+    Agregados de presupuesto calculados íntegramente en SQL: count, sum, avg, min, max y
+    percentiles (nearest-rank, p.ej. p50/p90). Devuelve una fila por moneda, y por empresa
+    si `by_company` es True, para no mezclar importes de monedas distintas.
+    """
+    where, params = _budget_filter(min_value, max_value, currency)
+    group = "empresa, presupuesto_moneda" if by_company else "presupuesto_moneda"
+    percentile_columns = "".join(
+        ", MIN(CASE WHEN rn >= ? * n THEN valor END)" for _ in percentiles
+    )
+    query = f"""
+        WITH ranked AS (
+            SELECT {group}, presupuesto_valor AS valor,
+                   ROW_NUMBER() OVER (PARTITION BY {group} ORDER BY presupuesto_valor) AS rn,
+                   COUNT(*) OVER (PARTITION BY {group}) AS n
+            FROM leads WHERE {where}
+        )
+        SELECT {group}, COUNT(*), SUM(valor), AVG(valor), MIN(valor), MAX(valor){percentile_columns}
+        FROM ranked GROUP BY {group} ORDER BY COUNT(*) DESC
+    """
+    keys = (("empresa",) if by_company else ()) + ("moneda", "count", "sum", "avg", "min", "max")
+    keys += tuple(f"p{round(p * 100):d}" for p in percentiles)
+    try:
+        with get_pool().connection() as conn:
+            rows = conn.execute(query, (*params, *percentiles)).fetchall()
+        return [dict(zip(keys, row)) for row in rows]
+    except Exception as e:
+        logger.error("Error al calcular estadísticas de presupuesto: %s", e)
+        raise
+
+# Escritor único con group commit
+
+# Con ventana 0 el lote es todo lo que se acumuló mientras se confirmaba el anterior:
+# no añade latencia a un escritor solitario y agrupa de forma natural bajo carga.
+WRITER_WINDOW_SECONDS = 0.0
+WRITER_MAX_BATCH = 256
+
+class LeadWriter:
+    """
+    Actor de escritura único para los wrappers asíncronos.
+
+    Las peticiones de escritura llegan por una asyncio.Queue; el actor agrupa todo lo que
+    llega dentro de una ventana corta (o hasta `max_batch` operaciones) y lo aplica en una
+    sola transacción, con un solo commit/fsync para todo el lote (group commit). Cada
+    operación corre dentro de su propio SAVEPOINT, de modo que un error solo afecta a su
+    llamador: cada future se resuelve con su propio resultado o excepción.
+    """
+
+    def __init__(self, window: float = WRITER_WINDOW_SECONDS, max_batch: int = WRITER_MAX_BATCH):
+        self.window = window
+        self.max_batch = max_batch
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping = False
+        self.batches = 0
+        self.operations = 0
+        self.failed_operations = 0
+        self.failed_commits = 0
+        self.max_batch_seen = 0
+        self.last_batch_size = 0
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._run(), name="sqlite_db.LeadWriter")
+
+    async def submit(self, operation: Callable[..., Any], *args: Any) -> Any:
+        """
+        Encola `operation(conn, *args)` y espera a que su lote haga commit.
+        Devuelve el resultado de la operación o relanza su excepción.
+        """
+        self._ensure_started()
+        future = self._loop.create_future()
+        self._queue.put_nowait((operation, args, future))
+        return await future
+
+    async def _collect_batch(self) -> list:
+        """Espera la primera petición y agrupa las que lleguen dentro de la ventana."""
+        batch, stop = await collect_batch(self._queue, self.max_batch, self.window)
+        if stop:
+            self._stopping = True
+        return batch
+
+    @staticmethod
+    def _apply_batch(batch: list) -> list:
+        """Aplica el lote en una transacción; devuelve (ok, resultado) por operación."""
+        outcomes = []
+        with _write_transaction() as conn:
+            for operation, args, _ in batch:
+                conn.execute("SAVEPOINT lead_op")
+                try:
+                    outcomes.append((True, operation(conn, *args)))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO lead_op")
+                    outcomes.append((False, e))
+                conn.execute("RELEASE lead_op")
+        return outcomes
+
+    async def _run(self) -> None:
+        self._stopping = False
+        while not self._stopping or not self._queue.empty():
+            batch = await self._collect_batch()
+            if not batch:
+                continue
+            self.batches += 1
+            self.operations += len(batch)
+            self.last_batch_size = len(batch)
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+            try:
+                outcomes = await self._loop.run_in_executor(None, self._apply_batch, batch)
+            except Exception as e:
+                self.failed_commits += 1
+                logger.error("Error al confirmar el lote de escrituras: %s", e)
+                outcomes = [(False, e)] * len(batch)
+            for (_, _, future), (ok, value) in zip(batch, outcomes):
+                if future.done():
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    self.failed_operations += 1
+                    future.set_exception(value)
+
+    def stats(self) -> Dict[str, float]:
+        """Métricas para ajustar la ventana y el tamaño máximo de lote."""
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "batches": self.batches,
+            "operations": self.operations,
+            "failed_operations": self.failed_operations,
+            "failed_commits": self.failed_commits,
+            "avg_batch_size": self.operations / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_seen,
+            "last_batch_size": self.last_batch_size,
+        }
+
+    async def close(self) -> None:
+        """Detiene el actor después de vaciar las escrituras pendientes."""
+        if self._task is None or self._task.done():
+            return
+        self._queue.put_nowait(None)
+        await self._task
+        self._task = None
+
+writer = LeadWriter()
+
+# Wrappers asíncronos para no bloquear el loop principal.
+# Las escrituras pasan por el escritor único (group commit); las lecturas usan el pool.
 
 async def async_insert_lead(lead_info: Dict[str, str]) -> None:
-    loop = asyncio.get_running_loop()
-    await loop.run_in_executor(None, insert_lead, lead_info)
+    try:
+        await writer.submit(_insert_lead, lead_info)
+    except Exception as e:
+        logger.error("Error al insertar el lead: %s", e)
+        raise
+    logger.info("Lead insertado correctamente.")
 
 async def async_update_lead_field(name: str, field: str, new_value: str) -> None:
-    loop = asyncio.get_running_loop()
-    await loop.run_in_executor(None, update_lead_field, name, field, new_value)
+    try:
+        await writer.submit(_update_lead_field, name, field, new_value)
+    except Exception as e:
+        logger.error("Error al actualizar el lead: %s", e)
+        raise
+    logger.info("Lead actualizado correctamente.")
 
 async def async_delete_lead_by_name(name: str) -> None:
-    loop = asyncio.get_running_loop()
-    await loop.run_in_executor(None, delete_lead_by_name, name)
+    try:
+        await writer.submit(_delete_lead_by_name, name)
+    except Exception as e:
+        logger.error("Error al eliminar el lead: %s", e)
+        raise
+    logger.info("Lead eliminado correctamente.")
 
 async def async_list_leads() -> List[Dict[str, str]]:
     loop = asyncio.get_running_loop()
     return await loop.run_in_executor(None, list_leads)
+
+async def async_list_leads_page(
+    limit: int = 50, after: Optional[int] = None, columns: Optional[Sequence[str]] = None
+) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, list_leads_page, limit, after, columns)
+
+async def aiter_leads(
+    columns: Optional[Sequence[str]] = None,
+    after: Optional[int] = None,
+    page_size: int = LIST_PAGE_SIZE,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Versión asíncrona de iter_leads: cada página se lee en el executor."""
+    while True:
+        page, after = await async_list_leads_page(page_size, after, columns)
+        for lead in page:
+            yield lead
+        if after is None:
+            return
+
+async def async_get_lead(name: str) -> Optional[Dict[str, Any]]:
+    key = normalize_name(name)
+    cached = lead_cache.get(key)
+    if cached is not MISSING:
+        return dict(cached) if cached else None
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, _load_lead, key)
+
+async def async_find_leads(query: str, limit: int = 5) -> List[Dict[str, Any]]:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, find_leads, query, limit)
+
+async def async_find_leads_by_budget(
+    min_value: Optional[float] = None,
+    max_value: Optional[float] = None,
+    currency: Optional[str] = None,
+    limit: int = 50,
+) -> List[Dict[str, Any]]:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, find_leads_by_budget, min_value, max_value, currency, limit)
+
+async def async_budget_stats(
+    min_value: Optional[float] = None,
+    max_value: Optional[float] = None,
+    currency: Optional[str] = None,
+    by_company: bool = False,
+) -> List[Dict[str, Any]]:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, budget_stats, min_value, max_value, currency, by_company)
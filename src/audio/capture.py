@@ -0,0 +1,302 @@
+# capture.py
+#
+# Captura de micrófono sin asignaciones en el hilo de audio. El callback de PortAudio copia
+# cada bloque en un buffer int16 preasignado (AudioRingBuffer) en lugar de añadir copias a
+# una lista y concatenarlas al final: no hay locks ni objetos nuevos por bloque, la memoria
+# no se duplica en grabaciones largas y el resultado es una vista del buffer, sin copias,
+# que se pasa directamente a AudioInput.
+#
+# El buffer crece por adelantado: un hilo de mantenimiento reserva uno más grande cuando se
+# llena al 75 % y es el propio productor quien lo adopta en su siguiente bloque (solo copia
+# lo ya grabado). Al llegar a `max_seconds` se comporta como un anillo y sobrescribe el audio
+# más antiguo, contabilizándolo como desbordamiento.
+#
+#   capture = AudioCapture(samplerate)
+#   buffer = await capture.record(lambda: loop.run_in_executor(None, input))   # hasta pulsar Enter
+#   AudioInput(buffer=buffer)
+#   capture.stats()       # duración, crecimientos, frames perdidos, xruns de PortAudio
+#
+# Para pruebas, `stream_factory` sustituye al micrófono (SyntheticInputStream).
+
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger("AudioCapture")
+
+CAPTURE_INITIAL_SECONDS = 30
+CAPTURE_MAX_SECONDS = 600
+GROWTH_THRESHOLD = 0.75
+MAINTENANCE_INTERVAL = 0.02  # segundos entre comprobaciones del hilo de mantenimiento
+
+class AudioRingBuffer:
+    """
+    Buffer (frames, canales) preasignado con un único productor (el callback de audio) y un
+    único consumidor. `write` no toma locks; `reserve` (consumidor) prepara el siguiente
+    buffer y `write` (productor) lo adopta. Si aun así el productor se queda sin espacio antes
+    de llegar a `max_frames`, crece él mismo y lo cuenta en `emergency_grows`.
+    """
+
+    def __init__(
+        self,
+        frames: int,
+        channels: int = 1,
+        dtype: Any = np.int16,
+        max_frames: Optional[int] = None,
+        growth_threshold: float = GROWTH_THRESHOLD,
+    ):
+        self.channels = channels
+        self.dtype = np.dtype(dtype)
+        self.max_frames = max(frames, max_frames or frames)
+        self.growth_threshold = growth_threshold
+        self._data = np.zeros((frames, channels), dtype=self.dtype)
+        self._pending: Optional[np.ndarray] = None
+        self._written = 0        # frames escritos desde clear() (incluidos los sobrescritos)
+        self._wrapped = False
+        self.grows = 0
+        self.emergency_grows = 0
+        self.overflow_frames = 0
+
+    @property
+    def capacity(self) -> int:
+        return len(self._data)
+
+    def __len__(self) -> int:
+        return min(self._written, self.capacity)
+
+    def _next_size(self, needed: int) -> int:
+        return min(self.max_frames, max(self.capacity * 2, needed))
+
+    def reserve(self) -> bool:
+        """Lado consumidor: si el buffer supera el umbral, deja preparado uno mayor. Devuelve si reservó."""
+        if self._pending is not None or self._wrapped or self.capacity >= self.max_frames:
+            return False
+        if self._written < self.growth_threshold * self.capacity:
+            return False
+        self._pending = np.zeros((self._next_size(0), self.channels), dtype=self.dtype)
+        return True
+
+    def _adopt(self, bigger: np.ndarray) -> None:
+        filled = self._written
+        bigger[:filled] = self._data[:filled]
+        self._data = bigger
+
+    def write(self, block: np.ndarray) -> None:
+        """Lado productor (callback de audio): copia `block` al buffer."""
+        pending = self._pending
+        if pending is not None:
+            self._pending = None
+            if not self._wrapped and len(pending) > self.capacity:
+                self._adopt(pending)
+                self.grows += 1
+        frames = len(block)
+        start = self._written
+        if not self._wrapped and start + frames > self.capacity and self.capacity < self.max_frames:
+            self._adopt(np.zeros((self._next_size(start + frames), self.channels), dtype=self.dtype))
+            self.emergency_grows += 1
+        capacity = self.capacity
+        if not self._wrapped and start + frames <= capacity:
+            self._data[start:start + frames] = block
+        else:
+            self._write_wrapped(block, start, capacity)
+        self._written = start + frames
+
+    def _write_wrapped(self, block: np.ndarray, start: int, capacity: int) -> None:
+        frames = len(block)
+        overwritten = max(0, min(start, capacity) + frames - capacity)
+        if frames > capacity:
+            block = block[-capacity:]
+            start += frames - capacity
+            frames = capacity
+        offset = start % capacity
+        head = min(frames, capacity - offset)
+        self._data[offset:offset + head] = block[:head]
+        self._data[:frames - head] = block[head:]
+        self.overflow_frames += overwritten
+        self._wrapped = True
+
+    def view(self) -> np.ndarray:
+        """
+        Audio grabado, en orden. Sin desbordamiento es una vista del buffer (sin copia), válida
+        hasta el siguiente clear(); si el anillo dio la vuelta se devuelve una copia ordenada.
+        """
+        if not self._wrapped:
+            return self._data[:self._written]
+        offset = self._written % self.capacity
+        return np.concatenate((self._data[offset:], self._data[:offset]))
+
+    def clear(self) -> None:
+        """Vacía el buffer conservando la memoria ya reservada."""
+        self._written = 0
+        self._wrapped = False
+        self.overflow_frames = 0
+
+def default_stream_factory(**kwargs: Any) -> Any:
+    """sounddevice.InputStream (se importa aquí para que el módulo funcione sin PortAudio)."""
+    import sounddevice as sd
+
+    return sd.InputStream(**kwargs)
+
+class AudioCapture:
+    """
+    Grabación del micrófono sobre un AudioRingBuffer que se reutiliza entre grabaciones.
+    `stream_factory` recibe los argumentos de sounddevice.InputStream (samplerate, channels,
+    dtype, blocksize, callback) y devuelve un stream con start/stop/close.
+    """
+
+    def __init__(
+        self,
+        samplerate: float,
+        channels: int = 1,
+        dtype: str = "int16",
+        initial_seconds: float = CAPTURE_INITIAL_SECONDS,
+        max_seconds: float = CAPTURE_MAX_SECONDS,
+        blocksize: int = 0,
+        stream_factory: Callable[..., Any] = default_stream_factory,
+    ):
+        self.samplerate = samplerate
+        self.channels = channels
+        self.dtype = dtype
+        self.blocksize = blocksize
+        self.stream_factory = stream_factory
+        self.ring = AudioRingBuffer(
+            int(initial_seconds * samplerate), channels, dtype, max_frames=int(max_seconds * samplerate)
+        )
+        self._stream = None
+        self._maintainer: Optional[threading.Thread] = None
+        self._running = threading.Event()
+        self.callbacks = 0
+        self.xruns = 0
+        self.input_overflows = 0
+        self.started_at = 0.0
+
+    def _callback(self, indata, frames, time_info, status) -> None:
+        # Hilo de audio: nada de logging, locks ni asignaciones; solo contadores y una copia
+        self.callbacks += 1
+        if status:
+            self.xruns += 1
+            if getattr(status, "input_overflow", False):
+                self.input_overflows += 1
+        self.ring.write(indata)
+
+    def _maintain(self) -> None:
+        while self._running.is_set():
+            self.ring.reserve()
+            time.sleep(MAINTENANCE_INTERVAL)
+
+    def start(self) -> None:
+        """Empieza una grabación nueva (la vista de la anterior deja de ser válida)."""
+        if self._stream is not None:
+            return
+        self.ring.clear()
+        self.callbacks = self.xruns = self.input_overflows = 0
+        self._stream = self.stream_factory(
+            samplerate=self.samplerate, channels=self.channels, dtype=self.dtype,
+            blocksize=self.blocksize, callback=self._callback,
+        )
+        self._running.set()
+        self._maintainer = threading.Thread(target=self._maintain, name="AudioCaptureMaintenance", daemon=True)
+        self._maintainer.start()
+        self.started_at = time.perf_counter()
+        self._stream.start()
+
+    def stop(self) -> np.ndarray:
+        """Detiene la grabación y devuelve el audio (vista sin copia del buffer)."""
+        if self._stream is not None:
+            try:
+                self._stream.stop()
+                self._stream.close()
+            finally:
+                self._stream = None
+                self._running.clear()
+                self._maintainer.join()
+            if self.xruns:
+                logger.warning("Grabación con %d xruns de audio (%d desbordamientos de entrada).", self.xruns, self.input_overflows)
+        return self.ring.view()
+
+    def __enter__(self) -> "AudioCapture":
+        self.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+    async def record(self, until: Callable[[], Awaitable[Any]]) -> np.ndarray:
+        """
+        Graba hasta que termine el awaitable que devuelve `until()`, que se llama una vez
+        abierto el micrófono (p. ej. input() en el executor o stop_event.wait).
+        """
+        self.start()
+        try:
+            await until()
+        finally:
+            audio = self.stop()
+        return audio
+
+    def stats(self) -> Dict[str, Any]:
+        frames = len(self.ring)
+        return {
+            "seconds": round(frames / self.samplerate, 3) if self.samplerate else 0.0,
+            "frames": frames,
+            "capacity_frames": self.ring.capacity,
+            "grows": self.ring.grows,
+            "emergency_grows": self.ring.emergency_grows,
+            "overflow_frames": self.ring.overflow_frames,
+            "callbacks": self.callbacks,
+            "xruns": self.xruns,
+            "input_overflows": self.input_overflows,
+        }
+
+class SyntheticStatus:
+    """Equivalente mínimo de sounddevice.CallbackFlags para simular xruns."""
+
+    def __init__(self, input_overflow: bool = False):
+        self.input_overflow = input_overflow
+
+    def __bool__(self) -> bool:
+        return self.input_overflow
+
+class SyntheticInputStream:
+    """
+    Stream de entrada falso para pruebas: entrega `signal` al callback en bloques desde un
+    hilo propio, como haría PortAudio. Con `realtime` respeta la duración de cada bloque;
+    `xrun_blocks` marca los bloques que llegan con input_overflow.
+    Uso: AudioCapture(..., stream_factory=functools.partial(SyntheticInputStream, signal)).
+    """
+
+    def __init__(self, signal: np.ndarray, samplerate: float, channels: int, dtype: str, blocksize: int,
+                 callback: Callable, realtime: bool = False, xrun_blocks: tuple = ()):
+        signal = np.asarray(signal, dtype=dtype)
+        self.signal = signal.reshape(-1, channels) if signal.ndim == 1 else signal
+        self.samplerate = samplerate
+        self.blocksize = blocksize or 480
+        self.callback = callback
+        self.realtime = realtime
+        self.xrun_blocks = set(xrun_blocks)
+        self.finished = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="SyntheticInputStream", daemon=True)
+
+    def _run(self) -> None:
+        for index, start in enumerate(range(0, len(self.signal), self.blocksize)):
+            if self._stop.is_set():
+                break
+            block = self.signal[start:start + self.blocksize]
+            self.callback(block, len(block), None, SyntheticStatus(index in self.xrun_blocks))
+            if self.realtime:
+                time.sleep(len(block) / self.samplerate)
+        self.finished.set()
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def close(self) -> None:
+        pass
@@ -0,0 +1,249 @@
+# playback.py
+#
+# Reproducción en streaming de la respuesta del agente. En lugar de juntar todos los
+# fragmentos de voice_stream_event_audio, concatenarlos y llamar a sd.play/sd.wait al final,
+# cada fragmento se encola en un buffer de jitter en cuanto llega y un OutputStream de
+# PortAudio lo va consumiendo. El stream arranca cuando hay `prebuffer_ms` de audio (o al
+# terminar la respuesta, si es más corta), así que el usuario empieza a oír la respuesta
+# poco después de que llegue el primer fragmento y no al final de la síntesis.
+#
+# Si el TTS se retrasa y el buffer se vacía a mitad de respuesta, se emite silencio, se cuenta
+# como underrun y se vuelve a acumular el prebuffer antes de seguir.
+#
+#   player = AudioPlayer(samplerate, prebuffer_ms=PLAYBACK_PREBUFFER_MS)
+#   player.begin_turn()                       # al terminar de hablar el usuario
+#   async for event in result.stream():
+#       if event.type == "voice_stream_event_audio":
+#           player.write(event.data)          # no bloquea
+#   await player.finish()                     # espera a que termine de sonar
+#   player.stats()                            # time-to-first-audio, underruns... del turno
+#
+# Para pruebas, `stream_factory` sustituye al altavoz (SyntheticOutputStream).
+
+import asyncio
+import collections
+import logging
+import threading
+import time
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger("AudioPlayer")
+
+PLAYBACK_PREBUFFER_MS = 120
+DRAIN_POLL_INTERVAL = 0.01   # segundos entre comprobaciones de finish()
+DRAIN_MARGIN = 1.0           # segundos de margen sobre el audio pendiente antes de cortar
+
+def default_stream_factory(**kwargs: Any) -> Any:
+    """sounddevice.OutputStream (se importa aquí para que el módulo funcione sin PortAudio)."""
+    import sounddevice as sd
+
+    return sd.OutputStream(**kwargs)
+
+class AudioPlayer:
+    """
+    Reproductor de una respuesta por turno. `write` se llama desde el event loop y el callback
+    de audio consume desde otro hilo; ambos comparten una cola de fragmentos protegida por un
+    lock que solo se retiene para copiar frames. Las estadísticas se reinician en begin_turn().
+    """
+
+    def __init__(
+        self,
+        samplerate: float,
+        channels: int = 1,
+        dtype: str = "int16",
+        prebuffer_ms: float = PLAYBACK_PREBUFFER_MS,
+        blocksize: int = 0,
+        stream_factory: Callable[..., Any] = default_stream_factory,
+    ):
+        self.samplerate = samplerate
+        self.channels = channels
+        self.dtype = dtype
+        self.prebuffer_frames = max(1, int(samplerate * prebuffer_ms / 1000))
+        self.blocksize = blocksize
+        self.stream_factory = stream_factory
+        self._lock = threading.Lock()
+        self._chunks: Deque[np.ndarray] = collections.deque()
+        self._stream = None
+        self._drained = threading.Event()
+        self.turns = 0
+        self.begin_turn()
+
+    def begin_turn(self) -> None:
+        """Reinicia el buffer y las métricas; el time-to-first-audio se mide desde aquí."""
+        self.abort()
+        with self._lock:
+            self._chunks.clear()
+            self._offset = 0          # frames ya reproducidos del primer fragmento
+            self._buffered = 0        # frames en cola
+            self._finished = False
+            self._rebuffering = False
+            self._starving = False
+        self._drained.clear()
+        self.turn_started_at = time.perf_counter()
+        self.first_chunk_at: Optional[float] = None
+        self.first_audio_at: Optional[float] = None
+        self.chunks = 0
+        self.frames_written = 0
+        self.frames_played = 0
+        self.underruns = 0
+        self.underrun_frames = 0
+        self.xruns = 0
+
+    def write(self, chunk: np.ndarray) -> None:
+        """Encola un fragmento de audio y arranca la reproducción al completar el prebuffer."""
+        chunk = np.asarray(chunk, dtype=self.dtype)
+        if chunk.ndim == 1:
+            chunk = chunk.reshape(-1, self.channels)
+        if not len(chunk):
+            return
+        if self.first_chunk_at is None:
+            self.first_chunk_at = time.perf_counter()
+        with self._lock:
+            self._chunks.append(chunk)
+            self._buffered += len(chunk)
+            buffered = self._buffered
+        self.chunks += 1
+        self.frames_written += len(chunk)
+        if self._stream is None and buffered >= self.prebuffer_frames:
+            self._start_stream()
+
+    def _start_stream(self) -> None:
+        self._stream = self.stream_factory(
+            samplerate=self.samplerate, channels=self.channels, dtype=self.dtype,
+            blocksize=self.blocksize, callback=self._callback,
+        )
+        self._stream.start()
+
+    def _callback(self, outdata, frames, time_info, status) -> None:
+        # Hilo de audio: sin logging ni esperas; solo copia bajo el lock y contadores
+        if status:
+            self.xruns += 1
+        filled = 0
+        with self._lock:
+            if self._rebuffering and self._buffered < self.prebuffer_frames and not self._finished:
+                pass                  # sigue acumulando tras un underrun
+            else:
+                self._rebuffering = False
+                while filled < frames and self._chunks:
+                    chunk = self._chunks[0]
+                    take = min(frames - filled, len(chunk) - self._offset)
+                    outdata[filled:filled + take] = chunk[self._offset:self._offset + take]
+                    filled += take
+                    self._offset += take
+                    if self._offset == len(chunk):
+                        self._chunks.popleft()
+                        self._offset = 0
+                self._buffered -= filled
+            finished, empty = self._finished, not self._chunks
+        if filled:
+            if self.first_audio_at is None:
+                self.first_audio_at = time.perf_counter()
+            self.frames_played += filled
+        if filled < frames:
+            outdata[filled:] = 0
+            if finished and empty:
+                self._drained.set()
+            elif self.first_audio_at is not None:
+                if not self._starving:
+                    self.underruns += 1
+                    self._starving = True
+                    with self._lock:
+                        self._rebuffering = True
+                self.underrun_frames += frames - filled
+        else:
+            self._starving = False
+
+    async def finish(self) -> Dict[str, Any]:
+        """Marca el final de la respuesta, espera a que se reproduzca entera y devuelve las métricas."""
+        with self._lock:
+            self._finished = True
+            pending = self._buffered
+        if pending and self._stream is None:
+            self._start_stream()      # respuesta más corta que el prebuffer
+        if self._stream is not None:
+            deadline = time.perf_counter() + pending / self.samplerate + DRAIN_MARGIN
+            while not self._drained.is_set() and time.perf_counter() < deadline:
+                await asyncio.sleep(DRAIN_POLL_INTERVAL)
+            if not self._drained.is_set():
+                logger.warning("La reproducción no terminó a tiempo; se detiene el stream de salida.")
+            self.abort()
+        self.turns += 1
+        stats = self.stats()
+        if self.underruns:
+            logger.warning("Reproducción con %d underruns (%.0f ms de silencio).", self.underruns, stats["underrun_ms"])
+        return stats
+
+    def abort(self) -> None:
+        """Detiene la reproducción en curso (p. ej. si falla el stream de eventos) y descarta lo pendiente."""
+        stream, self._stream = self._stream, None
+        if stream is not None:
+            try:
+                stream.stop()
+                stream.close()
+            except Exception as e:
+                logger.error("Error al cerrar el stream de salida: %s", e)
+        with self._lock:
+            self._chunks.clear()
+            self._buffered = 0
+
+    def _ms_since_turn(self, moment: Optional[float]) -> Optional[float]:
+        return round((moment - self.turn_started_at) * 1000, 1) if moment is not None else None
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas del turno actual."""
+        return {
+            "first_chunk_ms": self._ms_since_turn(self.first_chunk_at),
+            "time_to_first_audio_ms": self._ms_since_turn(self.first_audio_at),
+            "prebuffer_ms": round(self.prebuffer_frames / self.samplerate * 1000, 1),
+            "chunks": self.chunks,
+            "audio_seconds": round(self.frames_written / self.samplerate, 3),
+            "frames_played": self.frames_played,
+            "underruns": self.underruns,
+            "underrun_ms": round(self.underrun_frames / self.samplerate * 1000, 1),
+            "xruns": self.xruns,
+        }
+
+class SyntheticOutputStream:
+    """
+    Stream de salida falso para pruebas: pide bloques al callback desde un hilo propio, como
+    haría PortAudio, y guarda lo reproducido en `played`. Con `realtime` respeta la duración
+    de cada bloque. Uso: AudioPlayer(..., stream_factory=SyntheticOutputStream).
+    """
+
+    def __init__(self, samplerate: float, channels: int, dtype: str, blocksize: int,
+                 callback: Callable, realtime: bool = True):
+        self.samplerate = samplerate
+        self.channels = channels
+        self.dtype = dtype
+        self.blocksize = blocksize or 240
+        self.callback = callback
+        self.realtime = realtime
+        self.played: List[np.ndarray] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="SyntheticOutputStream", daemon=True)
+
+    def _run(self) -> None:
+        period = self.blocksize / self.samplerate
+        while not self._stop.is_set():
+            outdata = np.empty((self.blocksize, self.channels), dtype=self.dtype)
+            self.callback(outdata, self.blocksize, None, None)
+            self.played.append(outdata)
+            if self.realtime:
+                time.sleep(period)
+
+    def output(self) -> np.ndarray:
+        """Todo lo reproducido hasta ahora, concatenado."""
+        return np.concatenate(self.played) if self.played else np.zeros((0, self.channels), dtype=self.dtype)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def close(self) -> None:
+        pass
@@ -0,0 +1,46 @@
+# batch_utils.py
+#
+# Utilidades compartidas por los agrupadores de peticiones (LeadWriter en agent/sqlite_db.py,
+# MicroBatcher en nlp/batching.py) y por las métricas de latencia (crm_router, benchmarks).
+# No dependen de nada del proyecto para que tanto agent como nlp puedan importarlas.
+#
+#   batch, stop = await collect_batch(queue, max_size=32, max_wait=0.01)
+#   percentile(sorted(latencias), 0.95)
+
+import asyncio
+import math
+from typing import Any, List, Sequence, Tuple
+
+async def collect_batch(queue: asyncio.Queue, max_size: int, max_wait: float) -> Tuple[List[Any], bool]:
+    """
+    Espera el primer elemento de `queue` y agrupa los que lleguen durante `max_wait` segundos,
+    hasta `max_size`. Un None en la cola es la señal de parada: devuelve (lote, True) y el
+    llamante debe terminar tras procesar el lote.
+    """
+    loop = asyncio.get_running_loop()
+    batch = []
+    item = await queue.get()
+    deadline = loop.time() + max_wait
+    while item is not None:
+        batch.append(item)
+        if len(batch) >= max_size:
+            break
+        try:
+            item = queue.get_nowait()
+            continue
+        except asyncio.QueueEmpty:
+            pass
+        timeout = deadline - loop.time()
+        if timeout <= 0:
+            break
+        try:
+            item = await asyncio.wait_for(queue.get(), timeout)
+        except asyncio.TimeoutError:
+            break
+    return batch, item is None
+
+def percentile(ordered: Sequence[float], p: float) -> float:
+    """Percentil `p` (0-1) por el método del rango más cercano; `ordered` ya viene ordenada."""
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(p * len(ordered)) - 1)]
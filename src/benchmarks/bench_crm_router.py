@@ -0,0 +1,80 @@
+# bench_crm_router.py
+#
+# Prueba de carga del router de CRM (agent/crm_router.py) sin red: un primario y varios
+# secundarios FakeBackend con latencia y tasa de error simuladas. Mide la latencia que ve
+# quien llama (solo espera al primario) frente a la de cada backend, y escribe JSON.
+#
+#   python -m benchmarks.bench_crm_router
+#   python -m benchmarks.bench_crm_router --leads 5000 --concurrency 64 --secondary-latency 0.2
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Sequence
+
+from agent.crm_router import CRMRouter, FakeBackend, LatencyStats
+
+def _lead(i: int) -> Dict[str, str]:
+    return {
+        "nombre": f"Lead {i}",
+        "empresa": "Empresa XYZ",
+        "necesidades": "Servicios de consultoría y software a medida",
+        "presupuesto": str((i % 200 + 1) * 500),
+    }
+
+async def run(args: argparse.Namespace) -> Dict:
+    primary = FakeBackend("primary", latency=args.primary_latency, jitter=args.primary_latency / 2, seed=1)
+    secondaries = [
+        FakeBackend(f"secondary_{n}", latency=args.secondary_latency, jitter=args.secondary_latency / 2,
+                    failure_rate=args.failure_rate, seed=n + 2)
+        for n in range(args.secondaries)
+    ]
+    router = CRMRouter(primary, secondaries)
+    caller = LatencyStats(max_samples=args.leads)
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def write(i: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await router.write_lead(_lead(i))
+            caller.record(time.perf_counter() - start, True)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(write(i) for i in range(args.leads)))
+    acknowledged = time.perf_counter() - start
+    await router.drain()
+    completed = time.perf_counter() - start
+    return {
+        "leads": args.leads,
+        "concurrency": args.concurrency,
+        "acknowledged_seconds": round(acknowledged, 3),
+        "completed_seconds": round(completed, 3),
+        "leads_per_sec": round(args.leads / acknowledged, 1),
+        "caller": caller.summary(),
+        **router.stats(),
+    }
+
+def main(argv: Sequence[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Prueba de carga de agent/crm_router.py con backends simulados")
+    parser.add_argument("--leads", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--secondaries", type=int, default=2)
+    parser.add_argument("--primary-latency", type=float, default=0.002, help="Segundos.")
+    parser.add_argument("--secondary-latency", type=float, default=0.05, help="Segundos.")
+    parser.add_argument("--failure-rate", type=float, default=0.01)
+    parser.add_argument("--output", default="bench_crm_router.json")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Quien llama:  p50={report['caller']['p50_ms']}ms  p95={report['caller']['p95_ms']}ms")
+    for name, row in report["backends"].items():
+        print(f"{name:<12} p50={row['p50_ms']}ms  p95={row['p95_ms']}ms  errores={row['errors']}/{row['calls']}")
+    print(f"Resultados escritos en {args.output}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+# bench_lead_extraction.py
+#
+# Rendimiento de nlp.entity_extraction.extract_lead_info sobre un corpus sintético de
+# transcripciones (etiquetas en inglés y en español, con y sin ":", JSON, texto libre), comparado con la
+# implementación anterior (json.loads en cada texto y cinco re.search sin compilar). Mide
+# documentos por segundo y cuántos campos coinciden entre ambas, y escribe JSON.
+#
+#   python -m benchmarks.bench_lead_extraction
+#   python -m benchmarks.bench_lead_extraction --docs 500000 --repeat 3
+
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence
+
+from nlp.entity_extraction import extract_lead_info
+
+def extract_lead_info_legacy(text: str) -> dict:
+    """Implementación anterior, conservada como referencia para la comparación."""
+    try:
+        data = json.loads(text)
+        required_keys = ["name", "company", "email", "budget", "timeline"]
+        if all(key in data for key in required_keys):
+            return data
+    except Exception:
+        pass
+    lead_info = {}
+    email_match = re.search(r'[\w\.-]+@[\w\.-]+\.\w+', text)
+    if email_match:
+        lead_info["email"] = email_match.group(0)
+    name_match = re.search(r'Name[:\s]+([\w\s]+)', text, re.IGNORECASE)
+    if name_match:
+        lead_info["name"] = name_match.group(1).strip()
+    company_match = re.search(r'Company[:\s]+([\w\s]+)', text, re.IGNORECASE)
+    if company_match:
+        lead_info["company"] = company_match.group(1).strip()
+    budget_match = re.search(r'Budget[:\s]+([$€]\d+)', text, re.IGNORECASE)
+    if budget_match:
+        lead_info["budget"] = budget_match.group(1).strip()
+    timeline_match = re.search(r'Timeline[:\s]+([\w\s]+)', text, re.IGNORECASE)
+    if timeline_match:
+        lead_info["timeline"] = timeline_match.group(1).strip()
+    return lead_info
+
+FIRST_NAMES = ["Juan", "María", "John", "Ana", "Carlos", "Laura", "Peter", "Sofía"]
+LAST_NAMES = ["Pérez", "González", "Smith", "Torres", "Ruiz", "Müller", "Martínez"]
+COMPANIES = ["Acme Corp", "Empresa XYZ", "Globex", "Initech", "Telefónica", "Cyberdyne Systems"]
+TIMELINES = ["Next quarter", "Q3", "tres meses", "this year", "enero"]
+FILLER = (
+    "Gracias por llamar, le cuento un poco sobre nuestro proyecto y lo que necesitamos para el equipo de ventas. "
+    "We are evaluating several providers and want to understand pricing, support and integrations. "
+)
+
+def _document(rng: random.Random) -> str:
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    company = rng.choice(COMPANIES)
+    email = f"{name.split()[0].lower()}{rng.randint(1, 999)}@example.com"
+    budget = rng.randint(1, 500) * 100
+    timeline = rng.choice(TIMELINES)
+    filler = FILLER * rng.randint(1, 6)
+    kind = rng.random()
+    if kind < 0.35:
+        return f"{filler}\nName: {name}\nCompany: {company}\nEmail: {email}\nBudget: ${budget}\nTimeline: {timeline}\n"
+    if kind < 0.7:
+        return f"{filler}\nNombre: {name}\nEmpresa: {company}\nCorreo: {email}\nPresupuesto: {budget} euros\nPlazo: {timeline}\n"
+    if kind < 0.8:
+        # etiquetas sin ":" tal como llegan de la transcripción hablada
+        return f"{filler}Name {name}, Company {company}, budget ${budget}, timeline {timeline}. Email {email}\n"
+    if kind < 0.9:
+        return json.dumps({"name": name, "company": company, "email": email, "budget": f"${budget}", "timeline": timeline})
+    return f"{filler}Me puede escribir a {email} cuando tenga la propuesta. {filler}"
+
+def build_corpus(docs: int, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    return [_document(rng) for _ in range(docs)]
+
+def measure(function: Callable[[str], dict], corpus: Sequence[str], repeat: int) -> Dict[str, float]:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in corpus:
+            function(text)
+        best = min(best, time.perf_counter() - start)
+    return {"seconds": round(best, 3), "docs_per_sec": round(len(corpus) / best, 1)}
+
+def main(argv: Sequence[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Rendimiento de extract_lead_info frente a la versión anterior")
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3, help="Se toma la mejor de N pasadas.")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default="bench_lead_extraction.json")
+    args = parser.parse_args(argv)
+
+    corpus = build_corpus(args.docs, args.seed)
+    before = measure(extract_lead_info_legacy, corpus, args.repeat)
+    after = measure(extract_lead_info, corpus, args.repeat)
+    fields_before = sum(len(extract_lead_info_legacy(text)) for text in corpus)
+    fields_after = sum(len(extract_lead_info(text)) for text in corpus)
+    report = {
+        "docs": args.docs,
+        "avg_chars": round(sum(map(len, corpus)) / len(corpus), 1),
+        "before": {**before, "fields_extracted": fields_before},
+        "after": {**after, "fields_extracted": fields_after},
+        "speedup": round(after["docs_per_sec"] / before["docs_per_sec"], 2),
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Antes:   {before['docs_per_sec']:>10} docs/s  campos={fields_before}")
+    print(f"Después: {after['docs_per_sec']:>10} docs/s  campos={fields_after}  (x{report['speedup']})")
+    print(f"Resultados escritos en {args.output}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
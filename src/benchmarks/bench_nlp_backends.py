@@ -0,0 +1,123 @@
+# bench_nlp_backends.py
+#
+# Compara el backend PyTorch fp32 de NLPProcessor con el backend ONNX Runtime int8
+# (nlp/onnx_backend.py) sobre un conjunto fijo de frases en español e inglés: tiempo de carga,
+# latencia por frase (p50/p95) y coincidencia con PyTorch (etiqueta de intención y F1 de
+# entidades), y escribe JSON.
+#
+#   python -m benchmarks.bench_nlp_backends
+#   python -m benchmarks.bench_nlp_backends --repeat 20 --arch avx512_vnni
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Set, Tuple
+
+from batch_utils import percentile
+from nlp.entity_intention_extraction import NLPProcessor
+from nlp.model_registry import ModelRegistry
+from nlp.onnx_backend import ONNX_MODEL_DIR, QUANTIZATION_ARCH, onnx_registry
+
+SAMPLES = [
+    "Hola, mi nombre es Juan Pérez y trabajo en Empresa XYZ.",
+    "Necesito un CRM para mi equipo de ventas con un presupuesto de 10000 dólares.",
+    "Quiero agregar un lead: María González, de Acme Corporation, en Madrid.",
+    "Actualiza el presupuesto de Carlos Ruiz a 25000 euros.",
+    "Elimina el lead de Laura Martínez, por favor.",
+    "Lista todos los leads registrados esta semana.",
+    "¿Cuánto cuesta el plan empresarial para Telefónica?",
+    "Sí, confirmo.",
+    "Hi, this is John Smith from Globex in New York.",
+    "We need a chatbot for customer support, our budget is around $50,000.",
+    "Please delete the lead for Sarah Connor at Cyberdyne Systems.",
+    "Can you tell me more about your pricing?",
+    "I'd like to buy the premium package next month.",
+    "Anna Müller works at Siemens in Berlin and wants a demo.",
+]
+
+def _entity_set(entities: List[Dict[str, Any]]) -> Set[Tuple[str, str]]:
+    return {(e.get("entity_group", e.get("entity", "")), str(e.get("word", "")).strip().lower()) for e in entities}
+
+def _top_label(intent: List[Dict[str, Any]]) -> str:
+    return max(intent, key=lambda row: row["score"])["label"] if intent else ""
+
+def entity_f1(reference: List[Dict[str, Any]], candidate: List[Dict[str, Any]]) -> float:
+    """F1 de las entidades (tipo, texto) de `candidate` frente a `reference`."""
+    expected, found = _entity_set(reference), _entity_set(candidate)
+    if not expected and not found:
+        return 1.0
+    matched = len(expected & found)
+    if not matched:
+        return 0.0
+    precision, recall = matched / len(found), matched / len(expected)
+    return 2 * precision * recall / (precision + recall)
+
+def run_backend(registry: ModelRegistry, repeat: int) -> Dict[str, Any]:
+    start = time.perf_counter()
+    registry.warm_up()
+    load_seconds = time.perf_counter() - start
+    processor = NLPProcessor(registry)
+    outputs, latencies = [], []
+    for text in SAMPLES:
+        for _ in range(repeat):
+            begin = time.perf_counter()
+            entities = processor.extract_entities(text)
+            intent = processor.classify_intent(text)
+            latencies.append(time.perf_counter() - begin)
+        outputs.append({"entities": entities, "intent": intent})
+    ordered = sorted(latencies)
+    return {
+        "load_seconds": round(load_seconds, 3),
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "memory_delta_bytes": sum(m["memory_delta_bytes"] for m in registry.stats()["models"].values()),
+        "outputs": outputs,
+    }
+
+def compare(reference: List[Dict[str, Any]], candidate: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Coincidencia de `candidate` con `reference`, frase a frase y en total."""
+    rows = []
+    for text, ref, cand in zip(SAMPLES, reference, candidate):
+        rows.append({
+            "text": text,
+            "intent_match": _top_label(ref["intent"]) == _top_label(cand["intent"]),
+            "entity_f1": round(entity_f1(ref["entities"], cand["entities"]), 3),
+        })
+    return {
+        "intent_agreement": round(sum(row["intent_match"] for row in rows) / len(rows), 3),
+        "mean_entity_f1": round(sum(row["entity_f1"] for row in rows) / len(rows), 3),
+        "samples": rows,
+    }
+
+def main(argv: Sequence[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compara NLPProcessor con PyTorch fp32 y con ONNX Runtime int8")
+    parser.add_argument("--repeat", type=int, default=10, help="Repeticiones por frase.")
+    parser.add_argument("--model-dir", default=str(ONNX_MODEL_DIR))
+    parser.add_argument("--arch", default=QUANTIZATION_ARCH, help="avx2, avx512, avx512_vnni o arm64.")
+    parser.add_argument("--output", default="bench_nlp_backends.json")
+    args = parser.parse_args(argv)
+
+    torch = run_backend(ModelRegistry(), args.repeat)
+    onnx = run_backend(onnx_registry(args.model_dir, args.arch), args.repeat)
+    report = {
+        "samples": len(SAMPLES),
+        "repeat": args.repeat,
+        "torch_fp32": {k: v for k, v in torch.items() if k != "outputs"},
+        "onnx_int8": {k: v for k, v in onnx.items() if k != "outputs"},
+        "speedup_p50": round(torch["p50_ms"] / onnx["p50_ms"], 2) if onnx["p50_ms"] else None,
+        "agreement": compare(torch["outputs"], onnx["outputs"]),
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    for name in ("torch_fp32", "onnx_int8"):
+        row = report[name]
+        print(f"{name:<11} carga={row['load_seconds']}s  p50={row['p50_ms']}ms  p95={row['p95_ms']}ms")
+    agreement = report["agreement"]
+    print(f"Intención coincidente: {agreement['intent_agreement']:.0%}  F1 de entidades: {agreement['mean_entity_f1']}")
+    print(f"Resultados escritos en {args.output}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+# bench_sqlite_db.py
+#
+# Benchmark autocontenido de la capa de almacenamiento de leads (agent/sqlite_db.py).
+# Siembra una base temporal con N leads y mide throughput y latencias p50/p99 de
+# insert, update-by-name, delete-by-name y listados, en modo síncrono y a través de los
+# wrappers async_* con distintos niveles de concurrencia. Escribe los resultados en JSON.
+#
+#   python -m benchmarks.bench_sqlite_db
+#   python -m benchmarks.bench_sqlite_db --sizes 10000 100000 1000000 --ops 2000 --output bench.json
+
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Sequence
+
+from agent import sqlite_db
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+DEFAULT_CONCURRENCY = (1, 8, 32)
+EMPRESAS = ("Empresa XYZ", "Acme Corp", "Globex", "Initech", "Umbrella", "Soylent")
+
+def _lead(i: int) -> Dict[str, str]:
+    return {
+        "nombre": f"Lead {i}",
+        "empresa": EMPRESAS[i % len(EMPRESAS)],
+        "necesidades": "Servicios de consultoría y software a medida",
+        "presupuesto": f"{(i % 200 + 1) * 500}",
+    }
+
+def percentile(samples: Sequence[float], p: float) -> float:
+    """Percentil nearest-rank de una lista de latencias."""
+    ordered = sorted(samples)
+    rank = max(1, -(-len(ordered) * p // 1))
+    return ordered[int(rank) - 1]
+
+def _summary(size: int, mode: str, concurrency: int, operation: str, latencies: List[float], elapsed: float) -> Dict:
+    return {
+        "size": size,
+        "mode": mode,
+        "concurrency": concurrency,
+        "operation": operation,
+        "ops": len(latencies),
+        "seconds": round(elapsed, 4),
+        "ops_per_sec": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 4),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 4),
+    }
+
+def run_sync(operation: Callable[[int], object], args: Sequence[int]) -> tuple:
+    latencies = []
+    start = time.perf_counter()
+    for arg in args:
+        t0 = time.perf_counter()
+        operation(arg)
+        latencies.append(time.perf_counter() - t0)
+    return latencies, time.perf_counter() - start
+
+async def run_async(operation: Callable[[int], Awaitable], args: Sequence[int], concurrency: int) -> tuple:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def timed(arg: int) -> None:
+        async with semaphore:
+            t0 = time.perf_counter()
+            await operation(arg)
+            latencies.append(time.perf_counter() - t0)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(timed(arg) for arg in args))
+    return latencies, time.perf_counter() - start
+
+def seed(size: int) -> float:
+    start = time.perf_counter()
+    sqlite_db.insert_leads_many(_lead(i) for i in range(size))
+    return time.perf_counter() - start
+
+def bench_size(size: int, ops: int, concurrency_levels: Sequence[int], workdir: Path) -> List[Dict]:
+    sqlite_db.DB_NAME = str(workdir / f"bench_{size}.db")
+    sqlite_db.init_db()
+    seed_seconds = seed(size)
+    results = [{
+        "size": size, "mode": "sync", "concurrency": 1, "operation": "seed_bulk",
+        "ops": size, "seconds": round(seed_seconds, 4), "ops_per_sec": round(size / seed_seconds, 1),
+    }]
+    rng = random.Random(size)
+    next_id = [size]
+
+    def fresh_ids(n: int) -> List[int]:
+        ids = list(range(next_id[0], next_id[0] + n))
+        next_id[0] += n
+        return ids
+
+    # Cada fase borra leads distintos para que todas las eliminaciones encuentren su fila
+    deletable = rng.sample(range(size), min(size, ops * (1 + len(concurrency_levels))))
+    delete_batches = [deletable[i * ops:(i + 1) * ops] for i in range(1 + len(concurrency_levels))]
+    updates = [rng.randrange(size) for _ in range(ops)]
+    cursors = [rng.randrange(size) for _ in range(ops)]
+
+    sync_ops = {
+        "insert": (lambda i: sqlite_db.insert_lead(_lead(i)), fresh_ids(ops)),
+        "update_by_name": (lambda i: sqlite_db.update_lead_field(f"Lead {i}", "empresa", "Actualizada"), updates),
+        "get_by_name": (lambda i: sqlite_db._get_lead_uncached(f"lead {i}"), updates),
+        "list_page": (lambda i: sqlite_db.list_leads_page(limit=50, after=i), cursors),
+        "delete_by_name": (lambda i: sqlite_db.delete_lead_by_name(f"Lead {i}"), delete_batches[0]),
+    }
+    for name, (operation, args) in sync_ops.items():
+        latencies, elapsed = run_sync(operation, args)
+        results.append(_summary(size, "sync", 1, name, latencies, elapsed))
+
+    start = time.perf_counter()
+    scanned = sum(1 for _ in sqlite_db.iter_leads(columns=("nombre",)))
+    elapsed = time.perf_counter() - start
+    results.append({
+        "size": size, "mode": "sync", "concurrency": 1, "operation": "list_full_scan",
+        "ops": scanned, "seconds": round(elapsed, 4), "ops_per_sec": round(scanned / elapsed, 1),
+    })
+
+    async def async_phase(concurrency: int, deletes: List[int]) -> List[Dict]:
+        async_ops = {
+            "insert": (lambda i: sqlite_db.async_insert_lead(_lead(i)), fresh_ids(ops)),
+            "update_by_name": (lambda i: sqlite_db.async_update_lead_field(f"Lead {i}", "empresa", "Async"), updates),
+            "list_page": (lambda i: sqlite_db.async_list_leads_page(50, i), cursors),
+            "delete_by_name": (lambda i: sqlite_db.async_delete_lead_by_name(f"Lead {i}"), deletes),
+        }
+        phase = []
+        for name, (operation, args) in async_ops.items():
+            latencies, elapsed = await run_async(operation, args, concurrency)
+            phase.append(_summary(size, "async", concurrency, name, latencies, elapsed))
+        phase.append({
+            "size": size, "mode": "async", "concurrency": concurrency, "operation": "writer_stats",
+            **sqlite_db.writer.stats(),
+        })
+        await sqlite_db.writer.close()
+        return phase
+
+    for concurrency, deletes in zip(concurrency_levels, delete_batches[1:]):
+        sqlite_db.writer = sqlite_db.LeadWriter()
+        results.extend(asyncio.run(async_phase(concurrency, deletes)))
+
+    sqlite_db.close_pool()
+    return results
+
+def main(argv: Sequence[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de agent/sqlite_db.py")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--ops", type=int, default=1000, help="Operaciones medidas por fase.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=list(DEFAULT_CONCURRENCY))
+    parser.add_argument("--output", default="bench_sqlite_db.json")
+    args = parser.parse_args(argv)
+
+    logging.getLogger("sqlite_db").setLevel(logging.WARNING)
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "ops": args.ops,
+        },
+        "results": [],
+    }
+    with tempfile.TemporaryDirectory(prefix="bench_sqlite_db_") as tmp:
+        for size in args.sizes:
+            print(f"Sembrando y midiendo {size} leads...", file=sys.stderr)
+            report["results"].extend(bench_size(size, args.ops, args.concurrency, Path(tmp)))
+
+    Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    for row in report["results"]:
+        if "p50_ms" in row:
+            print(
+                f"{row['size']:>9} {row['mode']:>5} c={row['concurrency']:<3} {row['operation']:<16}"
+                f" {row['ops_per_sec']:>10} ops/s  p50={row['p50_ms']:.3f}ms  p99={row['p99_ms']:.3f}ms"
+            )
+    print(f"Resultados escritos en {args.output}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
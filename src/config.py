@@ -4,4 +4,24 @@ from dotenv import load_dotenv
 load_dotenv()  
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-CRM_PASSWORD = os.getenv("CRM_PASSWORD")
\ No newline at end of file
+CRM_PASSWORD = os.getenv("CRM_PASSWORD")
+
+# Sincronización en segundo plano con CRMs remotos (outbox). Destinos separados por comas: hubspot,airtable
+CRM_OUTBOX_TARGETS = [t.strip() for t in os.getenv("CRM_OUTBOX_TARGETS", "").split(",") if t.strip()]
+CRM_OUTBOX_BATCH_SIZE = int(os.getenv("CRM_OUTBOX_BATCH_SIZE", "50"))
+CRM_OUTBOX_MAX_ATTEMPTS = int(os.getenv("CRM_OUTBOX_MAX_ATTEMPTS", "8"))
+HUBSPOT_API_KEY = os.getenv("HUBSPOT_API_KEY")
+AIRTABLE_API_KEY = os.getenv("AIRTABLE_API_KEY")
+AIRTABLE_BASE_ID = os.getenv("AIRTABLE_BASE_ID")
+AIRTABLE_TABLE_NAME = os.getenv("AIRTABLE_TABLE_NAME", "Leads")
+AIRTABLE_MIRROR_INTERVAL = float(os.getenv("AIRTABLE_MIRROR_INTERVAL", "300"))  # segundos entre sincronizaciones de la réplica local
+# Router de CRM: backends secundarios (hubspot,airtable,crm_integration) que reciben cada lead además de la base local
+CRM_ROUTER_SECONDARIES = [t.strip() for t in os.getenv("CRM_ROUTER_SECONDARIES", "").split(",") if t.strip()]
+# Backend de los modelos de NLP: "torch" (PyTorch fp32) u "onnx" (ONNX Runtime int8, requiere optimum[onnxruntime])
+NLP_BACKEND = os.getenv("NLP_BACKEND", "torch").strip().lower()
+# Procesos que ejecutan la inferencia de NLP fuera del event loop (cada uno carga los modelos una vez)
+NLP_WORKERS = int(os.getenv("NLP_WORKERS", "1"))
+# Caché en disco de resultados de NLP (entidades/intención), p. ej. "nlp_cache.db"; vacío (por defecto) para usar solo la caché en memoria
+NLP_CACHE_PATH = os.getenv("NLP_CACHE_PATH", "")
+# Audio de la respuesta que se acumula antes de empezar a reproducirla (milisegundos)
+PLAYBACK_PREBUFFER_MS = float(os.getenv("PLAYBACK_PREBUFFER_MS", "120"))
@@ -0,0 +1,146 @@
+# batching.py
+#
+# Front end asíncrono con micro-batching sobre NLPProcessor. Los textos que llegan dentro de
+# una ventana de pocos milisegundos (o hasta `max_batch_size`) se agrupan en un solo lote que
+# pasa una vez por el modelo de NER y otra por el de intención, en lugar de dos pasadas por
+# texto. Cada llamador recibe solo el resultado de su texto.
+#
+#   batcher = MicroBatcher(NLPProcessor())
+#   result = await batcher.analyze(texto)   # {"entities": [...], "intent": [...]}
+#   batcher.stats()                         # lotes, tamaño medio, textos/s, latencias p50/p95
+
+import asyncio
+import logging
+import time
+from collections import deque
+from concurrent.futures import Executor
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from batch_utils import collect_batch, percentile
+from nlp.entity_intention_extraction import NLPProcessor
+
+logger = logging.getLogger("MicroBatcher")
+
+BATCH_MAX_SIZE = 16
+BATCH_MAX_WAIT = 0.005   # segundos que se espera a que lleguen más textos al lote
+LATENCY_SAMPLES = 1024
+
+def analyze_batch(processor: NLPProcessor, texts: List[str]) -> List[Dict[str, Any]]:
+    """Entidades e intención de cada texto, con una pasada por lote en cada modelo."""
+    entities = processor.extract_entities_batch(texts)
+    intents = processor.classify_intent_batch(texts)
+    return [{"entities": e, "intent": i} for e, i in zip(entities, intents)]
+
+class MicroBatcher:
+    """
+    Agrupa las peticiones concurrentes en lotes y ejecuta cada lote en `executor` (por
+    defecto, el del event loop) para no bloquear el audio. Con `pool` (un NLPProcessPool
+    de nlp/process_pool.py) los lotes se calculan en otros procesos. Mientras un lote está
+    en el modelo, las peticiones nuevas se acumulan y forman el siguiente.
+    """
+
+    def __init__(
+        self,
+        processor: Optional[NLPProcessor] = None,
+        max_batch_size: int = BATCH_MAX_SIZE,
+        max_wait: float = BATCH_MAX_WAIT,
+        executor: Optional[Executor] = None,
+        pool: Optional[Any] = None,
+    ):
+        self.pool = pool
+        self.processor = processor if processor is not None or pool is not None else NLPProcessor()
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.executor = executor
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping = False
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self.requests = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.max_batch_seen = 0
+        self.busy_seconds = 0.0
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._run(), name="nlp.MicroBatcher")
+
+    async def analyze(self, text: str) -> Dict[str, Any]:
+        """Entidades e intención de `text`: {"entities": [...], "intent": [...]}."""
+        self._ensure_started()
+        future = self._loop.create_future()
+        self._queue.put_nowait((text, future, time.perf_counter()))
+        return await future
+
+    async def extract_entities(self, text: str) -> list:
+        return (await self.analyze(text))["entities"]
+
+    async def classify_intent(self, text: str) -> list:
+        return (await self.analyze(text))["intent"]
+
+    async def _collect_batch(self) -> List[Tuple[str, asyncio.Future, float]]:
+        batch, stop = await collect_batch(self._queue, self.max_batch_size, self.max_wait)
+        if stop:
+            self._stopping = True
+        return batch
+
+    async def _analyze_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        if self.pool is not None:
+            return await self.pool.analyze_batch(texts)
+        return await self._loop.run_in_executor(self.executor, analyze_batch, self.processor, texts)
+
+    async def _run(self) -> None:
+        self._stopping = False
+        while not self._stopping or not self._queue.empty():
+            batch = await self._collect_batch()
+            if not batch:
+                continue
+            texts = [text for text, _, _ in batch]
+            start = time.perf_counter()
+            try:
+                results = await self._analyze_batch(texts)
+            except Exception as e:
+                self.failed_batches += 1
+                logger.error("Error al procesar un lote de %d textos: %s", len(batch), e)
+                results = [e] * len(batch)
+            finished = time.perf_counter()
+            self.busy_seconds += finished - start
+            self.batches += 1
+            self.requests += len(batch)
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+            for (_, future, enqueued), result in zip(batch, results):
+                self._latencies.append(finished - enqueued)
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def stats(self) -> Dict[str, float]:
+        """Contadores de throughput y latencia (cola + inferencia) de las peticiones recientes."""
+        ordered = sorted(self._latencies)
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "requests": self.requests,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "avg_batch_size": self.requests / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_seen,
+            "texts_per_second": self.requests / self.busy_seconds if self.busy_seconds else 0.0,
+            "p50_latency_ms": round(percentile(ordered, 0.50) * 1000, 3),
+            "p95_latency_ms": round(percentile(ordered, 0.95) * 1000, 3),
+        }
+
+    async def close(self) -> None:
+        """Detiene el front end después de procesar las peticiones pendientes."""
+        if self._task is None or self._task.done():
+            return
+        self._queue.put_nowait(None)
+        await self._task
+        self._task = None
@@ -1,50 +1,205 @@
 import re
 import json
+from typing import Optional, Tuple
+
+REQUIRED_LEAD_KEYS = ("name", "company", "email", "budget", "timeline")
+
+# Etiquetas (en inglés y en español) que introducen cada campo: "Name: ...", "Empresa: ..."
+FIELD_LABELS = {
+    "name": ("name", "nombre"),
+    "company": ("company", "empresa", "compañía", "compania"),
+    "budget": ("budget", "presupuesto"),
+    "timeline": ("timeline", "plazo", "cronograma"),
+}
+_LABEL_FIELDS = {label: field for field, labels in FIELD_LABELS.items() for label in labels}
+_ANY_LABEL = "|".join(sorted(map(re.escape, _LABEL_FIELDS), key=len, reverse=True))
+LABEL_WINDOW = 32   # caracteres antes de ":" donde se busca la etiqueta
+EMAIL_WINDOW = 64   # caracteres antes de "@" donde se busca la parte local del email
+
+# El texto se recorre una sola vez buscando separadores (":", "=", "@"), que es una búsqueda
+# de un solo carácter muy rápida; los patrones precompilados solo se aplican alrededor de
+# cada separador: la etiqueta justo antes de ":" y el valor justo después, o el email
+# alrededor de "@".
+_SEPARATOR = re.compile(r"[:=@]")
+_LABEL_BEFORE = re.compile(rf"\b({_ANY_LABEL})[ \t]*\Z", re.IGNORECASE)
+_VALUE = re.compile(r"[^\n;:=@]*")
+# Fin del valor dentro de la línea: coma o punto que no estén dentro de una cifra ("2,5",
+# "10.000") ni de una palabra ("S.A.")
+_VALUE_END = re.compile(r"[.,](?!\w)")
+_EMAIL_LOCAL = re.compile(r"[\w.+-]+\Z")
+_EMAIL_DOMAIN = re.compile(r"[\w-]+(?:\.[\w-]+)*\.\w+")
+_BUDGET_AMOUNT = re.compile(
+    r"(?:\b(?:usd|eur|mxn|gbp)[ \t]*)?[$€£]?[ \t]*\d(?:[\d.,]*\d)?(?:[ \t]*(?:k|mil|millones|millón|millon|m)\b)?"
+    r"(?:[ \t]*(?:usd|eur|mxn|dólares|dolares|euros|pesos)\b)?",
+    re.IGNORECASE,
+)
+# Etiquetas separadas del valor solo por espacios, como llegan en las transcripciones habladas
+# ("Name John Doe, Company Acme", "mi presupuesto es de 500"). Solo se buscan si la pasada de
+# separadores no encontró todos los campos etiquetados, y solo cuando la etiqueta abre la
+# cláusula (inicio del texto, tras puntuación o "y/and") o va seguida de un verbo copulativo
+# ("mi empresa es Acme"); así "hablar con alguien de la empresa sobre el plazo" no es un lead.
+_LABEL_SPACED = re.compile(
+    rf"\b({_ANY_LABEL})[ \t]+(?:(is|es|was|era)[ \t]+)?(?:(de|of)[ \t]+)?(?![ \t:=])",
+    re.IGNORECASE,
+)
+_CLAUSE_START = re.compile(r"(?:\A|[,.;!?¡¿\n]|\b(?:y|and))[ \t]*\Z", re.IGNORECASE)
+_NEXT_LABEL = re.compile(rf"\b(?:{_ANY_LABEL})\b", re.IGNORECASE)
+# Conjunciones y preposiciones que cierran un valor hablado ("Acme y tenemos...", "Ana para
+# el lunes"); "de/of" solo si no sigue una mayúscula ("Banco de España", "María de la Cruz").
+_SPOKEN_VALUE_END = re.compile(
+    r"[ \t]+(?:(?:y|e|and|o|or|pero|but|que|that|con|with|para|for|sobre|about|en|in|desde|from"
+    r"|hasta|until|por|by)\b|(?:de|del|of)[ \t]+(?!(?:las?[ \t]+|los[ \t]+)?[A-ZÁÉÍÓÚÑ]))",
+)
+# Palabras que enlazan con el campo siguiente ("Ana Ruiz y mi presupuesto...") y no son parte del valor
+_TRAILING_LINKS = re.compile(r"(?:[ \t]+(?:y|and|e|mi|my|su|our|nuestro|nuestra|el|la|the))+\Z", re.IGNORECASE)
+
+def _label_value(text: str, start: int) -> str:
+    """Valor que sigue a una etiqueta, desde `start` hasta el fin de línea, ";", "," o el siguiente campo."""
+    end = _VALUE.match(text, start).end()
+    value = text[start:end]
+    stop = text[end:end + 1]
+    if stop in (":", "="):
+        # Lo que precede al siguiente separador es la etiqueta del campo siguiente ("... Company:")
+        value = value.rstrip()
+        value = value[:max(value.rfind(" "), value.rfind("\t"), 0)]
+    elif stop == "@":
+        value = _EMAIL_LOCAL.sub("", value)
+    cut = _VALUE_END.search(value)
+    if cut:
+        value = value[:cut.start()]
+    return value.strip()
+
+def _set_labelled(lead_info: dict, field: str, value: str) -> None:
+    if field == "budget":
+        amount = _BUDGET_AMOUNT.search(value)
+        value = amount.group(0).strip() if amount else ""
+    if value:
+        lead_info[field] = value
 
 def extract_lead_info(text: str) -> dict:
     """
     Extrae información del lead de un string.
-    Primero intenta parsear el texto como JSON.
-    Si falla, utiliza expresiones regulares simples para extraer:
-      - name: se espera el formato "Name: <valor>"
-      - company: "Company: <valor>"
-      - email: se detecta un email
-      - budget: "Budget: <valor>" (ej. $500)
-      - timeline: "Timeline: <valor>"
+    Si el texto parece JSON (empieza por "{") intenta parsearlo primero. Si no, recorre el
+    texto una sola vez y reconoce (la etiqueta puede ir seguida de ":", "=" o, si abre la
+    cláusula o lleva "es/is", solo de espacios: "Name John Doe, Company Acme", "mi empresa es Acme"):
+      - name: "Name: <valor>" o "Nombre: <valor>"
+      - company: "Company: <valor>" o "Empresa: <valor>"
+      - email: se detecta un email en cualquier parte
+      - budget: "Budget: <valor>" o "Presupuesto: <valor>" (ej. $500, 5k, 10.000 euros)
+      - timeline: "Timeline: <valor>" o "Plazo: <valor>"
+    Si un campo aparece varias veces se queda el primero.
     """
-    try:
-        data = json.loads(text)
-        required_keys = ["name", "company", "email", "budget", "timeline"]
-        if all(key in data for key in required_keys):
-            return data
-    except Exception:
-        pass
+    if text.lstrip().startswith("{"):
+        try:
+            data = json.loads(text)
+            if isinstance(data, dict) and all(key in data for key in REQUIRED_LEAD_KEYS):
+                return data
+        except ValueError:
+            pass
 
     lead_info = {}
+    for match in _SEPARATOR.finditer(text):
+        pos = match.start()
+        if text[pos] == "@":
+            if "email" in lead_info:
+                continue
+            local = _EMAIL_LOCAL.search(text, max(0, pos - EMAIL_WINDOW), pos)
+            domain = _EMAIL_DOMAIN.match(text, pos + 1)
+            if local and domain:
+                lead_info["email"] = text[local.start():domain.end()]
+            continue
+        label = _LABEL_BEFORE.search(text, max(0, pos - LABEL_WINDOW), pos)
+        if not label:
+            continue
+        field = _LABEL_FIELDS[label.group(1).lower()]
+        if field in lead_info:
+            continue
+        _set_labelled(lead_info, field, _label_value(text, pos + 1))
 
-    # Extraer email
-    email_match = re.search(r'[\w\.-]+@[\w\.-]+\.\w+', text)
-    if email_match:
-        lead_info["email"] = email_match.group(0)
+    if len(lead_info.keys() & FIELD_LABELS.keys()) < len(FIELD_LABELS):
+        for label in _LABEL_SPACED.finditer(text):
+            field = _LABEL_FIELDS[label.group(1).lower()]
+            if field in lead_info:
+                continue
+            copula, preposition = label.group(2), label.group(3)
+            if not copula and (preposition or not _CLAUSE_START.search(text, max(0, label.start() - 8), label.start())):
+                continue
+            value = _label_value(text, label.end())
+            following = _NEXT_LABEL.search(value, 1)   # "Company Empresa XYZ": el valor empieza por una etiqueta
+            if following:
+                value = _TRAILING_LINKS.sub("", value[:following.start()].rstrip())
+            end = _SPOKEN_VALUE_END.search(value)
+            if end:
+                value = value[:end.start()]
+            _set_labelled(lead_info, field, value.strip())
+    return lead_info
 
-    # Extraer nombre (buscando un patrón tipo "Name: ...")
-    name_match = re.search(r'Name[:\s]+([\w\s]+)', text, re.IGNORECASE)
-    if name_match:
-        lead_info["name"] = name_match.group(1).strip()
+# Normalización de presupuestos dictados ("$10,000", "10k", "15 mil euros", "2,5 millones")
+CURRENCY_SYMBOLS = {"$": "USD", "€": "EUR", "£": "GBP"}
+CURRENCY_WORDS = {
+    "usd": "USD", "dolar": "USD", "dolares": "USD", "dólar": "USD", "dólares": "USD", "dollars": "USD",
+    "eur": "EUR", "euro": "EUR", "euros": "EUR",
+    "mxn": "MXN", "pesos": "MXN",
+    "gbp": "GBP", "libras": "GBP",
+}
+BUDGET_MULTIPLIERS = {
+    "k": 1_000, "mil": 1_000, "thousand": 1_000,
+    "m": 1_000_000, "mm": 1_000_000, "millon": 1_000_000, "millón": 1_000_000,
+    "millones": 1_000_000, "million": 1_000_000, "millions": 1_000_000,
+}
+_BUDGET_RE = re.compile(
+    r"(?:\b(?P<code>usd|eur|mxn|gbp)\s*)?(?P<symbol>[$€£])?\s*(?P<number>\d+(?:[.,\s]\d{3})*(?:[.,]\d+)?)\s*"
+    r"(?P<multiplier>k|mil|mm|m|millones|millón|millon|millions?|thousand)?\b\s*(?:de\s+)?"
+    r"(?P<word>[a-záéíóú]+)?",
+    re.IGNORECASE,
+)
 
-    # Extraer empresa
-    company_match = re.search(r'Company[:\s]+([\w\s]+)', text, re.IGNORECASE)
-    if company_match:
-        lead_info["company"] = company_match.group(1).strip()
+_YEAR = re.compile(r"(?:19|20)\d\d")
+_BUDGET_KEYWORD_BEFORE = re.compile(r"\b(?:presupuesto|budget)\W*(?:(?:es|is|de|of)\W+)*\Z", re.IGNORECASE)
 
-    # Extraer presupuesto
-    budget_match = re.search(r'Budget[:\s]+([$€]\d+)', text, re.IGNORECASE)
-    if budget_match:
-        lead_info["budget"] = budget_match.group(1).strip()
+def _parse_number(number: str) -> float:
+    """Interpreta separadores de miles/decimales: "10,000", "10.000", "1.234,5", "2,5"."""
+    number = number.replace(" ", "")
+    if "," in number and "." in number:
+        decimal = "," if number.rfind(",") > number.rfind(".") else "."
+        thousands = "." if decimal == "," else ","
+        return float(number.replace(thousands, "").replace(decimal, "."))
+    for sep in (",", "."):
+        if sep in number:
+            parts = number.split(sep)
+            if all(len(part) == 3 for part in parts[1:]):
+                return float("".join(parts))
+            return float(number.replace(sep, "."))
+    return float(number)
 
-    # Extraer timeline
-    timeline_match = re.search(r'Timeline[:\s]+([\w\s]+)', text, re.IGNORECASE)
-    if timeline_match:
-        lead_info["timeline"] = timeline_match.group(1).strip()
+def _budget_priority(text: str, match: re.Match) -> int:
+    """Prefiere la cifra con moneda o multiplicador, luego la que sigue a "presupuesto/budget" y deja
+    para el final los años sueltos ("presupuesto 2024 de 5000 euros" -> 5000)."""
+    if match.group("code") or match.group("symbol") or match.group("multiplier") or \
+            (match.group("word") or "").lower() in CURRENCY_WORDS:
+        return 2
+    if _YEAR.fullmatch(match.group("number")):
+        return -1
+    return 1 if _BUDGET_KEYWORD_BEFORE.search(text, max(0, match.start() - 24), match.start()) else 0
 
-    return lead_info
\ No newline at end of file
+def parse_budget(text: str) -> Tuple[Optional[float], Optional[str]]:
+    """
+    Convierte un presupuesto en texto libre a (valor numérico, moneda ISO).
+    Devuelve (None, None) si el texto no contiene ninguna cifra; la moneda es None
+    cuando no se menciona. Si hay varias cifras se usa la que lleva moneda, multiplicador
+    o sigue a "presupuesto/budget" antes que un año suelto.
+    """
+    if not text:
+        return None, None
+    match = max(_BUDGET_RE.finditer(text), key=lambda m: _budget_priority(text, m), default=None)
+    if not match:
+        return None, None
+    value = _parse_number(match.group("number"))
+    multiplier = match.group("multiplier")
+    if multiplier:
+        value *= BUDGET_MULTIPLIERS[multiplier.lower()]
+    currency = CURRENCY_SYMBOLS.get(match.group("symbol") or "") or CURRENCY_WORDS.get((match.group("code") or "").lower())
+    word = (match.group("word") or "").lower()
+    if word in CURRENCY_WORDS:
+        currency = CURRENCY_WORDS[word]
+    return value, currency
@@ -1,16 +1,37 @@
-from transformers import pipeline
+import copy
+from typing import Callable, List, Optional
+
+from nlp.intent_cascade import IntentCascade, default_cascade
+from nlp.model_registry import ModelRegistry, registry as default_registry
+from nlp.result_cache import MISSING, NLPResultCache, default_cache, exact_text, normalize_intent_text
 
 class NLPProcessor:
-    def __init__(self):
-        self.ner_pipeline = pipeline(
-            "ner",
-            model="dslim/bert-base-NER",
-            aggregation_strategy="simple"
-        )
-        self.intent_classifier = pipeline(
-            "text-classification",
-            model="Falconsai/intent_classification"
-        )
+    """
+    Extracción de entidades e intención con los pipelines de Hugging Face.
+    Los modelos vienen del registro compartido del proceso (nlp.model_registry): crear un
+    NLPProcessor no carga nada, y todas las instancias comparten la misma copia de cada modelo.
+    Los resultados pasan por `cache` (nlp.result_cache; None para desactivarla): un texto ya
+    analizado con el mismo modelo no vuelve a inferirse. La intención pasa antes por `cascade`
+    (nlp.intent_cascade; None para desactivarla), que resuelve los comandos claros sin BERT.
+    """
+
+    def __init__(
+        self,
+        registry: Optional[ModelRegistry] = None,
+        cache: Optional[NLPResultCache] = default_cache,
+        cascade: Optional[IntentCascade] = default_cascade,
+    ):
+        self.registry = registry or default_registry
+        self.cache = cache
+        self.cascade = cascade
+
+    @property
+    def ner_pipeline(self):
+        return self.registry.get("ner")
+
+    @property
+    def intent_classifier(self):
+        return self.registry.get("intent")
 
     def extract_entities(self, text: str):
         """
@@ -22,8 +43,7 @@ class NLPProcessor:
         Returns:
             List[dict]: Lista de entidades con su etiqueta, puntuación y posiciones.
         """
-        entities = self.ner_pipeline(text)
-        return entities
+        return self._cached("ner", exact_text, [text], lambda texts: [self.ner_pipeline(texts[0])])[0]
 
     def classify_intent(self, text: str):
         """
@@ -33,10 +53,75 @@ class NLPProcessor:
             text (str): Texto a procesar.
 
         Returns:
-            List[dict]: Resultado de la clasificación de intenciones (etiqueta y puntuación).
+            List[dict]: Resultado de la clasificación de intenciones (etiqueta, puntuación y
+            "source": "rules"/"linear" con las etiquetas de intent_cascade.COMMAND_LABELS, o
+            "model" con las etiquetas del clasificador BERT).
+        """
+        return self._classify([text], lambda misses: [self.intent_classifier(misses[0])])[0]
+
+    def extract_entities_batch(self, texts: List[str]) -> List[list]:
+        """
+        Igual que extract_entities para varios textos en una sola pasada del modelo
+        (el pipeline rellena los textos hasta la misma longitud y los procesa juntos).
+
+        Returns:
+            List[List[dict]]: Las entidades de cada texto, en el mismo orden.
+        """
+        if not texts:
+            return []
+        return self._cached("ner", exact_text, texts, lambda misses: self.ner_pipeline(misses, batch_size=len(misses)))
+
+    def classify_intent_batch(self, texts: List[str]) -> List[list]:
+        """
+        Igual que classify_intent para varios textos en una sola pasada del modelo.
+
+        Returns:
+            List[List[dict]]: El resultado de classify_intent de cada texto, en el mismo orden.
+        """
+        if not texts:
+            return []
+
+        def classify(misses: List[str]) -> List[list]:
+            results = self.intent_classifier(misses, batch_size=len(misses))
+            return [result if isinstance(result, list) else [result] for result in results]
+
+        return self._classify(texts, classify)
+
+    def _classify(self, texts: List[str], infer: Callable[[List[str]], List[list]]) -> List[list]:
+        """Intención de `texts`: primero la cascada barata; solo lo que no resuelve va al modelo."""
+        results = [self.cascade.predict(text) if self.cascade is not None else None for text in texts]
+        pending = [text for text, result in zip(texts, results) if result is None]
+        if not pending:
+            return results
+        classified = iter(self._cached("intent", normalize_intent_text, pending, infer))
+        return [
+            [{**row, "source": "model"} for row in next(classified)] if result is None else result
+            for result in results
+        ]
+
+    def _cached(self, name: str, normalize: Callable[[str], str], texts: List[str],
+                infer: Callable[[List[str]], List[list]]) -> List[list]:
+        """
+        Resultados de `texts` para el modelo `name`. Los textos cuya forma normalizada ya está
+        en la caché no se infieren; el resto se calculan con `infer` en una sola llamada (una
+        vez por forma normalizada, con el primer texto original que la tiene). Cada texto
+        recibe su propia copia del resultado.
         """
-        intent = self.intent_classifier(text)
-        return intent
+        if self.cache is None:
+            return list(infer(list(texts)))
+        version = self.registry.model_version(name)
+        keys = [normalize(text) for text in texts]
+        results = [self.cache.get(name, version, key) for key in keys]
+        misses: dict = {}
+        for key, text, result in zip(keys, texts, results):
+            if result is MISSING:
+                misses.setdefault(key, text)
+        if misses:
+            computed = dict(zip(misses, infer(list(misses.values()))))
+            for key, value in computed.items():
+                self.cache.put(name, version, key, value)
+            results = [copy.deepcopy(computed[key]) if result is MISSING else result for key, result in zip(keys, results)]
+        return results
 
 if __name__ == "__main__":
     processor = NLPProcessor()
@@ -0,0 +1,239 @@
+# intent_cascade.py
+#
+# Clasificación de intención en cascada, de lo más barato a lo más caro:
+#
+#   1. Reglas: expresiones regulares precompiladas para los comandos del asistente
+#      ("agrega un lead", "actualiza...", "elimina...", "lista todos..."), en español e inglés.
+#      Exigen el verbo en imperativo al principio de una cláusula y, a pocas palabras, un
+#      lead/contacto (o un campo, para actualizar). Las preguntas solo pasan por el modelo
+#      lineal y las frases con negación no pasan por ninguna de las capas baratas.
+#   2. Modelo lineal sobre n-gramas con hashing (palabras, bigramas y trigramas de caracteres),
+#      entrenado al primer uso con los ejemplos de SEED_EXAMPLES; responde si su probabilidad
+#      supera `linear_threshold`.
+#   3. Si ninguno está seguro, NLPProcessor usa el clasificador BERT como hasta ahora.
+#
+# Las dos primeras capas tardan microsegundos; solo las frases ambiguas llegan al transformer.
+# Sus etiquetas son las de COMMAND_LABELS, distintas de las del clasificador BERT: cada
+# resultado lleva "source" ("rules", "linear" o "model") para saber de qué conjunto viene.
+#
+#   cascade = IntentCascade(linear_threshold=0.85)
+#   cascade.predict("Elimina el lead de Ana")   # [{"label": "delete_lead", "score": 0.9, "source": "rules"}]
+#   cascade.predict("¿Qué opinas del clima?")   # None -> BERT
+#   cascade.stats()                             # aciertos y tiempo por capa
+
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from nlp.result_cache import normalize_intent_text
+
+RULE_SCORE = 0.9       # las reglas exigen verbo + objeto cercano, pero no ven el contexto
+LINEAR_THRESHOLD = 0.85
+MAX_RULE_WORDS = 24      # en frases más largas los comandos suelen mezclarse con otros datos
+HASH_DIMENSIONS = 1 << 12
+OTHER = "other"          # clase "ninguno de los comandos": siempre cae al siguiente nivel
+
+def _fold(text: str) -> str:
+    """Minúsculas, sin tildes y sin puntuación de los extremos ("¡Muéstrame!" -> "muestrame")."""
+    text = unicodedata.normalize("NFKD", normalize_intent_text(text))
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+_LEAD = r"(leads?|contactos?|clientes?|prospectos?)"
+_FIELD = rf"({_LEAD}|nombre|empresa|compania|necesidades|presupuesto|correo|email|telefono|name|company|needs|budget|phone)"
+# El verbo va en imperativo al principio de una cláusula: "quiero saber si pueden eliminar
+# contactos" o "cuesta agregar un contacto" no son órdenes
+_CLAUSE = r"(?:^|[,.;:!]\s*|\b(?:y|and|then|luego|ahora|now|tambien|also|please|por favor|porfa)\s+)"
+_NEAR = r"(?:\W+\w+){0,4}?\W+"          # el objeto tiene que estar a pocas palabras del verbo
+_NOT_SELF = r"(?!\W+(?:me|us|nos)\b)"    # "remove me from...", "add us to..." no son comandos sobre leads
+# Tras el lead solo puede venir el fin de la cláusula, un complemento ("de Ana", "from Globex")
+# o una sola palabra (un nombre); "show me the leads pricing plan" habla de otra cosa
+_OBJECT_END = (
+    r"(?=\s*$|\s*[,.;:!]|\s+(?:de|del|of|from|named|llamad[oa]|que|that|who|con|with|en|in|a|al|to"
+    r"|para|for|y|and|por|by)\b|\s+\w+\s*(?:$|[,.;:!]))"
+)
+# Con una negación la frase no es un comando claro ("please don't delete anything"): va a BERT
+_NEGATION = re.compile(r"\b(no|not|never|nunca|jamas|ni|don'?t|doesn'?t)\b")
+# Las preguntas ("¿cuánto cuesta agregar...?", "can you delete...") no pasan por las reglas
+_QUESTION = re.compile(
+    r"[?¿]|^(?:cuanto|cuanta|cuantos|cuantas|que|como|cual|cuales|donde|cuando|por que|puedo|puedes|pueden"
+    r"|podria|podrias|se puede|how|what|which|who|why|when|where|can|could|would|do|does|is|are)\b"
+)
+INTENT_RULES: Dict[str, re.Pattern] = {
+    "add_lead": re.compile(
+        rf"{_CLAUSE}(agrega|anade|registra|crea|guarda|add|create|register|save)\b{_NOT_SELF}{_NEAR}{_LEAD}\b{_OBJECT_END}"
+        rf"|{_CLAUSE}(nuevo|new)\s+{_LEAD}\b{_OBJECT_END}"
+    ),
+    "update_lead": re.compile(
+        rf"{_CLAUSE}(actualiza|modifica|cambia|corrige|update|change|edit)\b{_NEAR}{_FIELD}\b"
+    ),
+    "delete_lead": re.compile(
+        rf"{_CLAUSE}(elimina|borra|quita|delete|remove)\b{_NOT_SELF}{_NEAR}{_LEAD}\b{_OBJECT_END}"
+    ),
+    "list_leads": re.compile(rf"{_CLAUSE}(lista|muestra|muestrame|ensename|list|show)\b{_NEAR}{_LEAD}\b{_OBJECT_END}"),
+}
+# Etiquetas que pueden devolver las capas baratas; el resto de etiquetas de classify_intent son
+# las del clasificador BERT (su config.id2label). El campo "source" de cada resultado indica
+# qué capa respondió: "rules", "linear" o "model".
+COMMAND_LABELS = tuple(INTENT_RULES)
+
+# Ejemplos con los que se entrena el modelo lineal (la clase OTHER cubre lo que no es un comando)
+SEED_EXAMPLES: Sequence[Tuple[str, str]] = (
+    ("agrega un lead", "add_lead"), ("agrega un nuevo lead", "add_lead"), ("registra a este cliente", "add_lead"),
+    ("quiero dar de alta un contacto", "add_lead"), ("guarda este prospecto", "add_lead"), ("añade a Juan como lead", "add_lead"),
+    ("add a new lead", "add_lead"), ("please add this contact", "add_lead"), ("da de alta a la empresa", "add_lead"),
+    ("actualiza el lead", "update_lead"), ("cambia el presupuesto", "update_lead"), ("modifica la empresa de Ana", "update_lead"),
+    ("corrige el nombre", "update_lead"), ("el presupuesto ahora es otro", "update_lead"), ("update the budget", "update_lead"),
+    ("change the company name", "update_lead"), ("pon el presupuesto en 5000", "update_lead"),
+    ("elimina el lead", "delete_lead"), ("borra a Carlos", "delete_lead"), ("quita ese contacto", "delete_lead"),
+    ("da de baja al cliente", "delete_lead"), ("delete the lead", "delete_lead"), ("remove this contact", "delete_lead"),
+    ("ya no lo necesito, sácalo de la lista", "delete_lead"),
+    ("lista todos los leads", "list_leads"), ("muéstrame los leads", "list_leads"), ("qué leads tenemos", "list_leads"),
+    ("cuántos contactos hay", "list_leads"), ("enséñame todos los clientes", "list_leads"), ("list all leads", "list_leads"),
+    ("show me the contacts", "list_leads"), ("dame la lista de prospectos", "list_leads"),
+    ("hola", OTHER), ("buenos días", OTHER), ("mi nombre es Juan Pérez", OTHER), ("trabajo en Empresa XYZ", OTHER),
+    ("necesito un presupuesto para un CRM", OTHER), ("cuánto cuesta el plan empresarial", OTHER),
+    ("quiero comprar el paquete premium", OTHER), ("sí", OTHER), ("no, gracias", OTHER), ("gracias, adiós", OTHER),
+    ("hi, this is John from Globex", OTHER), ("tell me about your pricing", OTHER), ("what can you do", OTHER),
+    ("I want to buy a license", OTHER), ("mi presupuesto es de 10000 dólares", OTHER), ("estoy interesado en sus servicios", OTHER),
+    ("show me your pricing plans", OTHER), ("muéstrame los precios", OTHER), ("remove me from your mailing list", OTHER),
+    ("please don't delete anything", OTHER), ("no borres nada", OTHER), ("can you show me a demo", OTHER),
+    # órdenes de una o dos palabras, sin objeto: las reglas no las cubren
+    ("lista todos", "list_leads"), ("muéstralos todos", "list_leads"), ("list all", "list_leads"),
+    ("actualiza", "update_lead"), ("actualízalo", "update_lead"), ("update it", "update_lead"),
+    ("elimina", "delete_lead"), ("elimínalo", "delete_lead"), ("bórralo", "delete_lead"), ("delete it", "delete_lead"),
+    # preguntas y menciones de pasada que nombran un comando sin pedirlo
+    ("cuánto cuesta añadir más usuarios", OTHER), ("cuánto vale el plan con más contactos", OTHER),
+    ("quisiera saber si se pueden importar clientes", OTHER), ("pueden borrar datos duplicados", OTHER),
+    ("how much does it cost to add more contacts", OTHER), ("the leads pricing page", OTHER),
+    ("show me the pricing for your CRM plan", OTHER),
+)
+
+def hashed_features(text: str, dimensions: int = HASH_DIMENSIONS) -> np.ndarray:
+    """Vector L2-normalizado de n-gramas (palabras, bigramas, trigramas de caracteres) con hashing."""
+    words = re.findall(r"\w+", _fold(text))
+    grams = [f"w:{w}" for w in words] + [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f"<{word}>"
+        grams.extend(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for gram in grams:
+        vector[zlib.crc32(gram.encode("utf-8")) % dimensions] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+class HashedLinearModel:
+    """Regresión logística multiclase sobre hashed_features, entrenada por descenso de gradiente."""
+
+    def __init__(self, examples: Sequence[Tuple[str, str]] = SEED_EXAMPLES, dimensions: int = HASH_DIMENSIONS,
+                 epochs: int = 300, learning_rate: float = 2.0, l2: float = 1e-4):
+        self.dimensions = dimensions
+        self.labels = sorted({label for _, label in examples})
+        index = {label: i for i, label in enumerate(self.labels)}
+        x = np.stack([hashed_features(text, dimensions) for text, _ in examples])
+        y = np.zeros((len(examples), len(self.labels)), dtype=np.float32)
+        y[np.arange(len(examples)), [index[label] for _, label in examples]] = 1.0
+        self.weights = np.zeros((dimensions, len(self.labels)), dtype=np.float32)
+        self.bias = np.zeros(len(self.labels), dtype=np.float32)
+        for _ in range(epochs):
+            probs = self._softmax(x @ self.weights + self.bias)
+            grad = (probs - y) / len(examples)
+            self.weights -= learning_rate * (x.T @ grad + l2 * self.weights)
+            self.bias -= learning_rate * grad.sum(axis=0)
+
+    @staticmethod
+    def _softmax(logits: np.ndarray) -> np.ndarray:
+        exp = np.exp(logits - logits.max(axis=-1, keepdims=True))
+        return exp / exp.sum(axis=-1, keepdims=True)
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """Etiqueta más probable y su probabilidad."""
+        probs = self._softmax(hashed_features(text, self.dimensions) @ self.weights + self.bias)
+        best = int(probs.argmax())
+        return self.labels[best], float(probs[best])
+
+class IntentCascade:
+    """
+    Capas baratas delante del clasificador BERT. `predict` devuelve el resultado con el
+    formato de NLPProcessor.classify_intent, o None si el texto debe ir al transformer.
+    El modelo lineal se entrena una sola vez, al primer uso, aunque lo pidan varios hilos.
+    """
+
+    def __init__(
+        self,
+        linear_threshold: float = LINEAR_THRESHOLD,
+        rules: Optional[Dict[str, re.Pattern]] = None,
+        examples: Sequence[Tuple[str, str]] = SEED_EXAMPLES,
+        max_rule_words: int = MAX_RULE_WORDS,
+    ):
+        self.linear_threshold = linear_threshold
+        self.rules = INTENT_RULES if rules is None else rules
+        self.examples = examples
+        self.max_rule_words = max_rule_words
+        self._model: Optional[HashedLinearModel] = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.hits = {"rules": 0, "linear": 0, "model": 0}
+        self.seconds = {"rules": 0.0, "linear": 0.0}
+
+    @property
+    def model(self) -> HashedLinearModel:
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = HashedLinearModel(self.examples)
+        return self._model
+
+    def match_rules(self, text: str) -> Optional[str]:
+        """Etiqueta si exactamente una regla coincide con una frase corta; None en otro caso."""
+        folded = _fold(text)
+        if not folded or len(folded.split()) > self.max_rule_words or _NEGATION.search(folded):
+            return None
+        if _QUESTION.search(text) or _QUESTION.search(folded):
+            return None
+        matches = [label for label, pattern in self.rules.items() if pattern.search(folded)]
+        return matches[0] if len(matches) == 1 else None
+
+    def predict(self, text: str) -> Optional[List[dict]]:
+        start = time.perf_counter()
+        label = self.match_rules(text)
+        rules_done = time.perf_counter()
+        if label is not None:
+            self._record("rules", rules_done - start)
+            return [{"label": label, "score": RULE_SCORE, "source": "rules"}]
+
+        result = None
+        if not _NEGATION.search(_fold(text)):
+            label, score = self.model.predict(text)
+            if label != OTHER and score >= self.linear_threshold:
+                result = [{"label": label, "score": round(score, 4), "source": "linear"}]
+        self._record("linear" if result else "model", rules_done - start, time.perf_counter() - rules_done)
+        return result
+
+    def _record(self, tier: str, rules_seconds: float, linear_seconds: float = 0.0) -> None:
+        # predict se llama desde varios hilos (executor del MicroBatcher, workers)
+        with self._stats_lock:
+            self.hits[tier] += 1
+            self.seconds["rules"] += rules_seconds
+            self.seconds["linear"] += linear_seconds
+
+    def stats(self) -> Dict[str, float]:
+        with self._stats_lock:
+            hits, seconds = dict(self.hits), dict(self.seconds)
+        total = sum(hits.values())
+        cheap = hits["rules"] + hits["linear"]
+        return {
+            "rules_hits": hits["rules"],
+            "linear_hits": hits["linear"],
+            "model_fallbacks": hits["model"],
+            "cheap_rate": cheap / total if total else 0.0,
+            "rules_avg_us": round(seconds["rules"] / total * 1e6, 2) if total else 0.0,
+            "linear_avg_us": round(seconds["linear"] / (total - hits["rules"]) * 1e6, 2)
+            if total - hits["rules"] else 0.0,
+        }
+
+default_cascade = IntentCascade()
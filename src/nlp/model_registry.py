@@ -0,0 +1,136 @@
+# model_registry.py
+#
+# Registro de modelos compartido por todo el proceso. Los pipelines de Hugging Face de
+# NLPProcessor (NER e intención) se cargan una sola vez, bajo demanda o en un calentamiento
+# en segundo plano al arrancar, y cada carga ejecuta una inferencia de prueba para que el
+# primer turno del usuario no pague la inicialización.
+#
+#   registry.start_warmup()          # al arrancar: carga y calienta en un hilo aparte
+#   registry.get("ner")(texto)       # espera a la carga si aún no terminó
+#   registry.stats()                 # tiempos de carga/calentamiento y memoria residente
+
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger("ModelRegistry")
+
+NER_MODEL = "dslim/bert-base-NER"
+INTENT_MODEL = "Falconsai/intent_classification"
+
+# Nombre en el registro -> argumentos de transformers.pipeline
+MODEL_SPECS: Dict[str, Dict[str, Any]] = {
+    "ner": {"task": "ner", "model": NER_MODEL, "aggregation_strategy": "simple"},
+    "intent": {"task": "text-classification", "model": INTENT_MODEL},
+}
+WARMUP_TEXT = "Mi nombre es Juan Pérez, trabajo en Empresa XYZ y necesito un presupuesto de 10000."
+
+def load_pipeline(task: str, **kwargs: Any) -> Any:
+    """Carga un pipeline de transformers (se importa aquí para no pagar el import al arrancar)."""
+    from transformers import pipeline
+
+    return pipeline(task, **kwargs)
+
+def resident_memory_bytes() -> int:
+    """Memoria residente actual del proceso (en Linux); en otros sistemas, el pico (ru_maxrss) o 0."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        if resource is None:
+            return 0
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+class ModelRegistry:
+    """
+    Carga perezosa y thread-safe de pipelines por nombre. Cada modelo se carga una sola vez
+    por proceso aunque lo pidan varios hilos a la vez; los demás esperan a esa carga.
+    """
+
+    def __init__(
+        self,
+        specs: Optional[Dict[str, Dict[str, Any]]] = None,
+        loader: Callable[..., Any] = load_pipeline,
+        warmup_text: str = WARMUP_TEXT,
+        backend: str = "torch",
+    ):
+        self.specs = dict(MODEL_SPECS if specs is None else specs)
+        self.loader = loader
+        self.backend = backend
+        self.warmup_text = warmup_text
+        self._models: Dict[str, Any] = {}
+        self._locks = {name: threading.Lock() for name in self.specs}
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._warmup_thread: Optional[threading.Thread] = None
+
+    def get(self, name: str) -> Any:
+        """Devuelve el pipeline `name`, cargándolo y calentándolo la primera vez."""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        if name not in self.specs:
+            raise KeyError(f"Modelo desconocido: {name!r}. Modelos registrados: {', '.join(self.specs)}")
+        with self._locks[name]:
+            if name not in self._models:
+                self._models[name] = self._load(name)
+            return self._models[name]
+
+    def _load(self, name: str) -> Any:
+        spec = dict(self.specs[name])
+        task = spec.pop("task")
+        memory_before = resident_memory_bytes()
+        start = time.perf_counter()
+        model = self.loader(task, **spec)
+        loaded = time.perf_counter()
+        model(self.warmup_text)  # reserva buffers y compila los kernels antes del primer turno
+        warmed = time.perf_counter()
+        self._stats[name] = {
+            "load_seconds": round(loaded - start, 3),
+            "warmup_seconds": round(warmed - loaded, 3),
+            "memory_delta_bytes": resident_memory_bytes() - memory_before,
+        }
+        logger.info("Modelo '%s' cargado: %s", name, self._stats[name])
+        return model
+
+    def model_version(self, name: str) -> str:
+        """Identifica el modelo `name` y su backend (p. ej. "torch:dslim/bert-base-NER@main") para cachés."""
+        spec = self.specs[name]
+        return f"{self.backend}:{spec['model']}@{spec.get('revision', 'main')}"
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._models
+
+    def warm_up(self, names: Optional[Iterable[str]] = None) -> None:
+        """Carga y calienta los modelos indicados (todos por defecto) en el hilo actual."""
+        for name in names or self.specs:
+            try:
+                self.get(name)
+            except Exception as e:
+                logger.error("Error al cargar el modelo '%s': %s", name, e)
+
+    def start_warmup(self, names: Optional[Iterable[str]] = None) -> threading.Thread:
+        """Lanza warm_up en un hilo en segundo plano (idempotente) y lo devuelve."""
+        if self._warmup_thread is None:
+            self._warmup_thread = threading.Thread(
+                target=self.warm_up, args=(list(names) if names else None,), name="ModelWarmup", daemon=True
+            )
+            self._warmup_thread.start()
+        return self._warmup_thread
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "loaded": sorted(self._models),
+            "models": {name: dict(stats) for name, stats in self._stats.items()},
+            "resident_memory_bytes": resident_memory_bytes(),
+        }
+
+registry = ModelRegistry()
@@ -0,0 +1,124 @@
+# onnx_backend.py
+#
+# Backend opcional de NLPProcessor para nodos solo CPU: exporta los modelos de NER e intención
+# a ONNX, los cuantiza a int8 (cuantización dinámica, sin datos de calibración) y los sirve
+# con ONNX Runtime detrás del mismo pipeline de transformers, así que extract_entities y
+# classify_intent devuelven exactamente el mismo formato que con PyTorch.
+#
+# Requiere `pip install optimum[onnxruntime]`. La exportación se hace una sola vez por modelo
+# y se guarda en ONNX_MODEL_DIR; los arranques siguientes cargan el .onnx cuantizado.
+#
+#   registry = onnx_registry()                    # ModelRegistry con el loader de ONNX
+#   processor = NLPProcessor(registry)
+#
+#   python -m nlp.onnx_backend                    # exporta y cuantiza los dos modelos por adelantado
+
+import logging
+import sys
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+from nlp.model_registry import MODEL_SPECS, ModelRegistry
+
+logger = logging.getLogger("ONNXBackend")
+
+ONNX_MODEL_DIR = Path("models") / "onnx"
+QUANTIZED_FILE = "model_quantized.onnx"
+# Juego de instrucciones para el que se optimiza la cuantización: "avx2" funciona en
+# cualquier x86-64 actual; "avx512_vnni" es más rápido donde está disponible; "arm64" para ARM.
+QUANTIZATION_ARCH = "avx2"
+
+# Tarea del pipeline -> clase de optimum.onnxruntime que carga el modelo exportado
+ORT_MODEL_CLASSES = {
+    "ner": "ORTModelForTokenClassification",
+    "token-classification": "ORTModelForTokenClassification",
+    "text-classification": "ORTModelForSequenceClassification",
+}
+
+def _ort_model_class(task: str) -> Any:
+    try:
+        import optimum.onnxruntime as ort
+    except ImportError as e:
+        raise ImportError("El backend ONNX requiere 'optimum[onnxruntime]' (pip install optimum[onnxruntime]).") from e
+    if task not in ORT_MODEL_CLASSES:
+        raise ValueError(f"Tarea no soportada por el backend ONNX: {task!r}")
+    return getattr(ort, ORT_MODEL_CLASSES[task])
+
+def quantized_model_dir(model: str, model_dir: Union[str, Path] = ONNX_MODEL_DIR) -> Path:
+    """Carpeta donde se guarda el modelo cuantizado ("dslim/bert-base-NER" -> dslim--bert-base-NER)."""
+    return Path(model_dir) / model.replace("/", "--")
+
+def export_quantized(
+    task: str,
+    model: str,
+    model_dir: Union[str, Path] = ONNX_MODEL_DIR,
+    arch: str = QUANTIZATION_ARCH,
+    force: bool = False,
+) -> Path:
+    """
+    Exporta `model` a ONNX y lo cuantiza a int8 (pesos int8, activaciones cuantizadas en
+    tiempo de ejecución). Si ya existe la versión cuantizada y no se pide `force`, no hace nada.
+
+    Returns:
+        Path: Carpeta con el modelo cuantizado y su tokenizer.
+    """
+    from optimum.onnxruntime import ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    target = quantized_model_dir(model, model_dir)
+    if (target / QUANTIZED_FILE).exists() and not force:
+        return target
+
+    model_class = _ort_model_class(task)
+    export_dir = target / "fp32"
+    logger.info("Exportando '%s' a ONNX en %s...", model, export_dir)
+    ort_model = model_class.from_pretrained(model, export=True)
+    ort_model.save_pretrained(export_dir)
+    tokenizer = AutoTokenizer.from_pretrained(model)
+
+    quantization_config = getattr(AutoQuantizationConfig, arch)(is_static=False, per_channel=False)
+    quantizer = ORTQuantizer.from_pretrained(export_dir)
+    quantizer.quantize(save_dir=target, quantization_config=quantization_config)
+    tokenizer.save_pretrained(target)
+    logger.info("Modelo '%s' cuantizado a int8 (%s) en %s", model, arch, target)
+    return target
+
+def load_onnx_pipeline(
+    task: str,
+    model: str,
+    model_dir: Union[str, Path] = ONNX_MODEL_DIR,
+    arch: str = QUANTIZATION_ARCH,
+    **kwargs: Any,
+) -> Any:
+    """
+    Loader para ModelRegistry: mismo contrato que model_registry.load_pipeline, pero con el
+    modelo cuantizado sobre ONNX Runtime (se exporta la primera vez si no existe).
+    """
+    from transformers import AutoTokenizer, pipeline
+
+    target = export_quantized(task, model, model_dir, arch)
+    ort_model = _ort_model_class(task).from_pretrained(target, file_name=QUANTIZED_FILE)
+    tokenizer = AutoTokenizer.from_pretrained(target)
+    return pipeline(task, model=ort_model, tokenizer=tokenizer, **kwargs)
+
+def onnx_registry(
+    model_dir: Union[str, Path] = ONNX_MODEL_DIR,
+    arch: str = QUANTIZATION_ARCH,
+    specs: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> ModelRegistry:
+    """ModelRegistry que sirve los modelos de MODEL_SPECS cuantizados con ONNX Runtime."""
+
+    def loader(task: str, **kwargs: Any) -> Any:
+        return load_onnx_pipeline(task, model_dir=model_dir, arch=arch, **kwargs)
+
+    return ModelRegistry(specs=specs, loader=loader, backend=f"onnx-int8-{arch}")
+
+def main() -> int:
+    logging.basicConfig(level=logging.INFO)
+    for spec in MODEL_SPECS.values():
+        export_quantized(spec["task"], spec["model"])
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
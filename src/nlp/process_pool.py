@@ -0,0 +1,117 @@
+# process_pool.py
+#
+# Inferencia de NLP fuera del proceso del asistente. Cada proceso del pool carga y calienta
+# los modelos una sola vez al arrancar (initializer) y después atiende lotes de textos; el
+# event loop del asistente solo espera un future, así que ni la inferencia ni el GIL de
+# PyTorch se interponen en el streaming de audio.
+#
+#   pool = NLPProcessPool(workers=1, backend="torch")
+#   pool.start()                                   # arranca y calienta los procesos
+#   batcher = MicroBatcher(pool=pool)              # lotes -> pool
+#   task = asyncio.create_task(batcher.analyze(texto))
+#   pool.close()
+
+import asyncio
+import functools
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
+
+from nlp.batching import analyze_batch
+from nlp.entity_intention_extraction import NLPProcessor
+from nlp.model_registry import ModelRegistry, registry as default_registry
+from nlp.result_cache import NLPResultCache, default_cache
+
+logger = logging.getLogger("NLPProcessPool")
+
+NLP_WORKERS = 1
+
+# NLPProcessor del proceso worker (uno por proceso, creado por _init_worker)
+_worker_processor: Optional[NLPProcessor] = None
+
+def registry_for_backend(backend: str = "torch") -> ModelRegistry:
+    """Registro de modelos de un backend: "torch" (el registro compartido) u "onnx" (int8)."""
+    if backend == "onnx":
+        from nlp.onnx_backend import onnx_registry
+
+        return onnx_registry()
+    return default_registry
+
+def _init_worker(registry_factory: Callable[[], ModelRegistry], cache_path: Optional[str]) -> None:
+    global _worker_processor
+    registry = registry_factory()
+    registry.warm_up()
+    cache = NLPResultCache(path=cache_path) if cache_path else default_cache
+    _worker_processor = NLPProcessor(registry, cache=cache)
+
+def _ping() -> bool:
+    return _worker_processor is not None
+
+def _analyze_in_worker(texts: List[str]) -> List[Dict[str, Any]]:
+    return analyze_batch(_worker_processor, texts)
+
+class NLPProcessPool:
+    """
+    Pool de procesos con los modelos de NLP residentes. `registry_factory` debe poder
+    serializarse con pickle (función de módulo o functools.partial), porque se ejecuta
+    dentro de cada proceso; por defecto construye el registro de `backend`. Con `cache_path`
+    los workers comparten la caché de resultados en disco (nlp.result_cache).
+    """
+
+    def __init__(
+        self,
+        workers: int = NLP_WORKERS,
+        backend: str = "torch",
+        registry_factory: Optional[Callable[[], ModelRegistry]] = None,
+        cache_path: Optional[str] = None,
+    ):
+        self.workers = workers
+        self.registry_factory = registry_factory or functools.partial(registry_for_backend, backend)
+        self.cache_path = cache_path
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.batches = 0
+        self.texts = 0
+        self.busy_seconds = 0.0
+
+    def _ensure_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # "spawn": los workers no heredan hilos ni el estado de PyTorch del proceso padre
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.registry_factory, self.cache_path),
+            )
+        return self._executor
+
+    def start(self, wait_ready: bool = False) -> None:
+        """Arranca los procesos (cada uno carga y calienta los modelos en segundo plano)."""
+        executor = self._ensure_executor()
+        pings = [executor.submit(_ping) for _ in range(self.workers)]
+        if wait_ready:
+            wait(pings)
+
+    async def analyze_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """Entidades e intención de cada texto, calculadas en un proceso del pool."""
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        results = await loop.run_in_executor(self._ensure_executor(), _analyze_in_worker, list(texts))
+        self.busy_seconds += time.perf_counter() - start
+        self.batches += 1
+        self.texts += len(texts)
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "batches": self.batches,
+            "texts": self.texts,
+            "busy_seconds": round(self.busy_seconds, 3),
+        }
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,164 @@
+# result_cache.py
+#
+# Caché de resultados de NLPProcessor (entidades e intención). Las frases que se repiten
+# ("sí", "lista todos los leads", reintentos tras un error de STT) no vuelven a pasar por
+# los modelos. La clave es (tipo, versión del modelo, texto), así que cambiar de modelo o
+# de backend no devuelve resultados de otro. La intención se cachea por texto normalizado;
+# el NER por el texto exacto, porque sus entidades llevan posiciones (start/end) en ese texto.
+# Los resultados se devuelven como copias: modificarlos no altera la caché.
+#
+# Dos niveles: un LRU en memoria y, opcionalmente, una tabla SQLite en disco que sobrevive
+# a reinicios y que comparten los procesos de nlp/process_pool.py.
+#
+#   cache = NLPResultCache(path="nlp_cache.db")
+#   NLPProcessor(cache=cache).classify_intent("Sí.")   # inferencia
+#   NLPProcessor(cache=cache).classify_intent("sí")    # acierto en caché
+#   cache.stats()                                      # aciertos por nivel y tasa de aciertos
+
+import copy
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger("NLPResultCache")
+
+MISSING = object()
+
+NLP_CACHE_ENTRIES = 4096
+
+CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS nlp_results (
+    kind TEXT NOT NULL,
+    version TEXT NOT NULL,
+    text TEXT NOT NULL,
+    result TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (kind, version, text)
+) WITHOUT ROWID
+"""
+
+_SPACES = re.compile(r"\s+")
+_EDGE_PUNCTUATION = re.compile(r"^[\s¡¿!?.,;:]+|[\s¡¿!?.,;:]+$")
+
+def exact_text(text: str) -> str:
+    """Clave para NER: el texto tal cual, para que los offsets start/end de las entidades sigan siendo válidos."""
+    return text
+
+def normalize_text(text: str) -> str:
+    """Unicode NFC y espacios colapsados."""
+    return _SPACES.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+def normalize_intent_text(text: str) -> str:
+    """Forma canónica para intención: además ignora mayúsculas y la puntuación de los extremos."""
+    return _EDGE_PUNCTUATION.sub("", normalize_text(text).casefold())
+
+def _to_json(value: Any) -> str:
+    # Las puntuaciones de los pipelines son numpy.float32: se convierten a tipos de Python
+    return json.dumps(value, ensure_ascii=False, default=lambda o: o.item() if hasattr(o, "item") else str(o))
+
+class NLPResultCache:
+    """
+    LRU thread-safe de resultados por (kind, version, text), con un nivel en disco opcional
+    (`path`). Los aciertos en disco se promocionan a memoria. `get` devuelve una copia y
+    `put` guarda una copia, así que los llamantes pueden modificar lo que reciben.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = NLP_CACHE_ENTRIES,
+        path: Optional[str] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.max_entries = max_entries
+        self.path = path
+        self._clock = clock
+        self._entries: "OrderedDict[tuple, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(CACHE_SCHEMA)
+            self._conn.commit()
+
+    def get(self, kind: str, version: str, text: str) -> Any:
+        """Devuelve el resultado cacheado de `text` (ya normalizado) o MISSING."""
+        key = (kind, version, text)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return copy.deepcopy(self._entries[key])
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT result FROM nlp_results WHERE kind = ? AND version = ? AND text = ?", key
+                ).fetchone()
+                if row is not None:
+                    value = json.loads(row[0])
+                    self._store(key, value)
+                    self.disk_hits += 1
+                    return copy.deepcopy(value)
+            self.misses += 1
+            return MISSING
+
+    def put(self, kind: str, version: str, text: str, value: Any) -> None:
+        key = (kind, version, text)
+        with self._lock:
+            if self._conn is not None:
+                value = json.loads(_to_json(value))  # mismo valor que devolverá una lectura de disco (y ya es una copia)
+                try:
+                    with self._conn:
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO nlp_results (kind, version, text, result, updated_at) VALUES (?, ?, ?, ?, ?)",
+                            (kind, version, text, _to_json(value), self._clock()),
+                        )
+                except sqlite3.Error as e:
+                    logger.warning("No se pudo guardar el resultado en la caché en disco: %s", e)
+            else:
+                value = copy.deepcopy(value)
+            self._store(key, value)
+
+    def _store(self, key: tuple, value: Any) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self, disk: bool = False) -> None:
+        with self._lock:
+            self._entries.clear()
+            if disk and self._conn is not None:
+                with self._conn:
+                    self._conn.execute("DELETE FROM nlp_results")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+default_cache = NLPResultCache()
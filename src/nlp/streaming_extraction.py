@@ -0,0 +1,136 @@
+# streaming_extraction.py
+#
+# Extracción incremental de los datos del lead mientras llega la transcripción. Se alimenta
+# con fragmentos de texto (deltas de STT o turnos sucesivos de la conversación); las frases
+# se analizan una sola vez, cuando se completan, con las expresiones regulares de
+# extract_lead_info y, si hay un NLPProcessor, con el NER. El estado acumulado dice qué
+# campos faltan, y cada campo nuevo o corregido genera un evento para que el agente pueda
+# adelantar consultas (p. ej. buscar el lead en cuanto se conoce el nombre).
+#
+#   extractor = StreamingLeadExtractor(NLPProcessor(), on_field=lambda event: print(event))
+#   extractor.feed("Hola, soy Ana. Mi correo es ana@acme.com")   # evento del nombre (NER)
+#   extractor.feed(" y mi empresa es Acme.\n")                    # email, empresa...
+#   extractor.finish()                                             # analiza lo que quede
+#   extractor.missing()                                            # ["budget", "timeline"]
+
+import logging
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from nlp.entity_extraction import extract_lead_info
+
+logger = logging.getLogger("StreamingLeadExtractor")
+
+LEAD_FIELDS = ("name", "company", "email", "budget", "timeline")
+# Grupo de entidad del NER -> campo del lead (solo si las regex no lo dieron ya)
+NER_FIELDS = {"PER": "name", "ORG": "company"}
+NER_MIN_SCORE = 0.6
+
+# Fin de frase: signo de cierre seguido de espacio (no el punto de "ana@acme.com" ni de "2.5") o salto de línea
+_SENTENCE_END = re.compile(r"[.!?…;]+(?=\s)|\n")
+
+FieldEvent = Dict[str, Any]  # {"field", "value", "source", "sentence", "previous"}
+
+class StreamingLeadExtractor:
+    """
+    Estado incremental de un lead a partir de fragmentos de transcripción. Los campos que
+    vienen de las regex (etiquetas explícitas) tienen prioridad sobre los del NER.
+    """
+
+    def __init__(
+        self,
+        processor: Optional[Any] = None,
+        on_field: Optional[Callable[[FieldEvent], None]] = None,
+        required: Iterable[str] = LEAD_FIELDS,
+        ner_min_score: float = NER_MIN_SCORE,
+    ):
+        self.processor = processor
+        self.on_field = on_field
+        self.required = tuple(required)
+        self.ner_min_score = ner_min_score
+        self.reset()
+
+    def reset(self) -> None:
+        self.fields: Dict[str, str] = {}
+        self._sources: Dict[str, str] = {}
+        self._buffer = ""
+        self.sentences = 0
+
+    def feed(self, delta: str) -> List[FieldEvent]:
+        """Añade un fragmento y analiza las frases que completa. Devuelve los eventos generados."""
+        self._buffer += delta
+        end = 0
+        for match in _SENTENCE_END.finditer(self._buffer):
+            end = match.end()
+        if not end:
+            return []
+        completed, self._buffer = self._buffer[:end], self._buffer[end:]
+        return self._analyze(completed)
+
+    def finish(self) -> List[FieldEvent]:
+        """Analiza el texto pendiente aunque la frase no esté cerrada (fin del turno)."""
+        pending, self._buffer = self._buffer, ""
+        return self._analyze(pending) if pending.strip() else []
+
+    def _analyze(self, text: str) -> List[FieldEvent]:
+        events, start = [], 0
+        for match in _SENTENCE_END.finditer(text):
+            events.extend(self._analyze_sentence(text[start:match.end()]))
+            start = match.end()
+        if text[start:].strip():
+            events.extend(self._analyze_sentence(text[start:]))
+        return events
+
+    def _analyze_sentence(self, text: str) -> List[FieldEvent]:
+        if not text.strip():
+            return []
+        self.sentences += 1
+        events = []
+        for field, value in extract_lead_info(text).items():
+            if field in LEAD_FIELDS:
+                events.extend(self._set(field, value, "regex"))
+        if self.processor is not None:
+            try:
+                events.extend(self.apply_entities(self.processor.extract_entities(text)))
+            except Exception as e:
+                logger.error("Error en el NER incremental: %s", e)
+        return events
+
+    def apply_entities(self, entities: Iterable[Dict[str, Any]]) -> List[FieldEvent]:
+        """
+        Incorpora entidades del NER (formato de NLPProcessor.extract_entities), calculadas aquí o
+        en otro sitio (p. ej. en el pool de procesos). No pisa campos obtenidos por regex.
+        """
+        best: Dict[str, Dict[str, Any]] = {}
+        for entity in entities:
+            field = NER_FIELDS.get(entity.get("entity_group", entity.get("entity", "")).split("-")[-1])
+            if field and float(entity.get("score", 0)) >= self.ner_min_score:
+                if field not in best or float(entity["score"]) > float(best[field]["score"]):
+                    best[field] = entity
+        events = []
+        for field, entity in best.items():
+            if self._sources.get(field) != "regex":
+                events.extend(self._set(field, str(entity["word"]).strip(), "ner"))
+        return events
+
+    def _set(self, field: str, value: str, source: str) -> List[FieldEvent]:
+        value = value.strip()
+        previous = self.fields.get(field)
+        if not value or value == previous:
+            return []
+        self.fields[field] = value
+        self._sources[field] = source
+        event = {"field": field, "value": value, "source": source, "sentence": self.sentences, "previous": previous}
+        if self.on_field is not None:
+            try:
+                self.on_field(event)
+            except Exception as e:
+                logger.error("Error en el callback de campo '%s': %s", field, e)
+        return [event]
+
+    def missing(self) -> List[str]:
+        return [field for field in self.required if field not in self.fields]
+
+    @property
+    def is_complete(self) -> bool:
+        return not self.missing()
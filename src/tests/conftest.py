@@ -0,0 +1,94 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from agent import sqlite_db
+from nlp.result_cache import default_cache
+
+
+class StubCRMServer(ThreadingHTTPServer):
+    """Servidor HTTP local que registra las peticiones y responde según una cola de respuestas."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.requests = []
+        self.responses = []
+        self.client_ports = set()
+        self.lock = threading.Lock()
+        self.delay = 0.0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def next_response(self, body):
+        with self.lock:
+            if self.responses:
+                return self.responses.pop(0)
+        if "records" in body:
+            return 200, {}, {"records": [
+                {"id": item.get("id", f"rec{i}"), "fields": item["fields"]} for i, item in enumerate(body["records"])
+            ]}
+        if "inputs" in body:
+            return 200, {}, {"results": [{"id": str(i), "properties": item["properties"]} for i, item in enumerate(body["inputs"])]}
+        return 200, {}, {"vid": 1}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _handle(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        server = self.server
+        with server.lock:
+            server.requests.append((self.command, self.path, body))
+            server.client_ports.add(self.client_address[1])
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        time.sleep(server.delay)
+        with server.lock:
+            server.in_flight -= 1
+        status, headers, payload = server.next_response(body)
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = do_PATCH = _handle
+
+
+@pytest.fixture(autouse=True)
+def isolated_db(tmp_path, monkeypatch):
+    """
+    Cada test usa su propia leads.db (las claves de idempotencia de los clientes CRM viven ahí)
+    y empieza con la caché de resultados de NLP vacía.
+    """
+    monkeypatch.setattr(sqlite_db, "DB_NAME", str(tmp_path / "leads.db"))
+    default_cache.clear()
+    yield
+    sqlite_db.close_pool()
+
+
+@pytest.fixture
+def stub_server():
+    server = StubCRMServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
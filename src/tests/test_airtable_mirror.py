@@ -0,0 +1,81 @@
+import asyncio
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+import pytest
+
+from agent import sqlite_db
+from agent.airtable_mirror import AirtableMirror
+from agent.async_crm import AsyncAirtableCRM
+
+
+def record(record_id, nombre, empresa="Empresa XYZ"):
+    return {"id": record_id, "createdTime": "2024-01-01T00:00:00.000Z", "fields": {"Nombre": nombre, "Empresa": empresa}}
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(sqlite_db, "DB_NAME", str(tmp_path / "leads.db"))
+    sqlite_db.init_db()
+    yield sqlite_db
+    sqlite_db.close_pool()
+
+
+def sync(stub_server, *responses, full=False):
+    stub_server.responses = [(200, {}, body) for body in responses]
+
+    async def scenario():
+        async with httpx.AsyncClient() as http:
+            crm = AsyncAirtableCRM("key", "base", "Leads", api_url=stub_server.url, client=http)
+            return await AirtableMirror(crm).sync(full=full)
+
+    return asyncio.run(scenario())
+
+
+def query(stub_server, index):
+    return parse_qs(urlsplit(stub_server.requests[index][1]).query)
+
+
+def test_initial_load_streams_pages_then_pulls_only_changes(db, stub_server):
+    report = sync(
+        stub_server,
+        {"records": [record("rec1", "Juan Pérez"), record("rec2", "Ana Torres")], "offset": "itr1"},
+        {"records": [record("rec3", "Juana Gómez")]},
+    )
+    assert (report["mode"], report["pages"], report["fetched"], report["total"]) == ("full", 2, 3, 3)
+    assert "filterByFormula" not in query(stub_server, 0)
+    assert query(stub_server, 1)["offset"] == ["itr1"]
+
+    report = sync(stub_server, {"records": [record("rec2", "Ana Torres", empresa="Empresa ABC")]})
+    assert (report["mode"], report["fetched"], report["total"]) == ("incremental", 1, 3)
+    formula = query(stub_server, 2)["filterByFormula"][0]
+    assert formula.startswith("IS_AFTER(LAST_MODIFIED_TIME(), '")
+
+    crm = AsyncAirtableCRM("key", "base", "Leads")
+    mirror = AirtableMirror(crm)
+    assert mirror.get_record("rec2")["fields"]["Empresa"] == "Empresa ABC"
+    assert [r["id"] for r in mirror.find_by_name("juan")] == ["rec1", "rec3"]
+    assert [r["id"] for r in mirror.find_by_name("JUANA GOMEZ")] == ["rec3"]
+    assert [r["id"] for r in mirror.find_by_field("Empresa", "Empresa ABC")] == ["rec2"]
+
+
+def test_full_resync_drops_records_deleted_remotely(db, stub_server):
+    sync(stub_server, {"records": [record("rec1", "Juan Pérez"), record("rec2", "Ana Torres")]})
+    report = sync(stub_server, {"records": [record("rec2", "Ana Torres")]}, full=True)
+    assert report["deleted"] == 1 and report["total"] == 1
+
+
+def test_failed_page_keeps_previous_checkpoint(db, stub_server):
+    sync(stub_server, {"records": [record("rec1", "Juan Pérez")]})
+    stub_server.responses = [(200, {}, {"records": [record("rec9", "Nuevo")], "offset": "x"}), (422, {}, {})]
+
+    async def scenario():
+        async with httpx.AsyncClient() as http:
+            crm = AsyncAirtableCRM("key", "base", "Leads", api_url=stub_server.url, client=http, max_retries=0)
+            mirror = AirtableMirror(crm)
+            with pytest.raises(httpx.HTTPStatusError):
+                await mirror.sync()
+            return mirror._load_state()
+
+    _, sync_id = asyncio.run(scenario())
+    assert sync_id == 1
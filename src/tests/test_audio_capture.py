@@ -0,0 +1,58 @@
+import asyncio
+import functools
+
+import numpy as np
+
+from audio.capture import AudioCapture, AudioRingBuffer, SyntheticInputStream
+
+
+def test_ring_buffer_grows_ahead_and_wraps_at_max():
+    ring = AudioRingBuffer(100, max_frames=400)
+    ring.write(np.arange(80, dtype=np.int16).reshape(-1, 1))
+    assert ring.reserve() and ring.capacity == 100    # preparado, pero lo adopta el productor
+    ring.write(np.arange(80, 160, dtype=np.int16).reshape(-1, 1))
+    assert (ring.capacity, ring.grows, ring.emergency_grows) == (200, 1, 0)
+    ring.write(np.arange(160, 300, dtype=np.int16).reshape(-1, 1))   # sin reserva: crece el productor
+    assert (ring.capacity, ring.emergency_grows) == (400, 1)
+    view = ring.view()
+    assert np.shares_memory(view, ring._data)
+    assert view[:, 0].tolist() == list(range(300))
+
+    ring.write(np.arange(300, 450, dtype=np.int16).reshape(-1, 1))   # capacidad máxima: anillo
+    assert ring.overflow_frames == 50
+    assert ring.view()[:, 0].tolist() == list(range(50, 450))
+    ring.clear()
+    assert len(ring) == 0 and ring.capacity == 400
+
+
+def test_capture_from_synthetic_stream_counts_xruns():
+    samplerate = 8000
+    signal = (np.sin(np.arange(samplerate * 3) / 10) * 1000).astype(np.int16)
+    streams = []
+
+    def factory(**kwargs):
+        streams.append(SyntheticInputStream(signal, xrun_blocks=(2, 5), **kwargs))
+        return streams[-1]
+
+    capture = AudioCapture(samplerate, initial_seconds=1, max_seconds=10, blocksize=160, stream_factory=factory)
+
+    async def until_signal_ends():
+        await asyncio.get_running_loop().run_in_executor(None, streams[-1].finished.wait, 5)
+
+    async def scenario():
+        return await capture.record(until_signal_ends)
+
+    audio = asyncio.run(scenario())
+    assert audio.dtype == np.int16 and audio.shape == (len(signal), 1)
+    assert np.array_equal(audio[:, 0], signal)
+    stats = capture.stats()
+    assert stats["seconds"] == 3.0 and stats["callbacks"] == len(signal) // 160
+    assert (stats["xruns"], stats["input_overflows"], stats["overflow_frames"]) == (2, 2, 0)
+    assert stats["grows"] + stats["emergency_grows"] >= 1
+
+    # la memoria se reutiliza en la siguiente grabación
+    capacity = capture.ring.capacity
+    capture.stream_factory = functools.partial(SyntheticInputStream, signal[:800])
+    with capture:
+        pass
+    assert capture.ring.capacity == capacity
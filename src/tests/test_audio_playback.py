@@ -0,0 +1,65 @@
+import asyncio
+
+import numpy as np
+
+from audio.playback import AudioPlayer, SyntheticOutputStream
+
+
+def _player(samplerate, streams, **kwargs):
+    def factory(**stream_kwargs):
+        streams.append(SyntheticOutputStream(**stream_kwargs))
+        return streams[-1]
+
+    return AudioPlayer(samplerate, blocksize=80, stream_factory=factory, **kwargs)
+
+
+def test_playback_starts_after_prebuffer_and_plays_everything_in_order():
+    samplerate = 8000
+    signal = np.arange(1, 4001, dtype=np.int16)
+    streams = []
+    player = _player(samplerate, streams, prebuffer_ms=50)
+
+    async def scenario():
+        player.begin_turn()
+        for chunk in np.array_split(signal, 10):
+            player.write(chunk)
+            if not streams:
+                await asyncio.sleep(0.02)   # el TTS entrega fragmentos poco a poco
+        return await player.finish()
+
+    stats = asyncio.run(scenario())
+    # sonó antes de recibir la respuesta completa (400 frames de prebuffer, no 4000)
+    assert len(streams) == 1
+    assert stats["time_to_first_audio_ms"] < 100
+    assert stats["first_chunk_ms"] <= stats["time_to_first_audio_ms"]
+    played = streams[0].output()[:, 0]
+    assert np.array_equal(played[played != 0], signal)
+    assert (stats["chunks"], stats["frames_played"], stats["audio_seconds"]) == (10, 4000, 0.5)
+    assert stats["underruns"] == 0 and player.turns == 1
+
+
+def test_slow_producer_counts_underruns_and_rebuffers():
+    samplerate = 8000
+    streams = []
+    player = _player(samplerate, streams, prebuffer_ms=20)
+
+    async def scenario():
+        player.begin_turn()
+        player.write(np.ones(400, dtype=np.int16))   # 50 ms
+        await asyncio.sleep(0.15)                    # el TTS se retrasa: el buffer se vacía
+        player.write(np.full(400, 2, dtype=np.int16))
+        return await player.finish()
+
+    stats = asyncio.run(scenario())
+    assert stats["underruns"] == 1 and stats["underrun_ms"] > 50
+    played = streams[0].output()[:, 0]
+    assert np.array_equal(played[played != 0], [1] * 400 + [2] * 400)
+
+    # la respuesta más corta que el prebuffer se reproduce igualmente al terminar
+    async def short_turn():
+        player.begin_turn()
+        player.write(np.ones(40, dtype=np.int16))
+        return await player.finish()
+
+    stats = asyncio.run(short_turn())
+    assert stats["frames_played"] == 40 and stats["underruns"] == 0 and len(streams) == 2
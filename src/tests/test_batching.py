@@ -0,0 +1,77 @@
+import asyncio
+import time
+
+from nlp.batching import MicroBatcher
+from nlp.entity_intention_extraction import NLPProcessor
+from nlp.model_registry import ModelRegistry
+
+
+class BatchPipeline:
+    """Pipeline falso: registra cada llamada y tarda lo mismo con 1 texto que con un lote."""
+
+    def __init__(self, task, calls, delay=0.02):
+        self.task = task
+        self.calls = calls
+        self.delay = delay
+
+    def __call__(self, texts, batch_size=None):
+        self.calls.append((self.task, texts))
+        time.sleep(self.delay)
+        if isinstance(texts, str):
+            return self._one(texts)
+        return [self._one(text) if self.task == "ner" else self._one(text)[0] for text in texts]
+
+    def _one(self, text):
+        if self.task == "ner":
+            return [{"entity_group": "PER", "word": text.split()[-1]}]
+        return [{"label": "purchase" if "comprar" in text else "info", "score": 0.9}]
+
+
+def make_processor(delay=0.02):
+    calls = []
+    registry = ModelRegistry(loader=lambda task, **kwargs: BatchPipeline(task, calls, delay))
+    registry.warm_up()
+    calls.clear()
+    return NLPProcessor(registry), calls
+
+
+def test_concurrent_requests_share_one_forward_pass_per_model():
+    processor, calls = make_processor()
+
+    async def scenario():
+        batcher = MicroBatcher(processor, max_batch_size=8, max_wait=0.01)
+        texts = [f"quiero comprar algo {i}" if i % 2 else f"hola soy Ana{i}" for i in range(8)]
+        results = await asyncio.gather(*(batcher.analyze(text) for text in texts))
+        stats = batcher.stats()
+        await batcher.close()
+        return texts, results, stats
+
+    texts, results, stats = asyncio.run(scenario())
+    assert [task for task, _ in calls] == ["ner", "text-classification"]
+    assert calls[0][1] == texts
+    assert results[0] == {"entities": [{"entity_group": "PER", "word": "Ana0"}], "intent": [{"label": "info", "score": 0.9, "source": "model"}]}
+    assert results[1]["intent"] == [{"label": "purchase", "score": 0.9, "source": "model"}]
+    assert results[0]["entities"] == processor.extract_entities(texts[0])
+    assert stats["batches"] == 1 and stats["avg_batch_size"] == 8 and stats["p95_latency_ms"] > 0
+
+
+def test_batches_respect_max_size_and_fail_independently():
+    processor, calls = make_processor(delay=0)
+
+    async def scenario():
+        batcher = MicroBatcher(processor, max_batch_size=3, max_wait=0.01)
+        entities = await asyncio.gather(*(batcher.extract_entities(f"texto {i}") for i in range(7)))
+        stats = batcher.stats()
+        processor.registry._models["ner"] = None  # el siguiente lote falla
+        try:
+            await batcher.analyze("otro")
+        except TypeError as e:
+            error = e
+        await batcher.close()
+        return entities, stats, error
+
+    entities, stats, error = asyncio.run(scenario())
+    assert [len(texts) for task, texts in calls if task == "ner"] == [3, 3, 1]
+    assert entities[6] == [{"entity_group": "PER", "word": "6"}]
+    assert stats["batches"] == 3 and stats["max_batch_size"] == 3
+    assert isinstance(error, TypeError)
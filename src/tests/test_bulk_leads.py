@@ -0,0 +1,55 @@
+import io
+import json
+
+import pytest
+
+from agent import bulk_leads, sqlite_db
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(sqlite_db, "DB_NAME", str(tmp_path / "leads.db"))
+    sqlite_db.init_db()
+    yield sqlite_db
+    sqlite_db.close_pool()
+
+
+def test_insert_leads_many_in_chunks(db):
+    leads = (
+        {"nombre": f"Lead {i}", "empresa": "ACME", "necesidades": "CRM", "presupuesto": f"{i}k"}
+        for i in range(1, 26)
+    )
+    assert db.insert_leads_many(leads, chunk_size=10) == 25
+    assert db.budget_stats()[0]["sum"] == sum(range(1, 26)) * 1000
+    assert db.find_leads("lead 7")[0]["nombre"] == "Lead 7"
+
+
+def test_import_normalizes_rows_and_free_text(db):
+    source = io.StringIO(
+        "\n".join([
+            json.dumps({"name": "Ana Torres", "company": "Beta", "budget": "$500"}),
+            json.dumps("Name: John Doe, Company: Acme Corp, Budget: $1000"),
+            json.dumps({"empresa": "Sin nombre"}),
+            json.dumps(["Ana", "Beta"]),
+            "42",
+        ])
+    )
+    stats = bulk_leads.import_leads(source, "jsonl")
+    assert (stats["imported"], stats["skipped"]) == (2, 3)
+    leads = {lead["nombre"]: lead for lead in db.list_leads()}
+    assert leads["Ana Torres"]["empresa"] == "Beta"
+    assert leads["John Doe"]["presupuesto"] == "$1000"
+
+
+def test_csv_round_trip(db, tmp_path):
+    source = tmp_path / "in.csv"
+    source.write_text(
+        "nombre,empresa,necesidades,presupuesto\nJuan Pérez,XYZ,Consultoría,10000\n", encoding="utf-8"
+    )
+    target = tmp_path / "out.jsonl"
+    assert bulk_leads.main(["import", str(source), "--db", db.DB_NAME]) == 0
+    assert bulk_leads.main(["export", str(target), "--db", db.DB_NAME]) == 0
+    [exported] = [json.loads(line) for line in target.read_text(encoding="utf-8").splitlines()]
+    assert exported == {
+        "id": 1, "nombre": "Juan Pérez", "empresa": "XYZ", "necesidades": "Consultoría", "presupuesto": "10000",
+    }
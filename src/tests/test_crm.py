@@ -0,0 +1,119 @@
+import asyncio
+import time
+
+import httpx
+
+from agent.async_crm import AsyncAirtableCRM, AsyncHubSpotCRMClient
+from agent.crm import HubSpotCRMClient
+
+
+LEAD = {"nombre": "Juan Pérez", "empresa": "Empresa XYZ", "necesidades": "Consultoría", "presupuesto": "10000"}
+
+
+def test_requests_reuse_one_keep_alive_connection(stub_server):
+    with HubSpotCRMClient("key", base_url=stub_server.url) as client:
+        for i in range(5):
+            assert client.create_or_update_lead(dict(LEAD, nombre=f"Juan Pérez {i}"))["status"] == "success"
+    assert len(stub_server.requests) == 5
+    assert len(stub_server.client_ports) == 1
+    method, path, body = stub_server.requests[0]
+    assert path.startswith("/contacts/v1/contact/createOrUpdate/email/")
+    assert "hapikey=key" in path
+    assert {"property": "company", "value": "Empresa XYZ"} in body["properties"]
+
+
+def test_repeated_lead_is_sent_once_within_window(stub_server):
+    stub_server.responses = [(500, {}, {"message": "boom"})]
+    client = HubSpotCRMClient("key", base_url=stub_server.url, max_retries=0)
+    assert client.create_or_update_lead(LEAD)["status"] == "error"
+    first = client.create_or_update_lead(LEAD)
+    again = client.create_or_update_lead(dict(LEAD, nombre="juan perez", presupuesto="10,000"))
+    assert first["status"] == "success" and again == first
+    assert len(stub_server.requests) == 2
+
+    async def scenario():
+        async with httpx.AsyncClient() as http:
+            airtable = AsyncAirtableCRM("key", "base", "Leads", api_url=stub_server.url, client=http)
+            return await asyncio.gather(*(airtable.create_lead({"Nombre": "Ana Torres"}) for _ in range(3)))
+
+    results = asyncio.run(scenario())
+    assert len(stub_server.requests) == 3
+    assert sum(result.get("status") == "duplicate" for result in results) == 2
+
+
+def test_retries_throttled_requests_honoring_retry_after(stub_server):
+    stub_server.responses = [
+        (429, {"Retry-After": "0"}, {"message": "rate limited"}),
+        (503, {}, {"message": "unavailable"}),
+    ]
+    client = HubSpotCRMClient("key", base_url=stub_server.url, backoff_factor=0)
+    assert client.create_or_update_lead(LEAD)["status"] == "success"
+    assert len(stub_server.requests) == 3
+
+
+def test_gives_up_after_max_retries(stub_server):
+    stub_server.responses = [(500, {}, {"message": "boom"})] * 3
+    client = HubSpotCRMClient("key", base_url=stub_server.url, max_retries=2, backoff_factor=0)
+    result = client.create_or_update_lead(LEAD)
+    assert result["status"] == "error" and "500" in result["message"]
+
+
+def test_batch_upsert_in_chunks(stub_server):
+    leads = [dict(LEAD, nombre=f"Lead {i}") for i in range(250)]
+    stub_server.responses = [(200, {}, {"results": [{"id": "x"}] * 100}), (400, {}, {"message": "bad"})]
+    client = HubSpotCRMClient("key", base_url=stub_server.url)
+    result = client.create_or_update_leads(leads)
+    assert [len(body["inputs"]) for _, _, body in stub_server.requests] == [100, 100, 50]
+    assert stub_server.requests[0][1].startswith("/crm/v3/objects/contacts/batch/upsert")
+    first = stub_server.requests[0][2]["inputs"][0]
+    assert first["idProperty"] == "email" and first["id"] == "lead.0@example.com"
+    assert result["status"] == "partial"
+    assert len(result["data"]) == 150
+    assert result["errors"] == [{"offset": 100, "size": 100, "message": result["errors"][0]["message"]}]
+
+
+def test_async_clients_fan_out_with_bounded_concurrency(stub_server):
+    stub_server.delay = 0.05
+
+    async def scenario():
+        async with httpx.AsyncClient() as http:
+            hubspot = AsyncHubSpotCRMClient("key", base_url=stub_server.url, client=http, max_concurrency=3)
+            airtable = AsyncAirtableCRM("key", "base", "Leads", api_url=stub_server.url, client=http, max_concurrency=3)
+            start = time.perf_counter()
+            results = await asyncio.gather(
+                *(hubspot.create_or_update_lead(dict(LEAD, nombre=f"Lead {i}")) for i in range(6)),
+                airtable.create_lead({"Nombre": "Juan Pérez"}),
+                airtable.get_lead("rec1"),
+            )
+            return results, time.perf_counter() - start
+
+    results, elapsed = asyncio.run(scenario())
+    assert all(result.get("status", "success") == "success" for result in results)
+    assert len(stub_server.requests) == 8
+    assert stub_server.max_in_flight <= 6
+    assert elapsed < 8 * stub_server.delay
+    assert ("GET", "/base/Leads/rec1", {}) in stub_server.requests
+
+
+def test_async_client_retries_and_reports_errors(stub_server):
+    stub_server.responses = [(429, {"Retry-After": "0"}, {}), (404, {}, {"error": "NOT_FOUND"})]
+
+    async def scenario():
+        async with httpx.AsyncClient() as http:
+            airtable = AsyncAirtableCRM("key", "base", "Leads", api_url=stub_server.url, client=http)
+            return await airtable.get_lead("missing")
+
+    result = asyncio.run(scenario())
+    assert "404" in result["error"]
+    assert len(stub_server.requests) == 2
+
+
+def test_async_batch_upsert_runs_chunks_concurrently(stub_server):
+    async def scenario():
+        async with httpx.AsyncClient() as http:
+            hubspot = AsyncHubSpotCRMClient("key", base_url=stub_server.url, client=http)
+            return await hubspot.create_or_update_leads([dict(LEAD, nombre=f"L{i}") for i in range(230)])
+
+    result = asyncio.run(scenario())
+    assert result["status"] == "success" and len(result["data"]) == 230
+    assert sorted(len(body["inputs"]) for _, _, body in stub_server.requests) == [30, 100, 100]
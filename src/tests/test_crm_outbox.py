@@ -0,0 +1,129 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from agent import crm_outbox, sqlite_db
+from agent.async_crm import AsyncHubSpotCRMClient
+
+
+LEAD = {"nombre": "Juan Pérez", "empresa": "Empresa XYZ", "necesidades": "Consultoría", "presupuesto": "10000"}
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(sqlite_db, "DB_NAME", str(tmp_path / "leads.db"))
+    monkeypatch.setattr(sqlite_db, "writer", sqlite_db.LeadWriter())
+    sqlite_db.init_db()
+    crm_outbox.init_outbox()
+    yield sqlite_db
+    sqlite_db.close_pool()
+
+
+class FakeSender:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.batches = []
+
+    async def send(self, payloads):
+        self.batches.append(payloads)
+        if self.failures:
+            self.failures -= 1
+            return ["503 Service Unavailable"] * len(payloads)
+        return [None] * len(payloads)
+
+
+def run(coro_factory):
+    async def main():
+        try:
+            return await coro_factory()
+        finally:
+            await sqlite_db.writer.close()
+
+    return asyncio.run(main())
+
+
+def test_lead_and_outbox_rows_commit_together_and_deduplicate(db):
+    async def scenario():
+        first = await crm_outbox.enqueue_lead(LEAD, ["hubspot", "airtable"])
+        again = await crm_outbox.enqueue_lead(LEAD, ["hubspot"])
+        return first, again
+
+    assert run(scenario) == (2, 0)
+    assert len(db.list_leads()) == 1
+    assert crm_outbox.outbox_stats()["pending"] == 2
+
+
+def test_identical_lead_can_be_resent_after_the_window(db, monkeypatch):
+    with db.get_pool().transaction() as conn:
+        assert crm_outbox.enqueue(conn, "hubspot", LEAD)
+        assert not crm_outbox.enqueue(conn, "hubspot", LEAD)
+    monkeypatch.setattr(db.idempotency, "IDEMPOTENCY_WINDOW", 0)
+    with db.get_pool().transaction() as conn:
+        assert crm_outbox.enqueue(conn, "hubspot", LEAD)
+    assert crm_outbox.outbox_stats()["pending"] == 2
+
+
+def test_worker_drains_in_batches(db):
+    sender = FakeSender()
+
+    async def scenario():
+        for i in range(5):
+            await crm_outbox.enqueue_lead(dict(LEAD, nombre=f"Lead {i}"), ["hubspot"])
+        worker = crm_outbox.OutboxWorker({"hubspot": sender}, batch_size=2)
+        while await worker.drain_once():
+            pass
+        return worker.stats()
+
+    stats = run(scenario)
+    assert [len(batch) for batch in sender.batches] == [2, 2, 1]
+    assert sender.batches[0][0]["nombre"] == "Lead 0"
+    assert stats["pending"] == 0 and stats["sent"] == 5 and stats["delivered"] == 5
+    assert stats["lag_seconds"] == 0.0
+
+
+def test_failures_are_retried_then_dead_lettered(db):
+    now = [time.time() + 1]
+    flaky, broken = FakeSender(failures=1), FakeSender(failures=99)
+
+    async def scenario():
+        await crm_outbox.enqueue_lead(LEAD, ["hubspot", "airtable"])
+        worker = crm_outbox.OutboxWorker(
+            {"hubspot": flaky, "airtable": broken}, max_attempts=3, base_backoff=10, clock=lambda: now[0]
+        )
+        await worker.drain_once()
+        assert await worker.drain_once() == 0  # el reintento aún no vence
+        for _ in range(2):
+            now[0] += 60
+            await worker.drain_once()
+        return worker.stats()
+
+    stats = run(scenario)
+    assert len(flaky.batches) == 2 and len(broken.batches) == 3
+    assert stats["sent"] == 1 and stats["dead"] == 1 and stats["retried"] == 3
+    [dead] = crm_outbox.dead_letters()
+    assert dead["target"] == "airtable" and dead["attempts"] == 3 and "503" in dead["last_error"]
+    assert crm_outbox.requeue_dead() == 1
+    assert crm_outbox.outbox_stats()["pending"] == 1
+
+
+def test_background_worker_delivers_to_hubspot(db, stub_server):
+    async def scenario():
+        async with httpx.AsyncClient() as http:
+            client = AsyncHubSpotCRMClient("key", base_url=stub_server.url, client=http, max_retries=0)
+            worker = crm_outbox.OutboxWorker({"hubspot": crm_outbox.HubSpotOutboxSender(client)})
+            worker.start()
+            for i in range(3):
+                await crm_outbox.enqueue_lead(dict(LEAD, nombre=f"Lead {i}"), ["hubspot"])
+                worker.notify()
+            for _ in range(100):
+                if worker.stats()["sent"] == 3:
+                    break
+                await asyncio.sleep(0.01)
+            await worker.close()
+            return worker.stats()
+
+    stats = run(scenario)
+    assert stats["sent"] == 3 and stats["pending"] == 0
+    assert sum(len(body["inputs"]) for _, _, body in stub_server.requests) == 3
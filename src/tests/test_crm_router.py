@@ -0,0 +1,65 @@
+import asyncio
+import time
+
+import pytest
+
+from agent import sqlite_db
+from agent.crm_outbox import AIRTABLE_FIELDS
+from agent.crm_router import CRMBackend, CRMRouter, FakeBackend, SQLiteBackend, crm_integration_backend
+
+
+LEAD = {"nombre": "Juan Pérez", "empresa": "Empresa XYZ", "necesidades": "Consultoría", "presupuesto": "10000"}
+
+
+def test_returns_on_primary_ack_and_finishes_secondaries_in_background():
+    primary = FakeBackend("primary")
+    slow = FakeBackend("airtable", latency=0.2, mapping=AIRTABLE_FIELDS)
+    broken = FakeBackend("broken", failure_rate=1.0)
+
+    async def scenario():
+        router = CRMRouter(primary, [slow, broken])
+        start = time.perf_counter()
+        result = await router.write_lead(LEAD)
+        acknowledged = time.perf_counter() - start
+        pending = router.stats()["pending_secondary_writes"]
+        await router.close()
+        return result, acknowledged, pending, router.stats()
+
+    result, acknowledged, pending, stats = asyncio.run(scenario())
+    assert result["status"] == "success" and acknowledged < 0.1
+    assert pending == 2 and stats["pending_secondary_writes"] == 0
+    assert slow.records == [{"Nombre": "Juan Pérez", "Empresa": "Empresa XYZ", "Necesidades": "Consultoría", "Presupuesto": "10000"}]
+    assert stats["backends"]["airtable"]["p50_ms"] >= 200
+    assert stats["backends"]["broken"]["errors"] == 1 and stats["backends"]["primary"]["errors"] == 0
+
+
+def test_sqlite_primary_and_function_backend(tmp_path, monkeypatch):
+    monkeypatch.setattr(sqlite_db, "writer", sqlite_db.LeadWriter())
+    sqlite_db.init_db()
+    stored = []
+
+    def store_lead(name, company, email, budget, timeline):
+        stored.append((name, company, email, budget, timeline))
+        return {"status": "success"}
+
+    async def scenario():
+        router = CRMRouter(
+            SQLiteBackend(),
+            [crm_integration_backend(store_lead)],
+            timeout=1.0,
+        )
+        ok = await router.write_lead(LEAD)
+        failed = await router.write_lead({"nombre": "Incompleto"})
+        await router.close()
+        await sqlite_db.writer.close()
+        return ok, failed
+
+    ok, failed = asyncio.run(scenario())
+    assert ok["status"] == "success" and failed["status"] == "error"
+    assert sqlite_db.list_leads() == [LEAD]
+    assert stored[0] == ("Juan Pérez", "Empresa XYZ", "", "10000", "")
+
+
+def test_backend_interface_is_abstract():
+    with pytest.raises(TypeError):
+        CRMBackend()
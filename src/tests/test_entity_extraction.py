@@ -0,0 +1,63 @@
+import json
+
+from benchmarks.bench_lead_extraction import build_corpus, extract_lead_info_legacy
+from nlp.entity_extraction import extract_lead_info, parse_budget
+
+
+def test_english_and_spanish_labels_in_one_pass():
+    assert extract_lead_info("Name: John Doe, Company: Acme Corp, Email: john.doe@acme.com, Budget: $1000, Timeline: Q3") == {
+        "name": "John Doe", "company": "Acme Corp", "email": "john.doe@acme.com", "budget": "$1000", "timeline": "Q3",
+    }
+    assert extract_lead_info(
+        "Nombre: María González; Empresa: Acme S.A.; Presupuesto: 2,5 millones de euros\nPlazo: tres meses. Correo: maria@acme.es"
+    ) == {"name": "María González", "company": "Acme S.A", "budget": "2,5 millones", "timeline": "tres meses", "email": "maria@acme.es"}
+    assert extract_lead_info("Username: bob, escribe a bob@example.org") == {"email": "bob@example.org"}
+
+
+def test_labels_separated_only_by_spaces_and_short_budgets():
+    assert extract_lead_info("Name John Doe, Company Acme, budget $500") == {
+        "name": "John Doe", "company": "Acme", "budget": "$500",
+    }
+    assert extract_lead_info("Hola, mi nombre es Ana Ruiz y mi presupuesto es de 3 mil euros") == {
+        "name": "Ana Ruiz", "budget": "3 mil euros",
+    }
+    assert extract_lead_info("Company: Acme Inc., Budget: 5k") == {"company": "Acme Inc", "budget": "5k"}
+    assert parse_budget(extract_lead_info("Budget: 5k")["budget"]) == (5000.0, None)
+    assert extract_lead_info("Budget is tight") == {}
+    assert extract_lead_info("Nombre María de la Cruz, empresa Banco de España, company Empresa XYZ") == {
+        "name": "María de la Cruz", "company": "Banco de España",
+    }
+    assert extract_lead_info("Name Ana, Company Empresa XYZ") == {"name": "Ana", "company": "Empresa XYZ"}
+
+
+def test_spaced_labels_in_ordinary_speech_are_not_fields():
+    assert extract_lead_info("Quiero hablar con alguien de la empresa sobre el plazo de entrega") == {}
+    assert extract_lead_info("What is the name of your company?") == {}
+    assert extract_lead_info("El nombre de la empresa: Acme") == {"company": "Acme"}
+    # el valor termina en la conjunción; "un presupuesto" no abre cláusula ni lleva "es"
+    assert extract_lead_info("mi empresa es Acme y tenemos un presupuesto amplio") == {"company": "Acme"}
+
+
+def test_budget_currency_codes_and_year_like_numbers():
+    assert parse_budget("USD 5000") == (5000.0, "USD")
+    assert parse_budget("EUR 20.000") == (20000.0, "EUR")
+    assert parse_budget(extract_lead_info("Budget: USD 5000, Timeline: Q3")["budget"]) == (5000.0, "USD")
+    # el año no es la cifra del presupuesto
+    assert parse_budget("presupuesto 2024 de 5000") == (5000.0, None)
+    assert parse_budget("presupuesto de 3000 para 2025") == (3000.0, None)
+    assert parse_budget("para 2024, unos 8 mil euros") == (8000.0, "EUR")
+    assert parse_budget("2024") == (2024.0, None)
+
+
+def test_json_is_only_parsed_when_it_looks_like_json():
+    lead = {"name": "Ana", "company": "Beta", "email": "a@b.co", "budget": "$5", "timeline": "ya"}
+    assert extract_lead_info(json.dumps(lead)) == lead
+    assert extract_lead_info('{"name": "Ana"}  Budget: $5') == {"budget": "$5"}
+
+
+def test_labelled_english_fields_match_previous_implementation():
+    for text in build_corpus(200):
+        if "Name:" in text:
+            # la versión anterior arrastraba la etiqueta de la línea siguiente ("John Doe\nCompany")
+            legacy = {field: value.split("\n")[0] for field, value in extract_lead_info_legacy(text).items()}
+            assert extract_lead_info(text) == legacy
@@ -0,0 +1,75 @@
+from nlp.entity_intention_extraction import NLPProcessor
+from nlp.intent_cascade import IntentCascade
+from nlp.model_registry import ModelRegistry
+
+
+class BertPipeline:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def __call__(self, texts, batch_size=None):
+        self.calls.append(texts)
+        if isinstance(texts, str):
+            return [{"label": "bert", "score": 0.7}]
+        return [{"label": "bert", "score": 0.7} for _ in texts]
+
+
+BERT = [{"label": "bert", "score": 0.7, "source": "model"}]
+
+
+def rule(label):
+    return [{"label": label, "score": 0.9, "source": "rules"}]
+
+
+def make_processor(cascade):
+    calls = []
+    registry = ModelRegistry(loader=lambda task, **kwargs: BertPipeline(calls), warmup_text="")
+    registry.warm_up(["intent"])
+    calls.clear()
+    return NLPProcessor(registry, cache=None, cascade=cascade), calls
+
+
+def test_commands_skip_bert_and_ambiguous_inputs_fall_through():
+    cascade = IntentCascade()
+    processor, calls = make_processor(cascade)
+    assert processor.classify_intent("¡Elimina el lead de Ana!") == rule("delete_lead")
+    assert processor.classify_intent("Lista todos los leads") == rule("list_leads")
+    assert processor.classify_intent("Actualiza el presupuesto de Carlos a 25000") == rule("update_lead")
+    assert processor.classify_intent("dame todos los contactos")[0]["source"] == "linear"
+    assert calls == []
+
+    results = processor.classify_intent_batch(["agrega un lead", "quiero cambiar de proveedor de CRM", "hola", "¿Qué opinas del clima?"])
+    assert results[0] == rule("add_lead")
+    assert results[1:] == [BERT] * 3
+    assert calls == [["quiero cambiar de proveedor de CRM", "hola", "¿Qué opinas del clima?"]]
+
+    stats = cascade.stats()
+    assert stats["rules_hits"] == 4 and stats["linear_hits"] == 1 and stats["model_fallbacks"] == 3
+
+
+def test_thresholds_are_configurable():
+    strict, calls = make_processor(IntentCascade(linear_threshold=1.0, rules={}))
+    assert strict.classify_intent("agrega un lead") == BERT
+    loose, _ = make_processor(IntentCascade(linear_threshold=0.5))
+    assert loose.classify_intent("da de alta a Pedro")[0]["label"] == "add_lead"
+
+
+def test_ambiguous_or_negated_commands_reach_bert():
+    processor, calls = make_processor(IntentCascade())
+    texts = ["Show me all your pricing plans", "Please don't delete anything", "Remove me from your mailing list",
+             "No borres el lead de Ana"]
+    assert processor.classify_intent_batch(texts) == [BERT] * 4
+    assert calls == [texts]
+
+
+def test_questions_and_passing_mentions_skip_rules_but_bare_commands_do_not():
+    processor, calls = make_processor(IntentCascade())
+    texts = ["¿Cuánto cuesta agregar un contacto más a mi plan?",
+             "Quiero saber si pueden eliminar contactos duplicados en su CRM", "show me the leads pricing plan"]
+    assert processor.classify_intent_batch(texts) == [BERT] * 3
+    assert calls == [texts]
+
+    for text, label in (("¡Lista todos!", "list_leads"), ("Actualiza.", "update_lead"), ("Elimina", "delete_lead")):
+        [result] = processor.classify_intent(text)
+        assert (result["label"], result["source"]) == (label, "linear")
+    assert len(calls) == 1
@@ -0,0 +1,69 @@
+import threading
+import time
+
+from nlp.entity_intention_extraction import NLPProcessor
+from nlp.model_registry import ModelRegistry
+
+
+class FakePipeline:
+    def __init__(self, task, calls):
+        self.task = task
+        self.calls = calls
+
+    def __call__(self, text):
+        self.calls.append((self.task, text))
+        return [{"task": self.task, "text": text}]
+
+
+def make_registry():
+    loads, calls = [], []
+
+    def loader(task, **kwargs):
+        loads.append((task, kwargs["model"]))
+        time.sleep(0.05)
+        return FakePipeline(task, calls)
+
+    return ModelRegistry(loader=loader), loads, calls
+
+
+def test_models_load_once_and_are_warmed_up():
+    registry, loads, calls = make_registry()
+    threads = [threading.Thread(target=registry.get, args=("ner",)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert loads == [("ner", "dslim/bert-base-NER")]
+    assert calls == [("ner", registry.warmup_text)]
+    stats = registry.stats()
+    assert stats["loaded"] == ["ner"]
+    assert stats["models"]["ner"]["load_seconds"] >= 0.05
+    assert stats["resident_memory_bytes"] > 0
+
+
+def test_processor_is_cheap_and_shares_background_warmup():
+    registry, loads, calls = make_registry()
+    first, second = NLPProcessor(registry), NLPProcessor(registry)
+    assert loads == []
+    registry.start_warmup().join()
+    assert registry.is_loaded("ner") and registry.is_loaded("intent")
+    assert first.extract_entities("hola")[0]["task"] == "ner"
+    assert second.classify_intent("hola")[0]["task"] == "text-classification"
+    assert len(loads) == 2
+
+
+def test_onnx_registry_loads_quantized_models_through_the_same_specs(monkeypatch, tmp_path):
+    from nlp import onnx_backend
+
+    loads, calls = [], []
+
+    def fake_load(task, model_dir, arch, **kwargs):
+        loads.append((task, kwargs["model"], model_dir, arch))
+        return FakePipeline(task, calls)
+
+    monkeypatch.setattr(onnx_backend, "load_onnx_pipeline", fake_load)
+    registry = onnx_backend.onnx_registry(tmp_path, arch="avx512_vnni")
+    processor = NLPProcessor(registry)
+    assert processor.extract_entities("hola")[0]["task"] == "ner"
+    assert loads == [("ner", "dslim/bert-base-NER", tmp_path, "avx512_vnni")]
+    assert onnx_backend.quantized_model_dir("dslim/bert-base-NER", tmp_path) == tmp_path / "dslim--bert-base-NER"
@@ -0,0 +1,50 @@
+import asyncio
+import os
+
+from nlp.batching import MicroBatcher
+from nlp.model_registry import ModelRegistry
+from nlp.process_pool import NLPProcessPool
+
+
+class PidPipeline:
+    """Pipeline falso que acepta lotes y devuelve el PID del proceso que lo ejecuta."""
+
+    def __init__(self, task):
+        self.task = task
+
+    def __call__(self, texts, batch_size=None):
+        if isinstance(texts, str):
+            return [{"pid": os.getpid()}]
+        return [[{"pid": os.getpid(), "text": text}] if self.task == "ner" else {"pid": os.getpid()} for text in texts]
+
+
+def fake_registry():
+    return ModelRegistry(loader=lambda task, **kwargs: PidPipeline(task))
+
+
+def test_analysis_runs_in_worker_process_concurrently_with_the_loop():
+    pool = NLPProcessPool(workers=1, registry_factory=fake_registry)
+    pool.start(wait_ready=True)
+
+    async def scenario():
+        batcher = MicroBatcher(pool=pool, max_wait=0.01)
+        task = asyncio.create_task(batcher.analyze("hola soy Ana"))
+        ticks = 0
+        while not task.done():  # el loop sigue libre (p. ej. para el audio) mientras se infiere
+            ticks += 1
+            await asyncio.sleep(0)
+        others = await asyncio.gather(*(batcher.analyze(f"texto {i}") for i in range(3)))
+        await batcher.close()
+        return task.result(), others, ticks
+
+    try:
+        result, others, ticks = asyncio.run(scenario())
+    finally:
+        pool.close()
+    worker_pid = result["entities"][0]["pid"]
+    assert worker_pid != os.getpid()
+    assert result["entities"][0]["text"] == "hola soy Ana"
+    assert result["intent"] == [{"pid": worker_pid, "source": "model"}]
+    assert [row["entities"][0]["text"] for row in others] == ["texto 0", "texto 1", "texto 2"]
+    assert ticks > 0
+    assert pool.stats()["texts"] == 4
@@ -0,0 +1,66 @@
+from nlp.entity_intention_extraction import NLPProcessor
+from nlp.model_registry import ModelRegistry
+from nlp.result_cache import NLPResultCache
+
+
+class CountingPipeline:
+    def __init__(self, task, calls):
+        self.task = task
+        self.calls = calls
+
+    def __call__(self, texts, batch_size=None):
+        self.calls.append(texts)
+        if isinstance(texts, str):
+            return [{"label": self.task, "score": 0.5, "text": texts}]
+        return [[{"label": self.task, "score": 0.5, "text": text}] for text in texts]
+
+
+def make_processor(cache, backend="torch"):
+    calls = []
+    registry = ModelRegistry(loader=lambda task, **kwargs: CountingPipeline(task, calls), warmup_text="", backend=backend)
+    registry.warm_up()
+    calls.clear()
+    return NLPProcessor(registry, cache=cache, cascade=None), calls
+
+
+def test_repeated_phrases_skip_inference():
+    cache = NLPResultCache(max_entries=3)
+    processor, calls = make_processor(cache)
+    first = processor.classify_intent("Sí.")
+    assert processor.classify_intent("  sí ") == first
+    assert processor.extract_entities("Lista todos los leads") == processor.extract_entities("Lista todos los leads")
+    # NER se cachea por el texto exacto: los offsets del resultado pertenecen a ese texto
+    spaced = processor.extract_entities("Lista  todos los leads")
+    assert spaced[0]["text"] == "Lista  todos los leads"
+    assert calls == ["Sí.", "Lista todos los leads", "Lista  todos los leads"]
+
+    batch = processor.classify_intent_batch(["¡SÍ!", "elimina a Ana", "elimina a ana", "lista"])
+    assert calls[-1] == ["elimina a Ana", "lista"]
+    assert batch[0] == first and batch[1] == batch[2] and batch[1] is not batch[2]
+    stats = cache.stats()
+    assert stats["memory_hits"] == 3 and stats["misses"] == 6 and stats["evictions"] == 2
+
+
+def test_callers_cannot_mutate_cached_results():
+    processor, calls = make_processor(NLPResultCache())
+    expected = processor.classify_intent("hola")
+    processor.classify_intent("hola")[0]["label"] = "changed"
+    processor.extract_entities("Ana").append({"label": "extra"})
+    assert processor.classify_intent("hola") == expected
+    assert len(processor.extract_entities("Ana")) == 1
+    assert calls == ["hola", "Ana"]
+
+
+def test_disk_tier_survives_restart_and_separates_model_versions(tmp_path):
+    path = str(tmp_path / "nlp_cache.db")
+    processor, calls = make_processor(NLPResultCache(path=path))
+    expected = processor.extract_entities("Hola, soy Ana de Acme")
+    processor.cache.close()
+
+    restarted, calls = make_processor(NLPResultCache(path=path))
+    assert restarted.extract_entities("Hola, soy Ana de Acme") == expected
+    assert calls == [] and restarted.cache.stats()["disk_hits"] == 1
+
+    onnx, calls = make_processor(NLPResultCache(path=path), backend="onnx-int8-avx2")
+    onnx.extract_entities("Hola, soy Ana de Acme")
+    assert calls == ["Hola, soy Ana de Acme"]
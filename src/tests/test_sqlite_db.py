@@ -0,0 +1,258 @@
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+
+from agent import sqlite_db
+
+
+LEAD = {
+    "nombre": "Juan Pérez",
+    "empresa": "Empresa XYZ",
+    "necesidades": "Servicios de consultoría y software a medida",
+    "presupuesto": "10000",
+}
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(sqlite_db, "DB_NAME", str(tmp_path / "leads.db"))
+    monkeypatch.setattr(sqlite_db, "writer", sqlite_db.LeadWriter(window=0.05))
+    sqlite_db.init_db()
+    yield sqlite_db
+    sqlite_db.close_pool()
+
+
+def test_crud_through_pool(db):
+    db.insert_lead(LEAD)
+    db.update_lead_field("Juan Pérez", "empresa", "Empresa ABC")
+    assert db.list_leads() == [dict(LEAD, empresa="Empresa ABC")]
+    db.delete_lead_by_name("Juan Pérez")
+    assert db.list_leads() == []
+
+
+def test_connections_use_wal_and_are_reused(db):
+    pool = db.get_pool()
+    with pool.connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == db.BUSY_TIMEOUT_MS
+    with pool.connection() as again:
+        assert again is conn
+
+
+def test_readers_continue_during_write(db):
+    db.insert_lead(LEAD)
+    pool = db.get_pool()
+    with pool.transaction() as conn:
+        conn.execute("UPDATE leads SET empresa = 'Pendiente'")
+        result = []
+        reader = threading.Thread(target=lambda: result.extend(db.list_leads()))
+        reader.start()
+        reader.join(timeout=2)
+        assert not reader.is_alive()
+        assert result[0]["empresa"] == "Empresa XYZ"
+    assert db.list_leads()[0]["empresa"] == "Pendiente"
+
+
+def test_failed_transaction_rolls_back(db):
+    with pytest.raises(KeyError):
+        db.insert_lead({"nombre": "Incompleto"})
+    assert db.list_leads() == []
+
+
+def test_async_writes_are_group_committed(db):
+    async def scenario():
+        leads = [dict(LEAD, nombre=f"Lead {i}") for i in range(50)]
+        await asyncio.gather(*(db.async_insert_lead(lead) for lead in leads))
+        stats = db.writer.stats()
+        await db.writer.close()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert stats["operations"] == 50
+    assert stats["batches"] < 50
+    assert stats["queue_depth"] == 0
+    assert len(db.list_leads()) == 50
+
+
+def test_failed_write_only_fails_its_caller(db):
+    async def scenario():
+        results = await asyncio.gather(
+            db.async_insert_lead(LEAD),
+            db.async_update_lead_field("Juan Pérez", "columna_inexistente", "x"),
+            db.async_insert_lead(dict(LEAD, nombre="Ana Torres")),
+            return_exceptions=True,
+        )
+        await db.writer.close()
+        return results
+
+    ok, error, other = asyncio.run(scenario())
+    assert ok is None and other is None
+    assert isinstance(error, ValueError)
+    assert {lead["nombre"] for lead in db.list_leads()} == {"Juan Pérez", "Ana Torres"}
+
+
+def test_name_lookups_ignore_accents_and_case(db):
+    db.insert_lead(LEAD)
+    db.update_lead_field("juan perez", "empresa", "Empresa ABC")
+    assert db.list_leads()[0]["empresa"] == "Empresa ABC"
+    db.update_lead_field("JUAN PÉREZ.", "nombre", "Juan Pérez Gómez")
+    assert db.find_leads("juan perez gomez")[0]["nombre"] == "Juan Pérez Gómez"
+    db.delete_lead_by_name("Juan Perez Gomez")
+    assert db.list_leads() == []
+
+
+def test_name_lookup_uses_index(db):
+    with db.get_pool().connection() as conn:
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM leads WHERE nombre_norm = ?", ("juan perez",)
+        ).fetchall()
+    assert "idx_leads_nombre_norm" in " ".join(row[-1] for row in plan)
+
+
+def test_find_leads_ranks_name_matches_first(db):
+    db.insert_lead(dict(LEAD, nombre="Carlos Gómez", empresa="Juan Pérez Asociados"))
+    db.insert_lead(LEAD)
+    db.insert_lead(dict(LEAD, nombre="Juana Torres"))
+    results = db.find_leads("Juan Perez")
+    assert [lead["nombre"] for lead in results[:2]] == ["Juan Pérez", "Carlos Gómez"]
+    assert [lead["nombre"] for lead in db.find_leads("juan p", limit=1)] == ["Juan Pérez"]
+    assert db.find_leads("Ana Inexistente") == []
+
+
+def test_init_db_migrates_existing_table(tmp_path, monkeypatch):
+    path = tmp_path / "legacy.db"
+    conn = sqlite3.connect(path)
+    conn.execute(sqlite_db.TABLE_SCHEMA)
+    conn.execute(
+        "INSERT INTO leads (nombre, empresa, necesidades, presupuesto) VALUES (?, ?, ?, ?)",
+        tuple(LEAD.values()),
+    )
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(sqlite_db, "DB_NAME", str(path))
+    try:
+        sqlite_db.init_db()
+        assert sqlite_db.find_leads("juan perez")[0]["empresa"] == "Empresa XYZ"
+        sqlite_db.delete_lead_by_name("Juan Perez")
+        assert sqlite_db.find_leads("juan") == []
+    finally:
+        sqlite_db.close_pool()
+
+
+def test_keyset_pagination_and_projection(db):
+    for i in range(7):
+        db.insert_lead(dict(LEAD, nombre=f"Lead {i}"))
+    page, cursor = db.list_leads_page(limit=3, columns=("nombre",))
+    assert page == [{"nombre": "Lead 0"}, {"nombre": "Lead 1"}, {"nombre": "Lead 2"}]
+    names = [lead["nombre"] for lead in page]
+    while cursor is not None:
+        page, cursor = db.list_leads_page(limit=3, after=cursor, columns=("nombre",))
+        names += [lead["nombre"] for lead in page]
+    assert names == [f"Lead {i}" for i in range(7)]
+    assert [lead["id"] for lead in db.iter_leads(columns=("id",), page_size=2)] == list(range(1, 8))
+    with pytest.raises(ValueError):
+        db.list_leads_page(columns=("nombre; DROP TABLE leads",))
+    with pytest.raises(ValueError):
+        db.list_leads_page(limit=0)
+    with pytest.raises(ValueError):
+        next(db.iter_leads(page_size=0))
+
+
+def test_aiter_leads_streams_all_pages(db):
+    for i in range(5):
+        db.insert_lead(dict(LEAD, nombre=f"Lead {i}"))
+
+    async def collect():
+        return [lead["nombre"] async for lead in db.aiter_leads(columns=("nombre",), after=1, page_size=2)]
+
+    assert asyncio.run(collect()) == [f"Lead {i}" for i in range(1, 5)]
+
+
+def test_budget_is_normalized_on_insert_and_update(db):
+    db.insert_lead(dict(LEAD, presupuesto="$12,500"))
+    db.update_lead_field("Juan Pérez", "presupuesto", "15 mil euros")
+    [lead] = db.find_leads_by_budget(min_value=10_000)
+    assert (lead["presupuesto_valor"], lead["presupuesto_moneda"]) == (15000.0, "EUR")
+
+
+def test_budget_range_and_aggregates_run_in_sql(db):
+    budgets = {"A": ["1000", "2000", "3000", "4000"], "B": ["10k", "20k"]}
+    for empresa, values in budgets.items():
+        for i, value in enumerate(values):
+            db.insert_lead(dict(LEAD, nombre=f"{empresa}{i}", empresa=empresa, presupuesto=value))
+    db.insert_lead(dict(LEAD, nombre="Sin cifra", presupuesto="por definir"))
+
+    assert [lead["nombre"] for lead in db.find_leads_by_budget(2500, 15000)] == ["B0", "A3", "A2"]
+    [total] = db.budget_stats()
+    assert total["count"] == 6 and total["sum"] == 40000 and total["p50"] == 3000
+    per_company = {row["empresa"]: row for row in db.budget_stats(by_company=True)}
+    assert per_company["A"]["avg"] == 2500 and per_company["A"]["p90"] == 4000
+    assert per_company["B"]["min"] == 10000 and per_company["B"]["p50"] == 10000
+
+
+def test_get_lead_is_cached_until_a_write_invalidates_it(db):
+    db.insert_lead(LEAD)
+    assert db.get_lead("juan perez")["empresa"] == "Empresa XYZ"
+    assert db.get_lead("Juan Pérez")["empresa"] == "Empresa XYZ"
+    assert db.lead_cache.stats()["hits"] == 1
+
+    db.update_lead_field("Juan Pérez", "empresa", "Empresa ABC")
+    assert db.get_lead("juan perez")["empresa"] == "Empresa ABC"
+
+    async def delete():
+        await db.async_delete_lead_by_name("Juan Perez")
+        await db.writer.close()
+
+    asyncio.run(delete())
+    assert db.get_lead("juan perez") is None
+    db.insert_lead(LEAD)
+    assert db.get_lead("juan perez") is not None
+
+
+def test_async_miss_is_counted_once(db, monkeypatch):
+    from agent.lead_cache import LeadCache
+
+    monkeypatch.setattr(db, "lead_cache", LeadCache())
+    db.insert_lead(LEAD)
+
+    async def read_twice():
+        return await db.async_get_lead("juan perez"), await db.async_get_lead("Juan Pérez")
+
+    first, second = asyncio.run(read_twice())
+    assert first == second and first["empresa"] == "Empresa XYZ"
+    stats = db.lead_cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+
+def test_lead_cache_bounds_and_ttl():
+    from agent.lead_cache import MISSING, LeadCache
+
+    now = [0.0]
+    cache = LeadCache(max_entries=2, ttl=10, clock=lambda: now[0])
+    for key in ("a", "b", "c"):
+        cache.put(key, {"nombre": key}, cache.generation)
+    assert cache.get("a") is MISSING and cache.stats()["evictions"] == 1
+    generation = cache.generation
+    cache.invalidate("b")
+    assert not cache.put("b", {"nombre": "obsoleto"}, generation)
+    now[0] = 11
+    assert cache.get("c") is MISSING and cache.stats()["expirations"] == 1
+    small = LeadCache(max_bytes=1000)
+    for i in range(20):
+        small.put(str(i), {"nombre": "x" * 100}, small.generation)
+    assert small.stats()["bytes"] <= 1000
+
+
+def test_repeated_inserts_are_skipped_or_fill_empty_fields(db, monkeypatch):
+    db.insert_lead(dict(LEAD, necesidades=""))
+    db.insert_lead(dict(LEAD, nombre="juan perez", necesidades="", presupuesto="10,000"))   # mismo contenido
+    db.insert_lead(dict(LEAD, empresa=""))                                                 # completa necesidades
+    assert db.list_leads() == [LEAD]
+    # mismo nombre, otra empresa: es otro prospecto y no se fusiona
+    db.insert_lead(dict(LEAD, empresa="Otra SA", presupuesto="500"))
+    assert db.list_leads() == [LEAD, dict(LEAD, empresa="Otra SA", presupuesto="500")]
+    monkeypatch.setattr(db.idempotency, "IDEMPOTENCY_WINDOW", 0)
+    db.insert_lead(LEAD)
+    assert len(db.list_leads()) == 3
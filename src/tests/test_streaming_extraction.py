@@ -0,0 +1,45 @@
+from nlp.streaming_extraction import StreamingLeadExtractor
+
+
+class FakeNER:
+    def __init__(self):
+        self.texts = []
+
+    def extract_entities(self, text):
+        self.texts.append(text)
+        entities = []
+        if "Ana" in text:
+            entities.append({"entity_group": "PER", "word": "Ana Gómez", "score": 0.98})
+        if "Acme" in text:
+            entities.append({"entity_group": "ORG", "word": "Acme", "score": 0.55})
+        return entities
+
+
+def test_fields_are_emitted_as_sentences_complete():
+    ner, events = FakeNER(), []
+    extractor = StreamingLeadExtractor(ner, on_field=events.append)
+
+    assert extractor.feed("Hola, soy Ana Gó") == []
+    assert extractor.feed("mez. Mi correo es ana@acme") == [
+        {"field": "name", "value": "Ana Gómez", "source": "ner", "sentence": 1, "previous": None}
+    ]
+    assert ner.texts == ["Hola, soy Ana Gómez."]
+    extractor.feed(".com y trabajo en Acme.\nCompany: Acme Corp")
+    assert [e["field"] for e in events] == ["name", "email"]   # ORG con puntuación baja se ignora
+    assert extractor.missing() == ["company", "budget", "timeline"]
+
+    extractor.finish()
+    assert extractor.fields == {"name": "Ana Gómez", "email": "ana@acme.com", "company": "Acme Corp"}
+    assert len(ner.texts) == 3  # cada frase se analiza una sola vez
+
+
+def test_labelled_fields_win_over_ner_and_corrections_are_reported():
+    extractor = StreamingLeadExtractor()
+    extractor.feed("Name: Juan Pérez\nBudget: $500\nTimeline: Q3\n")
+    assert extractor.apply_entities([{"entity_group": "PER", "word": "Juan", "score": 0.99}]) == []
+    events = extractor.feed("Budget: $900\n")
+    assert events[0]["previous"] == "$500" and events[0]["value"] == "$900"
+    extractor.feed("Company: Globex\nEmail: juan@globex.com")
+    assert not extractor.is_complete
+    extractor.finish()
+    assert extractor.is_complete
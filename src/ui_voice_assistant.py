@@ -3,7 +3,7 @@ import numpy as np
 import sounddevice as sd
 import os
 import logging
-from typing import TypedDict
+from typing import Optional, TypedDict
 
 import PySimpleGUI as sg
 
@@ -21,8 +21,19 @@ from agents.voice import (
     TTSModelSettings,
     VoicePipelineConfig
 )
-from config import OPENAI_API_KEY  
-from agent.sqlite_db import init_db, async_insert_lead, async_update_lead_field, async_delete_lead_by_name, async_list_leads
+from audio.capture import AudioCapture
+from audio.playback import AudioPlayer
+from config import (
+    OPENAI_API_KEY,
+    CRM_ROUTER_SECONDARIES,
+    HUBSPOT_API_KEY,
+    AIRTABLE_API_KEY,
+    AIRTABLE_BASE_ID,
+    AIRTABLE_TABLE_NAME,
+    PLAYBACK_PREBUFFER_MS,
+)
+from agent.crm_router import CRMRouter, SQLiteBackend, build_backends
+from agent.sqlite_db import init_db, async_update_lead_field, async_delete_lead_by_name, async_list_leads_page, async_get_lead, async_find_leads, async_find_leads_by_budget, async_budget_stats
 
 set_default_openai_key(OPENAI_API_KEY)  
 set_default_openai_api("chat_completions") 
@@ -32,6 +43,14 @@ logger = logging.getLogger("VoiceAssistant")
 
 init_db()
 
+LIST_TOOL_MAX_LIMIT = 50
+
+# Cada lead se guarda en la base local (primario) y se replica a los CRM secundarios en segundo plano
+crm_router = CRMRouter(
+    SQLiteBackend(),
+    build_backends(CRM_ROUTER_SECONDARIES, HUBSPOT_API_KEY, AIRTABLE_API_KEY, AIRTABLE_BASE_ID, AIRTABLE_TABLE_NAME),
+)
+
 class LeadInfo(TypedDict):
     nombre: str
     empresa: str
@@ -64,12 +83,10 @@ parse_lead_info = function_tool(extract_lead_info)
 async def update_crm(lead_info: LeadInfo) -> CRMResponse:
     logger.info("Actualizando CRM con la siguiente información:")
     logger.info(lead_info)
-    try:
-        await async_insert_lead(lead_info)
+    result = await crm_router.write_lead(lead_info)
+    if result.get("status") == "success":
         return {"status": "success", "message": "La información del prospecto se actualizó correctamente."}
-    except Exception as e:
-        logger.error("Error al actualizar el CRM: %s", e)
-        return {"status": "error", "message": "Error al actualizar la información del prospecto."}
+    return {"status": "error", "message": "Error al actualizar la información del prospecto."}
 
 @function_tool
 async def update_lead_in_db(name: str, field: str, new_value: str) -> CRMResponse:
@@ -92,12 +109,16 @@ async def delete_lead(name: str) -> CRMResponse:
         return {"status": "error", "message": f"Error al eliminar el lead: {e}"}
 
 @function_tool
-async def list_all_leads() -> str:
-    logger.info("Listando todos los leads")
+async def list_all_leads(limit: int = 20, cursor: str = "") -> str:
+    logger.info("Listando leads (limit=%s, cursor=%r)", limit, cursor)
     try:
-        leads = await async_list_leads()
+        limit = max(1, min(limit, LIST_TOOL_MAX_LIMIT))
+        after = int(cursor) if cursor.strip() else None
+        leads, next_cursor = await async_list_leads_page(limit, after)
         if leads:
             response = "\n".join([f"{lead['nombre']} - {lead['empresa']} - {lead['necesidades']} - {lead['presupuesto']}" for lead in leads])
+            if next_cursor is not None:
+                response += f"\nHay más leads. Para continuar usa cursor='{next_cursor}'."
         else:
             response = "No hay leads guardados."
         return response
@@ -105,6 +126,68 @@ async def list_all_leads() -> str:
         logger.error("Error al listar los leads: %s", e)
         return f"Error al listar los leads: {e}"
 
+@function_tool
+async def get_lead_details(name: str) -> str:
+    logger.info("Consultando el lead '%s'", name)
+    try:
+        lead = await async_get_lead(name)
+        if lead:
+            response = f"{lead['nombre']} - {lead['empresa']} - {lead['necesidades']} - {lead['presupuesto']}"
+        else:
+            response = f"No hay ningún lead llamado '{name}'."
+        return response
+    except Exception as e:
+        logger.error("Error al consultar el lead: %s", e)
+        return f"Error al consultar el lead: {e}"
+
+@function_tool
+async def search_leads(query: str) -> str:
+    logger.info("Buscando leads: '%s'", query)
+    try:
+        leads = await async_find_leads(query)
+        if leads:
+            response = "\n".join([f"{lead['nombre']} - {lead['empresa']} - {lead['necesidades']} - {lead['presupuesto']}" for lead in leads])
+        else:
+            response = "No se encontraron leads para esa búsqueda."
+        return response
+    except Exception as e:
+        logger.error("Error al buscar leads: %s", e)
+        return f"Error al buscar leads: {e}"
+
+@function_tool
+async def leads_by_budget(min_budget: Optional[float] = None, max_budget: Optional[float] = None) -> str:
+    logger.info("Filtrando leads por presupuesto: %s - %s", min_budget, max_budget)
+    try:
+        leads = await async_find_leads_by_budget(min_budget, max_budget, None, LIST_TOOL_MAX_LIMIT)
+        if leads:
+            response = "\n".join([f"{lead['nombre']} - {lead['empresa']} - {lead['presupuesto']}" for lead in leads])
+        else:
+            response = "No hay leads con un presupuesto en ese rango."
+        return response
+    except Exception as e:
+        logger.error("Error al filtrar leads por presupuesto: %s", e)
+        return f"Error al filtrar leads por presupuesto: {e}"
+
+@function_tool
+async def budget_summary(by_company: bool = False, min_budget: Optional[float] = None, max_budget: Optional[float] = None) -> str:
+    logger.info("Resumen de presupuestos (por empresa=%s)", by_company)
+    try:
+        rows = await async_budget_stats(min_budget, max_budget, None, by_company)
+        if rows:
+            response = "\n".join([
+                (f"{row['empresa']}: " if by_company else "")
+                + f"{row['count']} leads, total {row['sum']:.2f}, promedio {row['avg']:.2f}, "
+                f"mínimo {row['min']:.2f}, máximo {row['max']:.2f}, p50 {row['p50']:.2f}, p90 {row['p90']:.2f}"
+                + (f" {row['moneda']}" if row['moneda'] else "")
+                for row in rows
+            ])
+        else:
+            response = "No hay leads con presupuesto registrado."
+        return response
+    except Exception as e:
+        logger.error("Error al resumir los presupuestos: %s", e)
+        return f"Error al resumir los presupuestos: {e}"
+
 lead_agent = Agent(
     name="LeadAgent",
     instructions=prompt_with_handoff_instructions("""
@@ -114,11 +197,15 @@ Recopila información y actualiza el CRM usando:
 - 'update_crm' para agregar nuevos leads.
 - 'update_lead_in_db' para modificar campos de un lead existente.
 - 'delete_lead' para eliminar un lead por nombre.
-- 'list_all_leads' para consultar los leads guardados.
+- 'list_all_leads' para consultar los leads guardados por páginas (usa el cursor devuelto para continuar).
+- 'get_lead_details' para consultar un lead por su nombre clave exacto.
+- 'search_leads' para buscar un lead por su nombre clave, empresa o necesidades.
+- 'leads_by_budget' para listar leads dentro de un rango de presupuesto.
+- 'budget_summary' para responder estadísticas de presupuesto (cantidad, total, promedio, percentiles), opcionalmente por empresa.
 Mantén un tono profesional y amigable.
 """),
     model="gpt-4o",
-    tools=[parse_lead_info, update_crm, update_lead_in_db, delete_lead, list_all_leads],
+    tools=[parse_lead_info, update_crm, update_lead_in_db, delete_lead, list_all_leads, get_lead_details, search_leads, leads_by_budget, budget_summary],
     output_type=str,
 )
 
@@ -127,29 +214,15 @@ tts_settings = TTSModelSettings(
 )
 pipeline_config = VoicePipelineConfig(tts_settings=tts_settings)
 
-async def capture_audio_gui(samplerate: float, stop_event: asyncio.Event) -> np.ndarray:
-    loop = asyncio.get_running_loop()
-    recorded_chunks = []
-
-    def callback(indata, frames, time, status):
-        if status:
-            logger.warning(f"Status de audio: {status}")
-        recorded_chunks.append(indata.copy())
-
+async def capture_audio_gui(capture: AudioCapture, stop_event: asyncio.Event) -> np.ndarray:
     logger.info("Grabando... Por favor, habla ahora.")
     try:
-        with sd.InputStream(samplerate=samplerate, channels=1, dtype='int16', callback=callback):
-          
-            while not stop_event.is_set():
-                await asyncio.sleep(0.1)
+        audio = await capture.record(stop_event.wait)
     except Exception as e:
         logger.error(f"Error en la captura de audio: {e}")
         return np.array([], dtype=np.int16)
-    
-    if recorded_chunks:
-        return np.concatenate(recorded_chunks, axis=0)
-    else:
-        return np.array([], dtype=np.int16)
+    logger.info(f"Captura de audio: {capture.stats()}")
+    return audio
 
 async def main():
     layout = [
@@ -164,6 +237,8 @@ async def main():
     except Exception as e:
         logger.error(f"Error al obtener el dispositivo de audio: {e}")
         samplerate = 24000
+    audio_capture = AudioCapture(samplerate)
+    audio_player = AudioPlayer(samplerate, prebuffer_ms=PLAYBACK_PREBUFFER_MS)
 
     stop_event = asyncio.Event()
     recording_task = None
@@ -178,7 +253,7 @@ async def main():
             stop_event.clear()  
             window["START"].update(disabled=True)
             window["STOP"].update(disabled=False)
-            recording_task = asyncio.create_task(capture_audio_gui(samplerate, stop_event))
+            recording_task = asyncio.create_task(capture_audio_gui(audio_capture, stop_event))
 
         if event == "STOP":
             window["OUTPUT"].print("Deteniendo grabación...")
@@ -194,6 +269,7 @@ async def main():
                     window["OUTPUT"].print("No se capturó audio. Intenta nuevamente.")
                 else:
                     audio_input = AudioInput(buffer=audio_buffer)
+                    audio_player.begin_turn()
                     try:
                         result = await pipeline.run(audio_input)
                     except Exception as e:
@@ -201,26 +277,26 @@ async def main():
                         window["START"].update(disabled=False)
                         continue
 
-                    response_chunks = []
                     try:
                         async for ev in result.stream():
                             if ev.type == "voice_stream_event_audio":
-                                response_chunks.append(ev.data)
+                                if audio_player.chunks == 0:
+                                    window["OUTPUT"].print("El asistente responde...")
+                                audio_player.write(ev.data)
                             elif ev.type == "voice_stream_event_lifecycle":
                                 window["OUTPUT"].print(f"[lifecycle] {ev}")
                             elif ev.type == "voice_stream_event_error":
                                 window["OUTPUT"].print(f"[error] {ev.data}")
                     except Exception as e:
                         window["OUTPUT"].print(f"Error al procesar el stream: {e}")
+                        audio_player.abort()
                         window["START"].update(disabled=False)
                         continue
 
-                    if response_chunks:
-                        response_audio = np.concatenate(response_chunks, axis=0)
-                        window["OUTPUT"].print("El asistente responde...")
+                    if audio_player.chunks:
                         try:
-                            sd.play(response_audio, samplerate=samplerate)
-                            sd.wait()
+                            playback = await audio_player.finish()
+                            logger.info("Reproducción: %s", playback)
                         except Exception as e:
                             window["OUTPUT"].print(f"Error al reproducir el audio: {e}")
                     else:
@@ -229,6 +305,8 @@ async def main():
 
         await asyncio.sleep(0.01)
 
+    await crm_router.close()
+    logger.info("Router CRM: %s", crm_router.stats())
     window.close()
 
 if __name__ == "__main__":
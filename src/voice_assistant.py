@@ -1,11 +1,12 @@
 import asyncio
-import numpy as np
 import sounddevice as sd
 
 from agents import Agent, set_default_openai_key
 from agents.voice import AudioInput, SingleAgentVoiceWorkflow, VoicePipeline
 from agent.crm_integration import store_lead, _store_lead_in_crm
-from config import OPENAI_API_KEY
+from audio.capture import AudioCapture
+from audio.playback import AudioPlayer
+from config import OPENAI_API_KEY, PLAYBACK_PREBUFFER_MS
 from nlp.entity_extraction import extract_lead_info
 
 set_default_openai_key(OPENAI_API_KEY)
@@ -39,6 +40,8 @@ lead_nurturing_agent = Agent(
 # -----------------------------------------------------------------------------
 async def base_voice_assistant():
     samplerate = sd.query_devices(kind='input')['default_samplerate']
+    audio_capture = AudioCapture(samplerate)  # el buffer se reutiliza en cada turno
+    audio_player = AudioPlayer(samplerate, prebuffer_ms=PLAYBACK_PREBUFFER_MS)
     print("Voice assistant iniciado. Presiona Enter para hablar o escribe 'esc' para salir.")
 
     # Creamos un pipeline apuntando a nuestro agente de leads
@@ -51,19 +54,20 @@ async def base_voice_assistant():
             break
 
         print("Escuchando... Presiona Enter nuevamente para finalizar grabación.")
-        recorded_chunks = []
 
         # Captura de audio desde el micrófono
-        with sd.InputStream(samplerate=samplerate, channels=1, dtype='int16',
-                            callback=lambda indata, frames, time, status: recorded_chunks.append(indata.copy())):
+        audio_capture.start()
+        try:
             input()  # Pulsa Enter cuando termines de hablar
+        finally:
+            recording = audio_capture.stop()
 
-        if not recorded_chunks:
+        if len(recording) == 0:
             print("No se grabó audio. Intenta hablar antes de presionar Enter.")
             continue
 
-        recording = np.concatenate(recorded_chunks, axis=0)
         audio_input = AudioInput(buffer=recording)
+        audio_player.begin_turn()
 
         # Executes the pipeline and processes the response        
         result = await pipeline.run(audio_input)
@@ -99,18 +103,15 @@ async def base_voice_assistant():
         else:
             print("Información incompleta para almacenar el lead.")
 
-        # Recopilar los fragmentos de audio de la respuesta del agente
-        response_chunks = []
+        # Reproducir cada fragmento de la respuesta del agente en cuanto llega
         async for event in result.stream():
             if event.type == "voice_stream_event_audio":
-                response_chunks.append(event.data)
-
-        # Unir la respuesta y reproducirla
-        if response_chunks:
-            response_audio = np.concatenate(response_chunks, axis=0)
-            print("El asistente está respondiendo...")
-            sd.play(response_audio, samplerate=samplerate)
-            sd.wait()
+                if audio_player.chunks == 0:
+                    print("El asistente está respondiendo...")
+                audio_player.write(event.data)
+
+        if audio_player.chunks:
+            await audio_player.finish()
         else:
             print("No se recibió respuesta de audio.")
         print("---")
@@ -3,7 +3,7 @@ import numpy as np
 import sounddevice as sd
 import os
 import logging
-from typing import TypedDict
+from typing import Optional, TypedDict
 
 from agents import (
     Agent,
@@ -19,8 +19,24 @@ from agents.voice import (
     TTSModelSettings,
     VoicePipelineConfig
 )
-from config import OPENAI_API_KEY  
-from agent.sqlite_db import init_db, async_insert_lead, async_update_lead_field, async_delete_lead_by_name, async_list_leads
+from audio.capture import AudioCapture
+from audio.playback import AudioPlayer
+from config import (
+    OPENAI_API_KEY,
+    CRM_OUTBOX_TARGETS,
+    CRM_OUTBOX_BATCH_SIZE,
+    CRM_OUTBOX_MAX_ATTEMPTS,
+    HUBSPOT_API_KEY,
+    AIRTABLE_API_KEY,
+    AIRTABLE_BASE_ID,
+    AIRTABLE_TABLE_NAME,
+    AIRTABLE_MIRROR_INTERVAL,
+    PLAYBACK_PREBUFFER_MS,
+)
+from agent.airtable_mirror import AirtableMirror
+from agent.async_crm import AsyncAirtableCRM
+from agent.crm_outbox import OutboxWorker, build_senders, enqueue_lead, init_outbox
+from agent.sqlite_db import init_db, async_update_lead_field, async_delete_lead_by_name, async_list_leads_page, async_get_lead, async_find_leads, async_find_leads_by_budget, async_budget_stats
 
 set_default_openai_key(OPENAI_API_KEY)  
 set_default_openai_api("chat_completions") 
@@ -29,6 +45,22 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("VoiceAssistant")
 
 init_db()
+init_outbox()
+
+LIST_TOOL_MAX_LIMIT = 50
+
+# Los leads nuevos se envían a los CRM remotos en segundo plano desde la outbox
+outbox_worker = OutboxWorker(
+    build_senders(CRM_OUTBOX_TARGETS, HUBSPOT_API_KEY, AIRTABLE_API_KEY, AIRTABLE_BASE_ID, AIRTABLE_TABLE_NAME),
+    batch_size=CRM_OUTBOX_BATCH_SIZE,
+    max_attempts=CRM_OUTBOX_MAX_ATTEMPTS,
+)
+
+# Réplica local de la tabla de Airtable: las consultas al CRM no salen a la red
+crm_mirror = (
+    AirtableMirror(AsyncAirtableCRM(AIRTABLE_API_KEY, AIRTABLE_BASE_ID, AIRTABLE_TABLE_NAME))
+    if AIRTABLE_API_KEY and AIRTABLE_BASE_ID else None
+)
 
 class LeadInfo(TypedDict):
     nombre: str
@@ -64,7 +96,8 @@ async def update_crm(lead_info: LeadInfo) -> CRMResponse:
     logger.info("Actualizando CRM con la siguiente información:")
     logger.info(lead_info)
     try:
-        await async_insert_lead(lead_info)
+        await enqueue_lead(lead_info, list(outbox_worker.senders))
+        outbox_worker.notify()
         return {"status": "success", "message": "La información del prospecto se actualizó correctamente."}
     except Exception as e:
         logger.error("Error al actualizar el CRM: %s", e)
@@ -96,13 +129,20 @@ async def delete_lead(name: str) -> CRMResponse:
         return {"status": "error", "message": f"Error al eliminar el lead: {e}"}
 
 @function_tool
-async def list_all_leads() -> str:
-    """Devuelve un listado formateado de todos los leads almacenados."""
-    logger.info("Listando todos los leads")
+async def list_all_leads(limit: int = 20, cursor: str = "") -> str:
+    """
+    Devuelve una página de leads almacenados (máximo 50 por llamada).
+    Si hay más, la respuesta incluye un cursor para pedir la página siguiente.
+    """
+    logger.info("Listando leads (limit=%s, cursor=%r)", limit, cursor)
     try:
-        leads = await async_list_leads()
+        limit = max(1, min(limit, LIST_TOOL_MAX_LIMIT))
+        after = int(cursor) if cursor.strip() else None
+        leads, next_cursor = await async_list_leads_page(limit, after)
         if leads:
             response = "\n".join([f"{lead['nombre']} - {lead['empresa']} - {lead['necesidades']} - {lead['presupuesto']}" for lead in leads])
+            if next_cursor is not None:
+                response += f"\nHay más leads. Para continuar usa cursor='{next_cursor}'."
         else:
             response = "No hay leads guardados."
         return response
@@ -110,6 +150,94 @@ async def list_all_leads() -> str:
         logger.error("Error al listar los leads: %s", e)
         return f"Error al listar los leads: {e}"
 
+@function_tool
+async def get_lead_details(name: str) -> str:
+    """Devuelve los datos de un lead a partir de su nombre clave."""
+    logger.info("Consultando el lead '%s'", name)
+    try:
+        lead = await async_get_lead(name)
+        if lead:
+            response = f"{lead['nombre']} - {lead['empresa']} - {lead['necesidades']} - {lead['presupuesto']}"
+        else:
+            response = f"No hay ningún lead llamado '{name}'."
+        return response
+    except Exception as e:
+        logger.error("Error al consultar el lead: %s", e)
+        return f"Error al consultar el lead: {e}"
+
+@function_tool
+async def search_leads(query: str) -> str:
+    """Busca leads por nombre, empresa o necesidades, tolerando acentos y nombres incompletos."""
+    logger.info("Buscando leads: '%s'", query)
+    try:
+        leads = await async_find_leads(query)
+        if leads:
+            response = "\n".join([f"{lead['nombre']} - {lead['empresa']} - {lead['necesidades']} - {lead['presupuesto']}" for lead in leads])
+        else:
+            response = "No se encontraron leads para esa búsqueda."
+        return response
+    except Exception as e:
+        logger.error("Error al buscar leads: %s", e)
+        return f"Error al buscar leads: {e}"
+
+@function_tool
+async def leads_by_budget(min_budget: Optional[float] = None, max_budget: Optional[float] = None) -> str:
+    """Lista los leads cuyo presupuesto está entre min_budget y max_budget (ambos opcionales)."""
+    logger.info("Filtrando leads por presupuesto: %s - %s", min_budget, max_budget)
+    try:
+        leads = await async_find_leads_by_budget(min_budget, max_budget, None, LIST_TOOL_MAX_LIMIT)
+        if leads:
+            response = "\n".join([f"{lead['nombre']} - {lead['empresa']} - {lead['presupuesto']}" for lead in leads])
+        else:
+            response = "No hay leads con un presupuesto en ese rango."
+        return response
+    except Exception as e:
+        logger.error("Error al filtrar leads por presupuesto: %s", e)
+        return f"Error al filtrar leads por presupuesto: {e}"
+
+@function_tool
+async def budget_summary(by_company: bool = False, min_budget: Optional[float] = None, max_budget: Optional[float] = None) -> str:
+    """
+    Resume los presupuestos de los leads (cantidad, total, promedio, mínimo, máximo, p50 y p90),
+    opcionalmente filtrados por rango y agrupados por empresa.
+    """
+    logger.info("Resumen de presupuestos (por empresa=%s)", by_company)
+    try:
+        rows = await async_budget_stats(min_budget, max_budget, None, by_company)
+        if rows:
+            response = "\n".join([
+                (f"{row['empresa']}: " if by_company else "")
+                + f"{row['count']} leads, total {row['sum']:.2f}, promedio {row['avg']:.2f}, "
+                f"mínimo {row['min']:.2f}, máximo {row['max']:.2f}, p50 {row['p50']:.2f}, p90 {row['p90']:.2f}"
+                + (f" {row['moneda']}" if row['moneda'] else "")
+                for row in rows
+            ])
+        else:
+            response = "No hay leads con presupuesto registrado."
+        return response
+    except Exception as e:
+        logger.error("Error al resumir los presupuestos: %s", e)
+        return f"Error al resumir los presupuestos: {e}"
+
+@function_tool
+async def crm_lookup(name: str) -> str:
+    """Busca un contacto por nombre en el CRM (Airtable), usando la copia local sincronizada."""
+    logger.info("Buscando '%s' en el CRM", name)
+    if crm_mirror is None:
+        return "No hay un CRM remoto configurado."
+    try:
+        records = await crm_mirror.async_find_by_name(name)
+        if records:
+            response = "\n".join([
+                " - ".join(str(value) for value in record["fields"].values()) for record in records
+            ])
+        else:
+            response = f"No se encontró '{name}' en el CRM."
+        return response
+    except Exception as e:
+        logger.error("Error al consultar el CRM: %s", e)
+        return f"Error al consultar el CRM: {e}"
+
 voice_system_prompt = """
 [Output Structure]
 Your output will be delivered in an audio voice response, please ensure that every response meets these guidelines:
@@ -128,12 +256,17 @@ lead_agent = Agent(
             - 'update_crm' to add new leads.
             - 'update_lead_in_db' to modify fields of an existing lead.
             - 'delete_lead' to remove a lead by name.
-            - 'list_all_leads' to list stored leads.
+            - 'list_all_leads' to list stored leads page by page (pass the returned cursor to continue).
+            - 'get_lead_details' to read a lead by its exact codename.
+            - 'search_leads' to find a lead by its codename, company or needs.
+            - 'leads_by_budget' to list leads within a budget range.
+            - 'budget_summary' to answer budget analytics (count, total, average, percentiles), optionally by company.
+            - 'crm_lookup' to look up a contact in the remote CRM by name.
             Maintain a professional and friendly tone.
             Always respond in Spanish and slowly.
             """),
     model="gpt-4o",
-    tools=[parse_lead_info, update_crm, update_lead_in_db, delete_lead, list_all_leads],
+    tools=[parse_lead_info, update_crm, update_lead_in_db, delete_lead, list_all_leads, get_lead_details, search_leads, leads_by_budget, budget_summary, crm_lookup],
     output_type=str,
 )
 
@@ -142,27 +275,18 @@ tts_settings = TTSModelSettings(
     instructions="Personality: amigable y profesional. Tone: claro y empático. Pronunciation: clara y pausada. Tempo: fluido y un poco más lento. Emotion: cálido."
 )
 
-async def capture_audio(samplerate: float) -> np.ndarray:
+async def capture_audio(capture: AudioCapture) -> np.ndarray:
     loop = asyncio.get_running_loop()
-    recorded_chunks = []
-
-    def callback(indata, frames, time, status):
-        if status:
-            logger.warning(f"Status de audio: {status}")
-        recorded_chunks.append(indata.copy())
-
     logger.info("Grabando... Por favor, habla ahora.")
     try:
-        with sd.InputStream(samplerate=samplerate, channels=1, dtype='int16', callback=callback):
-            await loop.run_in_executor(None, input, "Presiona Enter para finalizar la grabación...\n")
+        audio = await capture.record(
+            lambda: loop.run_in_executor(None, input, "Presiona Enter para finalizar la grabación...\n")
+        )
     except Exception as e:
         logger.error(f"Error en la captura de audio: {e}")
         return np.array([], dtype=np.int16)
-    
-    if recorded_chunks:
-        return np.concatenate(recorded_chunks, axis=0)
-    else:
-        return np.array([], dtype=np.int16)
+    logger.info(f"Captura: {capture.stats()}")
+    return audio
 
 # Asistente de Voz
 async def voice_assistant():
@@ -172,8 +296,14 @@ async def voice_assistant():
     except Exception as e:
         logger.error(f"Error al obtener el dispositivo de audio: {e}")
         return
+    audio_capture = AudioCapture(samplerate)
+    audio_player = AudioPlayer(samplerate, prebuffer_ms=PLAYBACK_PREBUFFER_MS)
 
     pipeline_config = VoicePipelineConfig(tts_settings=tts_settings)
+    if outbox_worker.senders:
+        outbox_worker.start()
+    if crm_mirror is not None:
+        crm_mirror.start(AIRTABLE_MIRROR_INTERVAL)
     logger.info("Bienvenido al Asistente de Calificación de Leads.")
 
     while True:
@@ -184,12 +314,13 @@ async def voice_assistant():
             logger.info("Saliendo del asistente de voz...")
             break
 
-        audio_buffer = await capture_audio(samplerate)
+        audio_buffer = await capture_audio(audio_capture)
         if audio_buffer.size == 0:
             logger.warning("No se capturó audio. Intenta nuevamente.")
             continue
 
         audio_input = AudioInput(buffer=audio_buffer)
+        audio_player.begin_turn()
 
         try:
             result = await pipeline.run(audio_input)
@@ -197,30 +328,35 @@ async def voice_assistant():
             logger.error(f"Error durante la ejecución del pipeline: {e}")
             continue
 
-        response_chunks = []
+        # Cada fragmento se reproduce en cuanto llega, sin esperar al resto de la respuesta
         try:
             async for event in result.stream():
                 if event.type == "voice_stream_event_audio":
-                    response_chunks.append(event.data)
+                    if audio_player.chunks == 0:
+                        logger.info("El asistente está respondiendo...")
+                    audio_player.write(event.data)
                 elif event.type == "voice_stream_event_lifecycle":
                     logger.info(f"[lifecycle] {event}")
                 elif event.type == "voice_stream_event_error":
                     logger.error(f"[error] {event.data}")
         except Exception as e:
             logger.error(f"Error al procesar el stream de eventos: {e}")
+            audio_player.abort()
             continue
 
-        if response_chunks:
-            response_audio = np.concatenate(response_chunks, axis=0)
-            logger.info("El asistente está respondiendo...")
+        if audio_player.chunks:
             try:
-                sd.play(response_audio, samplerate=samplerate)
-                sd.wait()
+                logger.info("Reproducción: %s", await audio_player.finish())
             except Exception as e:
                 logger.error(f"Error al reproducir el audio: {e}")
             print("---")
         else:
             logger.warning("No se recibió respuesta de audio. Intenta nuevamente.")
 
+    await outbox_worker.close()
+    if crm_mirror is not None:
+        await crm_mirror.close()
+    logger.info("Outbox CRM: %s", outbox_worker.stats())
+
 if __name__ == "__main__":
     asyncio.run(voice_assistant())
@@ -1,4 +1,5 @@
 import asyncio
+import functools
 import numpy as np
 import sounddevice as sd
 import os
@@ -19,7 +20,13 @@ from agents.voice import (
     TTSModelSettings,
     VoicePipelineConfig
 )
-from config import OPENAI_API_KEY  
+from audio.capture import AudioCapture
+from audio.playback import AudioPlayer
+from config import OPENAI_API_KEY, NLP_BACKEND, NLP_CACHE_PATH, NLP_WORKERS, PLAYBACK_PREBUFFER_MS
+from agent.sqlite_db import async_get_lead, init_db
+from nlp.batching import MicroBatcher
+from nlp.process_pool import NLPProcessPool
+from nlp.streaming_extraction import StreamingLeadExtractor
 
 set_default_openai_key(OPENAI_API_KEY)  
 set_default_openai_api("chat_completions") 
@@ -77,27 +84,48 @@ tts_settings = TTSModelSettings(
     instructions="Personality: amigable y profesional. Tone: claro y empático. Pronunciation: clara y pausada. Tempo: fluido y un poco más lento. Emotion: cálido."
 )
 
-async def capture_audio(samplerate: float) -> np.ndarray:
+async def capture_audio(capture: AudioCapture) -> np.ndarray:
     loop = asyncio.get_running_loop()
-    recorded_chunks = []
-
-    def callback(indata, frames, time, status):
-        if status:
-            logger.warning(f"Status de audio: {status}")
-        recorded_chunks.append(indata.copy())
-
     logger.info("Grabando... Por favor, habla ahora.")
     try:
-        with sd.InputStream(samplerate=samplerate, channels=1, dtype='int16', callback=callback):
-            await loop.run_in_executor(None, input, "Presiona Enter para finalizar la grabación...\n")
+        audio = await capture.record(
+            lambda: loop.run_in_executor(None, input, "Presiona Enter para finalizar la grabación...\n")
+        )
     except Exception as e:
         logger.error(f"Error en la captura de audio: {e}")
         return np.array([], dtype=np.int16)
-    
-    if recorded_chunks:
-        return np.concatenate(recorded_chunks, axis=0)
-    else:
-        return np.array([], dtype=np.int16)
+    logger.info(f"Captura: {capture.stats()}")
+    return audio
+
+
+def attach_analysis(turn: dict, extractor: StreamingLeadExtractor, task: asyncio.Task) -> None:
+    """Adjunta al turno el resultado del NLP cuando termina (en paralelo a la respuesta de audio)."""
+    if task.cancelled():
+        return
+    if task.exception() is not None:
+        logger.error(f"Error en el análisis NLP del turno: {task.exception()}")
+        return
+    turn["nlp"] = task.result()
+    logger.info("Entidades detectadas: %s", turn["nlp"]["entities"])
+    logger.info("Intención detectada: %s", turn["nlp"]["intent"])
+    extractor.apply_entities(turn["nlp"]["entities"])
+
+
+async def lookup_lead(name: str):
+    try:
+        lead = await async_get_lead(name)
+    except Exception as e:
+        logger.error(f"Error al buscar el lead '{name}': {e}")
+        return None
+    logger.info(f"Lead '{name}' {'ya registrado' if lead else 'nuevo'}.")
+    return lead
+
+
+def prefetch_lead(prefetched: dict, event: dict) -> None:
+    """En cuanto se conoce el nombre, busca el lead en segundo plano (calienta la caché de leads)."""
+    logger.info(f"Campo del lead detectado: {event['field']} = {event['value']}")
+    if event["field"] == "name" and event["value"] not in prefetched:
+        prefetched[event["value"]] = asyncio.get_running_loop().create_task(lookup_lead(event["value"]))
 
 
 async def voice_assistant():
@@ -107,14 +135,22 @@ async def voice_assistant():
     except Exception as e:
         logger.error(f"Error al obtener el dispositivo de audio: {e}")
         return
+    audio_capture = AudioCapture(samplerate)
+    audio_player = AudioPlayer(samplerate, prebuffer_ms=PLAYBACK_PREBUFFER_MS)
+
+    init_db()
+    # Los modelos de NLP se cargan y calientan en procesos aparte mientras se prepara el audio
+    nlp_pool = NLPProcessPool(workers=NLP_WORKERS, backend=NLP_BACKEND, cache_path=NLP_CACHE_PATH or None)
+    nlp_pool.start()
+    nlp_batcher = MicroBatcher(pool=nlp_pool)
+    turns = []
+    # Estado del lead a lo largo de la conversación: cada turno es un nuevo fragmento de transcripción
+    prefetched = {}
+    lead_extractor = StreamingLeadExtractor(on_field=functools.partial(prefetch_lead, prefetched))
 
     pipeline_config = VoicePipelineConfig(tts_settings=tts_settings)
     logger.info("Bienvenido al Asistente de Calificación de Leads.")
 
-
-    from nlp.entity_intention_extraction import NLPProcessor
-    nlp_processor = NLPProcessor()
-
     while True:
         pipeline = VoicePipeline(workflow=SingleAgentVoiceWorkflow(lead_agent), config=pipeline_config)
         
@@ -123,12 +159,13 @@ async def voice_assistant():
             logger.info("Saliendo del asistente de voz...")
             break
 
-        audio_buffer = await capture_audio(samplerate)
+        audio_buffer = await capture_audio(audio_capture)
         if audio_buffer.size == 0:
             logger.warning("No se capturó audio. Intenta nuevamente.")
             continue
 
         audio_input = AudioInput(buffer=audio_buffer)
+        audio_player.begin_turn()
 
         try:
             result = await pipeline.run(audio_input)
@@ -140,38 +177,45 @@ async def voice_assistant():
         if hasattr(result, "final_text"):
             transcribed_text = result.final_text
             logger.info(f"Texto transcrito: {transcribed_text}")
-            # Procesamos el texto: extracción de entidades e intención
-            entities = nlp_processor.extract_entities(transcribed_text)
-            intent = nlp_processor.classify_intent(transcribed_text)
-            logger.info("Entidades detectadas: %s", entities)
-            logger.info("Intención detectada: %s", intent)
+            # Entidades e intención se calculan en el pool mientras se reproduce la respuesta;
+            # el resultado se adjunta al turno cuando está listo
+            turn = {"text": transcribed_text, "nlp": None}
+            turns.append(turn)
+            nlp_task = asyncio.create_task(nlp_batcher.analyze(transcribed_text))
+            nlp_task.add_done_callback(functools.partial(attach_analysis, turn, lead_extractor))
+            lead_extractor.feed(transcribed_text + "\n")
+            logger.info(f"Datos del lead pendientes: {lead_extractor.missing()}")
         else:
             logger.warning("No se recibió texto transcrito del pipeline.")
 
-        response_chunks = []
+        # Cada fragmento se reproduce en cuanto llega, sin esperar al resto de la respuesta
         try:
             async for event in result.stream():
                 if event.type == "voice_stream_event_audio":
-                    response_chunks.append(event.data)
+                    if audio_player.chunks == 0:
+                        logger.info("El asistente está respondiendo...")
+                    audio_player.write(event.data)
                 elif event.type == "voice_stream_event_lifecycle":
                     logger.info(f"[lifecycle] {event}")
                 elif event.type == "voice_stream_event_error":
                     logger.error(f"[error] {event.data}")
         except Exception as e:
             logger.error(f"Error al procesar el stream de eventos: {e}")
+            audio_player.abort()
             continue
 
-        if response_chunks:
-            response_audio = np.concatenate(response_chunks, axis=0)
-            logger.info("El asistente está respondiendo...")
+        if audio_player.chunks:
             try:
-                sd.play(response_audio, samplerate=samplerate)
-                sd.wait()
+                logger.info("Reproducción: %s", await audio_player.finish())
             except Exception as e:
                 logger.error(f"Error al reproducir el audio: {e}")
             print("---")
         else:
             logger.warning("No se recibió respuesta de audio. Intenta nuevamente.")
 
+    await nlp_batcher.close()
+    logger.info("NLP: %s | pool: %s", nlp_batcher.stats(), nlp_pool.stats())
+    nlp_pool.close()
+
 if __name__ == "__main__":
     asyncio.run(voice_assistant())